@@ -1,16 +1,47 @@
 import os
+import re
 import argparse
+import atexit
+import base64
+import bisect
+from collections import OrderedDict
+import copy
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+import fnmatch
 import getpass
+import hashlib
+import hmac
+import io
+import json
+import math
+import mmap
+import multiprocessing
 from pathlib import Path
 import logging
 import logging.config
+import secrets
+import shutil
+import string
+import subprocess
+import sys
+import threading
+import struct
+import time
 import tomllib
 import traceback
+from urllib.parse import urlsplit, parse_qs, unquote
 import uuid
+import zlib
 
 # External libs
+from construct import ConstructError
+from lxml import etree
 from pykeepass import PyKeePass
 from pykeepass import exceptions as pkExceptions
+from pykeepass.entry import reserved_keys
+from pykeepass.kdbx_parsing.common import aes_kdf, compute_key_composite
+import argon2
 
 # CLI libs
 from prompt_toolkit import PromptSession
@@ -22,6 +53,20 @@ from prompt_toolkit.styles import Style
 
 # Setting THIS logger to be the root
 logger = logging.getLogger('main-cli')
+# Secret access audit trail. See [logconfig.loggers."main-cli.audit"] in logcfg.toml.example
+auditLog = logging.getLogger('main-cli.audit')
+
+class JsonLineFormatter(logging.Formatter):
+    """Formats audit records as one JSON object per line
+
+    The record's audit dict (from _auditEvent) is written with the time
+    of the record in UTC. Used from the log configuration with
+    "()" = "__main__.JsonLineFormatter"
+    """
+    def format(self, record) -> str:
+        auditRec = {'time': datetime.fromtimestamp(record.created,timezone.utc).isoformat(timespec='milliseconds')}
+        auditRec.update(getattr(record,'audit',{'event': record.getMessage()}))
+        return json.dumps(auditRec)
 
 mainStyles = Style.from_dict({
     'fldname': '#276CF5',
@@ -35,15 +80,34 @@ mainStyles = Style.from_dict({
 cmdHelper = {
     'help': {
         'add': None,
+        'attach': None,
+        'audit': None,
         'chggrp': None,
         'chgpwd': None,
         'cd': None,
         'delete': None,
+        'detach': None,
         'edit': None,
+        'extract': None,
         'find': None,
         'getpass': None,
+        'getotp': None,
+        'genpass': None,
+        'rotate': None,
+        'dupes': None,
+        'expiring': None,
+        'history': None,
+        'prune-history': None,
         'list': None,
+        'merge': None,
+        'move': None,
+        'purge': None,
+        'kdf': None,
+        'set': None,
+        'settings': None,
         'show': None,
+        'stats': None,
+        'use': None,
         'exit': None,
         'quit': None,
     },
@@ -51,35 +115,169 @@ cmdHelper = {
         'entry': None,
         'group': None,
     },
+    'attach': None,
     'chggrp': None,
     'chgpwd': None,
     'cd' : None,
     'delete': {
         'entry': None,
-        'group': None,
+        'group': {
+            '--dry-run': None,
+        },
     },
+    'detach': None,
     'edit': {
         'entry': None,
         'group': None,
     },
+    'extract': None,
     'find': {
         'entry': {
             'title': None,
             'username': None
         },
+        'field': None,
+        'tag': None,
+        'url': None,
         'group': None,
+        '--all-dbs': None,
+    },
+    'getpass': {
+        '--clip': None,
+    },
+    'getotp': {
+        '--watch': None,
+        '--stop': None,
+    },
+    'genpass': {
+        '--length': None,
+        '--no-upper': None,
+        '--no-lower': None,
+        '--no-digits': None,
+        '--no-symbols': None,
+        '--pronounceable': None,
+        '--words': None,
+        '--wordlist': None,
+        '--clip': None,
+    },
+    'rotate': None,
+    'dupes': {
+        '--titles': None,
+        '--similarity': None,
+        '--merge': None,
+        '--recycle': None,
+    },
+    'history': {
+        'entry': None,
+    },
+    'prune-history': {
+        '--keep': None,
+        '--max-bytes': None,
+    },
+    'move': {
+        'title': None,
+        'username': None,
+    },
+    'set': {
+        'title=': None,
+        'username=': None,
+        'password=': None,
+        'url=': None,
+        'notes=': None,
     },
-    'getpass': None,
     'show':  {
         'entry': None,
         'group': None,
     },
+    'purge': {
+        'recycle': {
+            '--older-than': None,
+        },
+    },
+    'stats': None,
+    'merge': {
+        '--keyfile': None,
+    },
+    'kdf': {
+        'show': None,
+        'tune': {
+            '--target-ms': None,
+            '--memory': None,
+            '--parallelism': None,
+        },
+    },
+    'settings': {
+        'compression': {
+            'none': None,
+            'gzip': None,
+        },
+        'cipher': {
+            'aes256': None,
+            'chacha20': None,
+        },
+    },
+    'audit': {
+        'passwords': None,
+    },
     'exit': None,
     'quit': None,
-    'list': None,
-    'ls': None,
+    'use': None,
+    'list': {
+        '--tag': None,
+        '--expired': None,
+    },
+    'ls': {
+        '--tag': None,
+        '--expired': None,
+    },
+    'expiring': {
+        '--within': None,
+    },
+}
+GBLSettings = {
+    'currentGrp': None,
+    'weakEntropyBits': 60,
+    'chunkSize': 1024 * 1024,
+    'binaryHashes': None,
+    'index': None,
+    'generation': 0, # Bumped for every change to the database, see _dbChanged
+    'findCache': OrderedDict(), # Shared by all the open databases
+    'findCacheSize': 128,
+    'findCacheHits': 0,
+    'findCacheMisses': 0,
+    'projection': None,
+    'dbName': None,
+    'dbSessions': OrderedDict(),
+    'clipBackend': 'auto', # auto, wl-copy, xclip, osc52, or fake. See --clip-backend
+    'clipClearSecs': 20,
+    'clipTimer': None,
+    'clipText': None, # What was copied, so it's only cleared if still on the clipboard
+    'fakeClipboard': None,
+    'otpCache': {}, # entry uuid, (otp field value, TOTP settings from _parseOtp)
+    'wordLists': {}, # word list file, tuple of words. Read once for genpass --words
+    'otpWatch': None, # (title, TOTP settings) shown in the bottom toolbar
+    'cmdStart': 0.0, # perf_counter when the current command was entered, for audit latency
+    'expiryWarnWithin': timedelta(days=7), # Bottom toolbar warns of entries expiring this soon
+    'expiryWarning': None, # (dbName, generation, perf_counter, text) of the last toolbar warning
+    'keyfile': None, # Path of the keyfile, None if the database has no keyfile
+    'transformedKey': None, # KDF output, so saves and reloads don't run the KDF again
 }
-GBLSettings = {'currentGrp': None }
+clipLock = threading.Lock() # Clipboard timer runs in it's own thread
+# Password generator defaults. genpass options change them for one password
+genPassDefaults = {'mode': 'chars', 'length': 20, 'classes': 'ulds', 'words': 5,
+                   'wordlist': '/usr/share/dict/words', 'clip': False}
+genPassClasses = {'u': string.ascii_uppercase, 'l': string.ascii_lowercase,
+                  'd': string.digits, 's': string.punctuation}
+genPassHint = HTML(" Type <b>!gen</b> [genpass options] to generate a password")
+# Values for the settings command
+saveSettingValues = {'compression': ('none','gzip'), 'cipher': ('aes256','chacha20')}
+cipherIVSizes = {'aes256': 16, 'chacha20': 12, 'twofish': 16}
+# GBLSettings kept for each open database, swapped in by _useDb
+dbStateKeys = ('dbName','currentGrp','binaryHashes','index','generation','projection','keyfile','transformedKey')
+# Field name to position in the _entryProjection rows
+projectionFields = {'title': 1, 'username': 2, 'url': 3, 'path': 4, 'notes': 5}
+# Second level labels sold under country code tlds, like example.co.uk
+secondLevelLabels = {'ac','co','com','edu','gov','ltd','me','mil','net','nic','org','plc','sch'}
 
 def cls():
     os.system('cls' if os.name == 'nt' else 'clear')
@@ -147,9 +345,10 @@ def addEntry() -> tuple:
     logger.debug(f"entry_username={entry_username!r}")
 
     logger.info('Prompt user for entry password')
+    genText = ""
     while True:
         try:
-            entry_password = entrySession.prompt(message='Password > ')
+            entry_password = entrySession.prompt(message='Password > ',default=genText,bottom_toolbar=genPassHint)
         except KeyboardInterrupt:
             logger.debug("Keyboard Interrupt. Prompt user if they want to continue")
             if _confirm("Cancel Adding Entry "):
@@ -159,7 +358,9 @@ def addEntry() -> tuple:
             else: # Back to prompt for new entry password
                 pass
         else:
-            break
+            if not entry_password.startswith('!gen'):
+                break
+            genText = _genPassPrompt(entry_password) # Back to prompt with the generated password
 
     logger.info('Prompt user for entry url')
     while True:
@@ -176,6 +377,21 @@ def addEntry() -> tuple:
             break
     logger.debug(f"entry_url={entry_url!r}")
 
+    logger.info('Prompt user for entry tags')
+    while True:
+        try:
+            entry_tags = entrySession.prompt(message='Tags (separated by ;) > ')
+        except KeyboardInterrupt:
+            logger.debug("Keyboard Interrupt. Prompt user if they want to continue")
+            if _confirm("Cancel Adding Entry "):
+                logger.info("Cancel adding entry by user")
+                return (False,"Adding entry cancelled by user")
+            else: # Back to prompt for new entry tags
+                pass
+        else:
+            break
+    logger.debug(f"entry_tags={entry_tags!r}")
+
     logger.info('Prompt user for entry notes')
     while True:
         try:
@@ -194,9 +410,18 @@ def addEntry() -> tuple:
             break
     logger.debug(f"entry_notes={entry_notes!r}")
 
+    # Custom fields
+    entry_fields = {}
+    if _confirm("Add custom fields "):
+        entry_fields = _promptCustomFields(entrySession,{})
+        if entry_fields is None:
+            logger.info("Cancel adding entry by user")
+            return (False,"Adding entry cancelled by user")
 
     # Create entry object
-    theEntry = kp.add_entry(entry_group,entry_title,entry_username,entry_password,entry_url,entry_notes)
+    theEntry = kp.add_entry(entry_group,entry_title,entry_username,entry_password,entry_url,entry_notes,tags=_splitTags(entry_tags))
+    for fldName,fldValue in entry_fields.items():
+        theEntry.set_custom_property(fldName,fldValue[0],protect=fldValue[1])
     logger.debug(f"entry in memory: uuid={theEntry.uuid}, theEntry={theEntry}")
 
     displayEntry(theEntry)
@@ -294,8 +519,209 @@ def addGroup() -> tuple:
         kp.delete_group(tmpGroup)
         return (False, "Adding group cancelled")
 
+def attachmentAction(action:str,attachOptions:str) -> None:
+    """Attach, detach, and extract command validation
+
+    Args:
+        action (str): attach | detach | extract
+        attachOptions (str): Entry uuid, followed by the file path (attach)
+            or the attachment name (detach/extract)
+          Example: 1234-aaa-bbb service.keytab --to /tmp/svc.keytab
+    """
+    logger.debug(f"Parsing {action} command")
+    attachParts = _noNone(attachOptions).strip().split(' ',1)
+    logger.debug(f"attachParts = {attachParts}")
+    if len(attachParts) < 2 or attachParts[1].strip() == "":
+        print(f"Invalid/Incomplete {action} command")
+        helpAction(action)
+        return
+    try:
+        entryUUID = uuid.UUID(attachParts[0])
+    except ValueError:
+        print_formatted_text(FormattedText([
+            ('class:red','Invalid UUID'),
+        ]),style=mainStyles)
+        return
+
+    theEntry = kp.find_entries(uuid=entryUUID,first=True)
+    if theEntry is None: # Entry not found.. Nothing to do
+        logger.info(f"entry uuid {entryUUID} was not found")
+        print_formatted_text(FormattedText([
+            ('class:red','Unable to find entry for uuid'),
+        ]),style=mainStyles)
+        return
+
+    attachName = attachParts[1].strip()
+    match action:
+        case 'attach':
+            success,msg = attachFile(theEntry,Path(attachName).expanduser())
+        case 'detach':
+            success,msg = detachFile(theEntry,attachName)
+        case 'extract':
+            destPath = None
+            if attachName.find(' --to ') != -1:
+                attachName,destPath = attachName.rsplit(' --to ',1)
+                attachName = attachName.strip()
+                destPath = Path(destPath.strip()).expanduser()
+            success,msg = extractFile(theEntry,attachName,destPath)
+
+    if success:
+        print_formatted_text(FormattedText([('class:green',f'{msg}')]),style=mainStyles)
+    else:
+        print_formatted_text(FormattedText([('class:red',f'{msg}')]),style=mainStyles)
+    return
+
+def attachFile(theEntry,filePath:Path) -> tuple:
+    """Attach a file to an entry, and save the db
+
+    The file is hashed in chunks first. If the database already has a
+    binary with the same content, that binary is used and the file is not
+    loaded. Otherwise it is read once into the new binary.
+
+    Args:
+        theEntry (PyKeePass.Entry): Entry the file is being attached to
+        filePath (Path): File to attach
+
+    Returns:
+        tuple: (status,msg)
+            status (bool):
+                True - File attached and db saved
+                False - File not attached
+            msg (str): message detail for the status
+    """
+    logger.info(f"Attaching file {filePath} to entry uuid: {theEntry.uuid}")
+    if not filePath.is_file():
+        logger.info(f"File not found: {filePath}")
+        return (False,f"File not found: {filePath.resolve()}")
+    if _findAttachment(theEntry,filePath.name) is not None:
+        return (False,f"Entry already has an attachment named {filePath.name}")
+
+    fileHash = hashlib.sha256()
+    try:
+        with open(filePath,"rb",buffering=GBLSettings['chunkSize']) as theFile:
+            while chunk := theFile.read(GBLSettings['chunkSize']):
+                fileHash.update(chunk)
+        binaryHashes = _binaryHashes()
+        binID = binaryHashes.get(fileHash.digest())
+        if binID is None: # New content, read it once
+            fileData = filePath.read_bytes()
+            binHash = hashlib.sha256(fileData).digest() # File could have changed since it was hashed
+            binID = binaryHashes.get(binHash)
+            if binID is None:
+                binID = kp.add_binary(fileData)
+                binaryHashes[binHash] = binID
+                logger.info(f"Added binary id {binID}, {len(fileData)} bytes")
+            del fileData
+        else:
+            logger.info(f"Same content as binary id {binID}, reusing it")
+    except OSError as oopsError:
+        logger.error(f"Unable to read {filePath}: {oopsError}")
+        return (False,f"Unable to read {filePath}: {oopsError}")
+
+    theEntry.add_attachment(binID,filePath.name)
+    _saveEntry(theEntry)
+    return (True,f"Attached {filePath.name} ({_binarySize(binID)} bytes)")
+
+def auditAction(auditOptions:str) -> None:
+    """Audit command validation
+
+    Args:
+        auditOptions (str): What to audit and it's options.
+          Example: passwords /data/sha1-hashes.txt
+          Would audit all entry passwords against the hash file
+    """
+    logger.debug("Parsing audit command")
+    xtmp = _noNone(auditOptions).strip()
+    if xtmp == "": # Nothing extra, same as the stats command
+        statsAction()
+        return
+
+    auditParts = xtmp.split(' ',1)
+    logger.debug(f"auditParts = {auditParts}")
+    match auditParts[0].lower():
+        case 'passwords':
+            hashFile = None
+            if len(auditParts) > 1:
+                hashFile = Path(auditParts[1].strip())
+                if not hashFile.is_file():
+                    logger.info(f"Hash file not found: {hashFile.resolve()}")
+                    print_formatted_text(FormattedText([
+                        ('class:red',f'Hash file not found: {hashFile.resolve()}'),
+                    ]),style=mainStyles)
+                    return
+            auditPasswords(hashFile)
+        case _: # Catch all
+            print("Invalid/Incomplete audit command")
+            helpAction('audit')
+    return
+
+def auditPasswords(hashFile=None) -> None:
+    """Audit the password strength of all entries, and if they are in a breach list
+
+    Each password is hashed and looked up once. The hash file is memory
+    mapped, so only the pages the binary search touches are read.
+    Entries in the recycle bin are not audited.
+
+    Args:
+        hashFile (Path): Default None. Sorted SHA-1 hash file to check passwords against.
+            If None, only the password strength is checked.
+    """
+    logger.info(f"Auditing entry passwords. Hash file: {hashFile}")
+    startTime = time.perf_counter()
+
+    # Collect the entries to audit
+    auditEntries = {}
+    auditPwds = []
+    for grp,grpPath,inRecycle in _walkGroups():
+        if inRecycle:
+            continue
+        for entry in grp.entries:
+            entryPass = _noNone(_entryFields(entry).get('Password'))
+            if entryPass == "": # Nothing to audit. stats reports these
+                continue
+            auditEntries[entry.uuid] = entry
+            auditPwds.append((entry.uuid,entryPass))
+    logger.info(f"Passwords to audit: {len(auditPwds)}")
+
+    weakEntries = []
+    breachedEntries = []
+    theFile = None
+    hashMap = None
+    try:
+        if hashFile is not None:
+            theFile = open(hashFile,"rb")
+            hashMap = mmap.mmap(theFile.fileno(),0,access=mmap.ACCESS_READ)
+        for entryUUID,entryPass in auditPwds:
+            entryUUID,entropyBits,breached = _auditPassword(entryUUID,entryPass,hashMap)
+            if entropyBits < GBLSettings['weakEntropyBits']:
+                weakEntries.append(auditEntries[entryUUID])
+            if breached:
+                breachedEntries.append(auditEntries[entryUUID])
+    except (OSError,ValueError) as oopsError:
+        logger.error(f"Unable to read hash file {hashFile}: {oopsError}")
+        print_formatted_text(FormattedText([
+            ('class:red',f'Unable to read hash file {hashFile}: {oopsError}'),
+        ]),style=mainStyles)
+        return
+    finally:
+        if hashMap is not None:
+            hashMap.close()
+        if theFile is not None:
+            theFile.close()
+
+    elapsed = time.perf_counter() - startTime
+    logger.info(f"Audited {len(auditPwds)} passwords in {elapsed:.3f} seconds. Weak: {len(weakEntries)}, Breached: {len(breachedEntries)}")
+    print("=" * 93)
+    print(f"Weak passwords (under {GBLSettings['weakEntropyBits']} bits): {len(weakEntries)}")
+    displayEntriesTable(weakEntries)
+    if hashFile is not None:
+        print(f"Breached passwords (found in {hashFile}): {len(breachedEntries)}")
+        displayEntriesTable(breachedEntries)
+    print(f"Audited {len(auditPwds)} passwords in {elapsed:.3f} seconds")
+    return
+
 def chgDbPass() -> tuple:
-    """Change database password
+    """Change database password, and keyfile
     Returns:
         tuple: (status,msg)
             status (bool):
@@ -317,7 +743,7 @@ def chgDbPass() -> tuple:
         else:
             break
     # is password the current
-    if xtmp != kp.password:
+    if xtmp != _noNone(kp.password):
         logger.info("Current password entered did not match")
         return(False,"Password does not match current database password")
 
@@ -333,8 +759,32 @@ def chgDbPass() -> tuple:
         else:
             break
 
-    # Make sure new password is not blank
-    if newpwd == "":
+    # Get new keyfile from user
+    logger.info("prompt user for new db keyfile")
+    curKeyfile = GBLSettings['keyfile']
+    while True:
+        try:
+            xtmp = tmpSession.prompt(f"Enter NEW keyfile (blank to keep {curKeyfile if curKeyfile is not None else 'none'}, '-' for no keyfile): ")
+        except KeyboardInterrupt:
+            logger.info("Keyboard Interrupt. Prompt user for new db keyfile")
+            logger.info("Cancel changing db password")
+            return(False,"Cancel changing db password")
+        else:
+            break
+    xtmp = xtmp.strip()
+    newKeyfile = curKeyfile
+    if xtmp == '-':
+        newKeyfile = None
+    elif xtmp != "":
+        newKeyfile = Path(xtmp).expanduser()
+    newKeyData = None
+    if newKeyfile is not None:
+        success,newKeyData = _readKeyfile(newKeyfile)
+        if not success: # newKeyData is why
+            return(False,newKeyData)
+
+    # Make sure new password is not blank, unless there is a keyfile
+    if newpwd == "" and newKeyfile is None:
         logger.info("New password invalid")
         return(False,"New database password invalid")
 
@@ -343,8 +793,11 @@ def chgDbPass() -> tuple:
     if _confirm("Change the database password "):
         logger.info("Saving new database password")
         try:
-            kp.password = newpwd
-            kp.save()
+            kp.password = newpwd if newpwd != "" else None
+            kp.keyfile = _keyfileStream(newKeyData)
+            GBLSettings['transformedKey'] = None # Cached key is for the old credentials
+            _saveDb()
+            GBLSettings['keyfile'] = newKeyfile
             logger.info("Database password changed")
             return(True,"Successfully changed database password")
         except Exception as oopsError:
@@ -377,13 +830,34 @@ def helpAction(cmd=None) -> None:
             print("  Example: To add an entry to the database")
             print("    add entry")
             print(" Note, the default group/path for the entry is the current location")
+        case 'attach':
+            print("attach: Attach a file to an entry")
+            print("Usage: attach <uuid> <file path>")
+            print(" The file is stored in the database with the file's name.")
+            print(" A file with the same content as one already in the database is only stored once.")
+            print(" Example: To attach a keytab to the entry with uuid of 1234-aaa-bbb")
+            print("   attach 1234-aaa-bbb /tmp/service.keytab")
+        case 'detach':
+            print("detach: Remove an attachment from an entry")
+            print("Usage: detach <uuid> <attachment name>")
+            print(" Example: To remove service.keytab from the entry with uuid of 1234-aaa-bbb")
+            print("   detach 1234-aaa-bbb service.keytab")
+        case 'extract':
+            print("extract: Save an attachment of an entry to a file")
+            print("Usage: extract <uuid> <attachment name> [--to <file path>]")
+            print(" file path : optional. Default is the attachment name in the current directory")
+            print(" Example: To save service.keytab from the entry with uuid of 1234-aaa-bbb")
+            print("   extract 1234-aaa-bbb service.keytab --to /tmp/svc.keytab")
         case 'delete' | 'del':
             pass
             print("delete: is used to delete an entry or group")
             print("Usage: delete [ entry | group ] [<uuid>]")
+            print("       delete group [<uuid>] [--dry-run]")
             print(" uuid : optional. the UUID for the entry or group")
             print(" If the uuid is not provided a list is presented to chose from.")
             print("  The list of entries will be for those in the current location.")
+            print(" Deleting a group deletes all it's subgroups and entries with a single save.")
+            print(" --dry-run : optional. Only show what deleting the group would delete")
             print(" Example: To delete a group with uuid of aabbcde-aaaa-bbb")
             print("  delete group aabbcde-aaaa-bbb")
         case 'edit':
@@ -397,24 +871,111 @@ def helpAction(cmd=None) -> None:
         case 'find':
             print("find: Used to find entries in the database")
             print("Usage: find ['title' | 'username'] <string to find>")
+            print("       find field <field name>=<value>")
+            print("       find tag <tag>[,<tag>...] | <tag>[|<tag>...]")
+            print("       find url <host> | *.<host> | <host pattern>")
+            print("       find <field>~<pattern> [<field>~<pattern>...]")
+            print("       find --all-dbs <any of the above>")
             print(" Example: To find all entries with Strongmail UI in the title")
             print("   find entry Strongmail UI")
             print("   Will find all records where the title field contains `Strongmail UI` case insensitve")
+            print(" Example: To find entries by more than one field. All must match, case insensitive")
+            print("   find title~Strongmail UI username~bob path~Prod")
+            print("   Fields are title, username, url, path, notes. Patterns are regular expressions")
+            print(" Example: To search every open database")
+            print("   find --all-dbs title~web")
+            print(" Example: To find all entries with the custom field env set to prod")
+            print("   find field env=prod")
+            print("   Field name and value must match exactly, case insensitive")
+            print(" Example: To find entries with both the prod and db tags, or either tag")
+            print("   find tag prod,db")
+            print("   find tag prod|db")
+            print(" Example: To find entries for a site, and it's subdomains")
+            print("   find url github.com")
+            print("   Finds github.com, www.github.com, and api.github.com. *.github.com finds only")
+            print("   the subdomains. Other patterns use * and ?, like find url git*.example.com")
             print("Results will be displayed on the console")
         case 'chgpwd':
             print("chgpwd: Used to change the database password ")
             print("A prompt for current password is shown so password can be changed")
+            print("The keyfile can also be changed, or removed with '-'")
         case 'chggrp' | 'cd':
             print("chgrp: is used to change the current group/path")
             print("A list of groups/paths will be shown to choose from")
         case 'getpass':
             print("getpass: used to display the password of an entry")
-            print("Usage: getpass <uuid>")
+            print("Usage: getpass [--clip] <uuid>")
             print("Result will be the password displayed for the entry to the console")
+            print(" --clip : optional. Copy the password to the clipboard instead of displaying it.")
+            print("  The clipboard is cleared after the --clip-clear seconds given at startup (default 20)")
+        case 'getotp':
+            print("getotp: Display the current TOTP code of an entry with an otp field")
+            print("Usage: getotp [--watch] <uuid>")
+            print("       getotp --stop")
+            print(" --watch : optional. Keep the code in the bottom toolbar, refreshed every second")
+            print(" --stop : Remove the code from the bottom toolbar")
+            print(" The otp field is an otpauth://totp/ URI, as saved by KeePassXC")
+        case 'genpass':
+            print("genpass: Generate a random password")
+            print("Usage: genpass [--length <N>] [--no-upper] [--no-lower] [--no-digits] [--no-symbols]")
+            print("               [--pronounceable] [--words <N> [--wordlist <file>]] [--clip]")
+            print(" N : optional. Length of the password, default 20. Or the number of words, default 5")
+            print(" --no-... : optional. Leave that class of characters out")
+            print(" --pronounceable : optional. Alternating consonants and vowels. Symbols are not used")
+            print(" --words : optional. Diceware style words joined with -")
+            print("  file : optional. One word per line. Default /usr/share/dict/words")
+            print(" --clip : optional. Copy to the clipboard instead of displaying it")
+            print(" In add and edit, type !gen with the same options at the password prompt")
+            print(" Example: To generate a 32 character password without symbols")
+            print("   genpass --length 32 --no-symbols")
+        case 'rotate':
+            print("rotate: Generate new passwords for all entries a find matches, saved with a single save")
+            print("Usage: rotate <find options> [genpass options]")
+            print(" find options : same as the find command. Example: tag prod")
+            print(" genpass options : same as the genpass command, except --clip")
+            print(" The old passwords are kept in each entry's history")
+            print(" Example: To rotate the passwords of all entries tagged svc to 32 characters")
+            print("   rotate tag svc --length 32")
+        case 'dupes':
+            print("dupes: Find duplicate entries, and merge or recycle them with a single save")
+            print("Usage: dupes [--titles] [--similarity <0-1>] [--merge | --recycle]")
+            print(" Duplicates are entries with the same url host and username")
+            print(" --titles : also find entries with similar titles. Default similarity 0.7")
+            print(" --merge : the newest entry of each set gets the fields, tags, and attachments")
+            print("   it is missing from the others, and the others are put in the recycle bin")
+            print(" --recycle : the newest entry of each set is kept, the others are put in the recycle bin")
+            print(" Entries in the recycle bin are not checked")
+            print(" Example: To list entries with the same site and username, or similar titles")
+            print("   dupes --titles")
+        case 'history':
+            print("history: Display the past versions of an entry, with what changed in each")
+            print("Usage: history entry [<uuid>]")
+            print(" uuid : optional. the UUID for the entry")
+            print(" If the uuid is not provided a list is presented to chose from.")
+            print(" Password values are never displayed, only that they changed.")
+        case 'prune-history':
+            print("prune-history: Trim the history of all entries, saved with a single save")
+            print("Usage: prune-history [--keep <N>] [--max-bytes <size>]")
+            print(" N : optional. Keep the newest N history versions for each entry")
+            print(" size : optional. Keep the newest history versions for each entry up to size bytes.")
+            print("  A K, M, or G suffix can be used. Example: 64K")
+            print(" Defaults are the database history settings (max items and max size).")
+            print(" Example: To keep at most 5 versions of each entry")
+            print("   prune-history --keep 5")
         case 'list' | 'ls':
             print("list: Display entries in current group/path")
-            print("Usage: list")
-            print("       ls")
+            print("Usage: list [--tag <tag>[,<tag>...] | <tag>[|<tag>...]] | [--expired]")
+            print("       ls [--tag <tag>[,<tag>...] | <tag>[|<tag>...]] | [--expired]")
+            print(" --tag : optional. Only entries with all (,) or any (|) of the tags")
+            print(" --expired : optional. Only entries that have expired")
+        case 'expiring':
+            print("expiring: Display entries that expire soon, soonest first")
+            print("Usage: expiring [--within <duration>]")
+            print(" duration : optional. Default 30d. Number followed by h (hours), d (days), or w (weeks)")
+            print(" Entries that have already expired are shown by ls --expired")
+            print(" Entries in the recycle bin are not shown")
+            print(" Example: To display the entries expiring in the next week")
+            print("   expiring --within 1w")
         case 'show':
             print("show: Used to display details about a specific entry, or group")
             print("Usage: show [ entry | group ] [<uuid>]")
@@ -423,6 +984,87 @@ def helpAction(cmd=None) -> None:
             print("  The list of entries will be for those in the current location.")
             print(" Example: To show the details for the entry with uuid of 1234-aaa-bbb")
             print("  list entry 1234-aaa-bbb")
+        case 'audit':
+            print("audit: Display a health report for the database, or audit the entry passwords")
+            print("Usage: audit [ passwords [<sha1_file>] ]")
+            print(" Without options this is the same as the stats command")
+            print(" passwords : Scores the strength (entropy bits) of each entry password.")
+            print(f"  Passwords under {GBLSettings['weakEntropyBits']} bits are reported as weak.")
+            print(" sha1_file : optional. Sorted file of SHA-1 password hashes (one hash per line, hex,")
+            print("  optionally followed by :count). Passwords found in the file are reported as breached.")
+            print("  The file is memory mapped and binary searched, it is never loaded into memory.")
+            print(" Example: To audit passwords against a local breach list")
+            print("   audit passwords /data/pwned-passwords-sha1-ordered-by-hash.txt")
+        case 'stats':
+            print("stats: Display statistics and a health report for the database")
+            print("Usage: stats")
+            print(" Reports entries per group, recycle bin size, oldest/newest modified entries,")
+            print(" entries with no password, duplicate passwords, and reused user names.")
+            print(" Entries in the recycle bin are not checked for duplicates or reuse.")
+            print(" Also shows the find cache size, hits, and misses.")
+        case 'move':
+            print("move: Move all the entries a find would return to a group")
+            print("Usage: move ['title' | 'username'] <string to find> --to <group path>")
+            print(" group path : group names separated by /. Use / for the root group")
+            print(" All entries are moved in memory, then saved with a single save.")
+            print(" Example: To move all entries with web in the title to group Servers > Prod")
+            print("   move title web --to Servers/Prod")
+        case 'set':
+            print("set: Set a field to the same value for all the entries a find would return")
+            print("Usage: set <field>=<value> where ['title' | 'username'] <string to find>")
+            print(" field : one of title, username, password, url, notes")
+            print(" value : put it in quotes if it has ' where ' in it. Example: notes=\"see where\" where ...")
+            print("  For password leave the value blank, password=, and it is prompted for")
+            print(" All entries are changed in memory, then saved with a single save.")
+            print(" The old values are kept in each entry's history")
+            print(" Example: To set the url for all entries with svc in the user name")
+            print("   set url=https://login.example.com where username svc")
+        case 'purge':
+            print("purge: Permanently delete everything in the database recycle bin")
+            print("Usage: purge recycle [--older-than <age>]")
+            print(" age : optional. Only purge what was put in the recycle bin more than age ago.")
+            print("  Format is a number followed by h (hours), d (days), or w (weeks)")
+            print(" Everything is deleted with a single save to the database")
+            print(" Example: To purge entries and groups recycled more than 90 days ago")
+            print("   purge recycle --older-than 90d")
+        case 'merge':
+            print("merge: Merge another KeePass database into this one, saved with a single save")
+            print("Usage: merge <other.kdbx> [--keyfile <keyfile>]")
+            print(" other.kdbx : the database to merge from. It is not changed")
+            print(" keyfile : optional. keyfile for the other database")
+            print(" Entries and groups are matched by UUID. When both changed, the most recently")
+            print(" modified wins and the other version is kept in the entry history.")
+            print(" Entries and groups deleted in either database (deleted objects) stay deleted")
+            print(" Example: To merge a field copy into the master database")
+            print("   merge field-copy.kdbx")
+        case 'kdf':
+            print("kdf: Show or tune the key derivation (KDF) settings of the database")
+            print("Usage: kdf show")
+            print("       kdf tune --target-ms <ms> [--memory <size>] [--parallelism <threads>]")
+            print(" show : KDF settings, and how long the KDF takes on this machine")
+            print(" tune : Benchmark the KDF on this machine, and propose settings that take")
+            print("        about <ms> milliseconds. Used for each open and save of the database.")
+            print("  size : optional. Argon2 memory, a number optionally followed by K, M, or G")
+            print("  threads : optional. Argon2 parallelism")
+            print(" The settings are written to the database on the next save. tune needs a KDBX 4 database")
+            print(" Example: To have the database unlock in about half a second")
+            print("   kdf tune --target-ms 500")
+        case 'settings':
+            print("settings: Show or change the compression and cipher the database is saved with")
+            print("Usage: settings [ compression none|gzip | cipher aes256|chacha20 ]")
+            print(" No options shows the current settings")
+            print(" compression : none or gzip compression of the database contents")
+            print(" cipher : aes256 or chacha20 encryption")
+            print(" Changing a setting needs a KDBX 4 database")
+            print(" The database is saved with the new setting, and the save time and file")
+            print(" size with the old and new settings are shown")
+            print(" Example: To save without compression")
+            print("   settings compression none")
+        case 'use':
+            print("use: Switch to another open database, or list the open databases")
+            print("Usage: use [<database name>]")
+            print(" database name : optional. Name of the database file without the .kdbx")
+            print(" Databases are opened by giving more than one <KEEPASS_DB> when starting")
         case 'quit' | 'exit':
             print("Exit application")
         case _: # Catchall
@@ -452,7 +1094,7 @@ def displayGroupHeader(grp) -> None:
             ]),style=mainStyles)
         return
 
-    logger.info(f"Displaying group header info for group uuid: {grp.uuid} group name: {grp.name!r}")
+    logger.info("Displaying group header info for group uuid: %s group name: %r",grp.uuid,grp.name)
     print("=" * 93)
     print_formatted_text(FormattedText([
         ('class:fldname','Group: '),('',f'{grp.name}    '),
@@ -466,12 +1108,75 @@ def displayGroupHeader(grp) -> None:
         ('',f'{_noNone(grp.notes)}'),
     ]),style=mainStyles)
     print("=" * 93)
-    logger.debug(f'Group Name: {grp.name!r}')
-    logger.debug(f'Group uuid: {grp.uuid}')
-    logger.debug(f'Group path: {grp.path}')
-    logger.debug(f'mtime: {grp.mtime.astimezone().strftime('%Y-%m-%d %I:%M:%S %p')}')
-    logger.debug(f'ctime: {grp.ctime.astimezone().strftime('%Y-%m-%d %I:%M:%S %p')}')
-    logger.debug(f'Notes: {grp.notes!r}')
+    if logger.isEnabledFor(logging.DEBUG): # Skip the date formatting when not logged
+        logger.debug('Group Name: %r',grp.name)
+        logger.debug('Group uuid: %s',grp.uuid)
+        logger.debug('Group path: %s',grp.path)
+        logger.debug('mtime: %s',grp.mtime.astimezone().strftime('%Y-%m-%d %I:%M:%S %p'))
+        logger.debug('ctime: %s',grp.ctime.astimezone().strftime('%Y-%m-%d %I:%M:%S %p'))
+        logger.debug('Notes: %r',grp.notes)
+    return
+
+def displayGroupTree(grp) -> dict:
+    """Display the group and all it's subgroups as a tree with entry counts
+
+    Args:
+        grp (PyKeePass.Group): Group at the top of the tree
+
+    Returns:
+        dict: Summary of the subtree from _groupSubtree
+    """
+    subTree = _groupSubtree(grp)
+    logger.info(f"Displaying group tree for uuid: {grp.uuid}. Groups: {len(subTree['groups'])}, Entries: {subTree['entries']}")
+    for grpDepth,grpName,grpCount in subTree['tree']:
+        print(f"{'  ' * grpDepth}{grpName} ({grpCount} entries)")
+    print(f"Total: {len(subTree['groups'])} groups, {subTree['entries']} entries")
+    return subTree
+
+def displayEntryHistory(entry) -> None:
+    """Display the history versions of an entry, and the fields changed in each
+
+    Args:
+        entry (PyKeePass.Entry): Entry object to display the history for
+    """
+    versions = entry.history
+    logger.info(f"Displaying {len(versions)} history versions for entry uuid: {entry.uuid}")
+    versions.append(entry)
+    print("=" * 93)
+    print_formatted_text(FormattedText([
+        ('class:fldname','   Entry: '),('',f'{_noNone(entry.title)} '),
+        ('class:fldname','    UUID: '),('',f'{entry.uuid}\n'),
+        ('class:fldname',' History: '),('',f'{len(versions) - 1} versions'),
+    ]),style=mainStyles)
+    prevFields = None
+    for index,version in enumerate(versions):
+        verFields = _entryFields(version)
+        verLabel = 'Current' if index == len(versions) - 1 else f'Version {index + 1}'
+        print("-" * 93)
+        print_formatted_text(FormattedText([
+            ('class:fldname',f'{verLabel}  Modified: '),
+            ('',f"{version.mtime.astimezone().strftime('%Y-%m-%d %I:%M:%S %p')}"),
+        ]),style=mainStyles)
+        if prevFields is None:
+            print(" (oldest version)")
+        else:
+            changed = False
+            for fldName in sorted(set(prevFields) | set(verFields)):
+                oldVal = _noNone(prevFields.get(fldName))
+                newVal = _noNone(verFields.get(fldName))
+                if oldVal == newVal:
+                    continue
+                changed = True
+                if fldName == 'Password':
+                    print_formatted_text(FormattedText([('class:fldname',f' {fldName}: '),('','changed')]),style=mainStyles)
+                elif len(oldVal) > 40 or len(newVal) > 40 or '\n' in oldVal + newVal: # Too much to show
+                    print_formatted_text(FormattedText([('class:fldname',f' {fldName}: '),('',f'changed ({len(oldVal)} -> {len(newVal)} characters)')]),style=mainStyles)
+                else:
+                    print_formatted_text(FormattedText([('class:fldname',f' {fldName}: '),('',f'{oldVal!r} -> {newVal!r}')]),style=mainStyles)
+            if not changed:
+                print(" (no field changes)")
+        prevFields = verFields
+    print("=" * 93)
     return
 
 def displayEntriesTable(entries:list) -> None:
@@ -480,7 +1185,7 @@ def displayEntriesTable(entries:list) -> None:
     Args:
         entries (list): list of Entry classes
     """
-    logger.info(f"Displaying {len(entries)} entries")
+    logger.info("Displaying %d entries",len(entries))
     if entries is None:
         print(' -- No entries found --')
         return
@@ -503,13 +1208,70 @@ def displayEntriesTable(entries:list) -> None:
     print(divLine)
     return
 
+def displayExpiryTable(entries:list) -> None:
+    """Display a list of entries with when they expire
+
+    Args:
+        entries (list): list of Entry classes that expire
+    """
+    logger.info("Displaying %d expiring entries",len(entries))
+    if len(entries) == 0:
+        print(' -- No entries found --')
+        return
+    expiryAt = _getIndex()['expiryAt']
+    # Header
+    uuid = " UUID"[0:36].ljust(36)
+    title = "Title"[0:30].ljust(30)
+    expires = "Expires"[0:22].ljust(22)
+    divLine = "-" * 93
+    print(divLine)
+    print_formatted_text(f"{uuid} | {title} | {expires} |")
+    print(divLine)
+    # Details
+    for rec in entries:
+        uuid = f"{rec.uuid}"[0:36].ljust(36)
+        title = f"{rec.title}"[0:30].ljust(30)
+        expires = expiryAt[rec.uuid].astimezone().strftime('%Y-%m-%d %I:%M:%S %p')[0:22].ljust(22)
+        print_formatted_text(f"{uuid} | {title} | {expires} |")
+
+    print(divLine)
+    return
+
+def displayDbEntriesTable(dbEntries:list) -> None:
+    """Display a list of entries from more than one database
+
+    Args:
+        dbEntries (list): (database name, Entry) for each entry
+    """
+    logger.info("Displaying %d entries",len(dbEntries))
+    if len(dbEntries) == 0:
+        print(' -- No entries found --')
+        return
+    # Header
+    dbName = "Database"[0:12].ljust(12)
+    uuid = " UUID"[0:36].ljust(36)
+    title = "Title"[0:36].ljust(36)
+    divLine = "-" * 93
+    print(divLine)
+    print_formatted_text(f"{dbName} | {uuid} | {title} |")
+    print(divLine)
+    # Details
+    for dbRec,rec in dbEntries:
+        dbName = f"{dbRec}"[0:12].ljust(12)
+        uuid = f"{rec.uuid}"[0:36].ljust(36)
+        title = f"{rec.title}"[0:36].ljust(36)
+        print_formatted_text(f"{dbName} | {uuid} | {title} |")
+
+    print(divLine)
+    return
+
 def displayEntry(entry) -> None:
     """Display an entry on the console
 
     Args:
         entry (PyKeePass.Entry): Entry object that is being displayed
     """
-    logger.debug(f"displaying Entry: {entry}")
+    logger.debug("displaying Entry: %s",entry)
     if _noNone(entry.password) == "" :
         dplayPass = '-- Nothing set --'
     else:
@@ -522,7 +1284,8 @@ def displayEntry(entry) -> None:
         ('class:fldname','    Path: '),('',f'{_prettyPath(entry.path)}\n'),
         ('class:fldname','    User: '),('',f'{_noNone(entry.username)}\n'),
         ('class:fldname','Password: '),('',f'{dplayPass}\n'),
-        ('class:fldname','     URL: '),('',f'{_noNone(entry.url)}'),
+        ('class:fldname','     URL: '),('',f'{_noNone(entry.url)}\n'),
+        ('class:fldname','    Tags: '),('',f'{", ".join(entry.tags)}'),
     ]),style=mainStyles)
 
     print_formatted_text(FormattedText([
@@ -530,6 +1293,17 @@ def displayEntry(entry) -> None:
         ('class:fldname', ' Created: '),('',f'{entry.ctime.astimezone().strftime('%Y-%m-%d %I:%M:%S %p')}'),
     ]),style=mainStyles)
 
+    for fldName,fldValue,fldProtected in _customFields(entry):
+        print_formatted_text(FormattedText([
+            ('class:fldname', f'{fldName}: '),('','-----------------' if fldProtected else f'{_noNone(fldValue)}'),
+        ]),style=mainStyles)
+
+    # Attachment sizes come from the binary, the payload is not decoded
+    for attachment in entry.attachments:
+        print_formatted_text(FormattedText([
+            ('class:fldname', 'Attachment: '),('',f'{attachment.filename} ({_binarySize(attachment.id)} bytes)'),
+        ]),style=mainStyles)
+
     print_formatted_text(FormattedText([
         ('class:fldname', 'Notes: '),
     ]),style=mainStyles)
@@ -614,9 +1388,70 @@ def delAction(cmdOptions:str) -> None:
                 logger.info(f"Entry uuid={theEntry.uuid} was not deleted/recycled. {msg}")
                 print_formatted_text(FormattedText([('class:red',f'{msg}')]),style=mainStyles)
         case 'group':
-            #TODO: deleting an Group
-            print("TODO: Delete a Group not ready")
-            return
+            logger.debug("Delete a group has been requested")
+            # Dry run can be anywhere after group
+            dryRun = '--dry-run' in [x.lower() for x in cmdParts[1:]]
+            grpParts = [x for x in cmdParts[1:] if x.lower() != '--dry-run' and x != '']
+            theGroup = None
+            if len(grpParts) > 0: # Last part could be the uuid
+                # Confirm valid uuid
+                logger.debug(f"Determine if {grpParts[0]} is a valid UUID")
+                try:
+                    uniqueID = uuid.UUID(grpParts[0])
+                except ValueError:
+                    print_formatted_text(FormattedText([
+                        ('class:red','Invalid UUID'),
+                    ]),style=mainStyles)
+                    return
+                except Exception as oopsError:
+                    logger.critical(f"Unexpected error: {oopsError}",stack_info=True)
+                    print(f"CRITICAL: Unexpected error {oopsError}")
+                    traceback.print_exc()
+                    quit(1)
+            else: # No uuid get user to choose a group
+                logger.info("Prompting user for group to delete")
+                while True:
+                    try:
+                        theGroup = groupChoices(grpUUID=GBLSettings['currentGrp'].uuid)
+                    except KeyboardInterrupt:
+                        logger.debug("Keyboard Interrupt. Prompt user if they want to continue")
+                        if _confirm("Cancel Delete Group "):
+                            logger.info("Cancel delete group by user")
+                            return
+                        else: # Back to user prompt for group
+                            pass
+                    else:
+                        break
+                print(f" >> delete group {theGroup.uuid}{' --dry-run' if dryRun else ''}")
+
+            if theGroup is None: # User provided a uniqueID so go find it
+                theGroup = kp.find_groups(uuid=uniqueID,first=True)
+                if theGroup is None:
+                    logger.info(f"Group uuid {uniqueID} was not found")
+                    print_formatted_text(FormattedText([
+                        ('class:red','Unable to find Group uuid'),
+                    ]),style=mainStyles)
+                    return
+
+            # Preview of what is being deleted
+            displayGroupHeader(theGroup)
+            subTree = displayGroupTree(theGroup)
+            if dryRun:
+                logger.info(f"Dry run delete group uuid={theGroup.uuid}, groups={len(subTree['groups'])}, entries={subTree['entries']}")
+                print("Dry run, nothing was deleted")
+                return
+
+            logger.info(f"Delete group uuid={theGroup.uuid}, name={theGroup.name!r}")
+            success,msg = delGroup(theGroup,subTree)
+            if success: # Group successfully deleted/recycled
+                logger.info(f"Group uuid={theGroup.uuid}, {msg}")
+                print_formatted_text(FormattedText([('class:green',f'{msg}')]),style=mainStyles)
+            else: # Group was not deleted
+                logger.info(f"Group uuid={theGroup.uuid} was not deleted/recycled. {msg}")
+                print_formatted_text(FormattedText([('class:red',f'{msg}')]),style=mainStyles)
+        case _: # Catch all
+            print("Invalid/Incomplete delete command")
+            helpAction('delete')
     return
 
 def delEntry(theEntry) -> tuple:
@@ -684,16 +1519,132 @@ def delEntry(theEntry) -> tuple:
         case 0: # Put entry into Recycle Bin
             logger.info(f"Entry uuid: {theEntry.uuid} being put into database recycle bin")
             kp.trash_entry(theEntry)
+            _locationChanged(theEntry)
             _saveEntry(theEntry)
+            _auditEvent('delete','entry',theEntry.uuid,result='recycled')
             return (True,f'Entry in database recycle bin {kp.recyclebin_group}')
         case 1: # Permanently Delete Entry
             logger.info(f"Entry uuid: {theEntry.uuid} being permanently deleted. {theEntry}")
             kp.delete_entry(theEntry)
-            kp.save() # Not doing the _saveEntry as that method will touch the delete entry and cause problems
+            _addTombstones([theEntry.uuid])
+            _unindexEntry(theEntry.uuid)
+            _dbChanged()
+            _saveDb() # Not doing the _saveEntry as that method will touch the delete entry and cause problems
+            _auditEvent('delete','entry',theEntry.uuid,result='deleted')
             return (True,'Entry permanently deleted')
 
     return (False,'Delete entry canceled')
 
+def delGroup(theGroup,subTree:dict) -> tuple:
+    """Delete or Recycle a Group and everything under it in db
+
+    Will prompt user accordingly if the want delete/recycle or cancel the group deletion.
+    If the group is in the recycle bin, then user would be delete or cancel.
+    The whole subtree is moved/removed in memory and saved once.
+
+    Args:
+        theGroup (PyKeePass.Group): The Group object that is being deleted
+        subTree (dict): Summary of the group's subtree from _groupSubtree
+
+    Returns:
+        tuple:
+            status (bool):
+                True: Group was deleted/recycled
+                False: Group was not deleted/recycled
+            str:
+                Message to what happend. Example 'Group permanently deleted'
+    """
+    if theGroup.is_root_group:
+        logger.info("Root group can not be deleted")
+        return (False,"The root group can not be deleted")
+    recycleGrp = kp.recyclebin_group
+    if recycleGrp is not None and recycleGrp.uuid == theGroup.uuid:
+        logger.info("Recycle bin group can not be deleted")
+        return (False,"The recycle bin can not be deleted. Use the purge command to empty it")
+
+    grpSummary = f"{len(subTree['groups'])} groups and {subTree['entries']} entries"
+    usrOptions=[]
+    if not subTree['inRecycle']:
+        usrOptions.append((0,f"Put Group in Recycle Bin {recycleGrp} ({grpSummary})"))
+    usrOptions.append((1,f'Permanently delete Group ({grpSummary})'))
+    usrOptions.append((2,'Cancel deleting Group'))
+    try:
+        logger.debug("Prompt user to Recycle, perm delete, or Cancel")
+        usrChoice = choice(
+            message="Options for deleting Group",
+            options=usrOptions,
+            default=2,
+            bottom_toolbar=HTML(" Press <b>[Up]</b>/<b>[Down]</b> to select, <b>[Enter]</b> to accept.")
+            )
+    except KeyboardInterrupt:
+        logger.debug("Keyboard Interrupt. Prompt user to delete or cancel")
+        return (False,"Deleting Group canceled")
+
+    logger.debug(f"User chose: {usrChoice}")
+    # Current group can't be left pointing inside a deleted group
+    if GBLSettings['currentGrp'].uuid in subTree['groups'] and usrChoice in (0,1):
+        GBLSettings['currentGrp'] = theGroup.parentgroup
+        logger.info(f"Current group was in deleted group. Setting current group to uuid: {GBLSettings['currentGrp'].uuid}")
+    match usrChoice:
+        case 0: # Put group into Recycle Bin
+            logger.info(f"Group uuid: {theGroup.uuid} being put into database recycle bin. {grpSummary}")
+            kp.trash_group(theGroup)
+            _locationChanged(theGroup)
+            _saveGroup(theGroup)
+            _auditEvent('delete','group',theGroup.uuid,result='recycled',entries=subTree['entries'])
+            return (True,f'Group in database recycle bin {kp.recyclebin_group}. {grpSummary}')
+        case 1: # Permanently Delete Group
+            logger.info(f"Group uuid: {theGroup.uuid} being permanently deleted. {grpSummary}")
+            _addTombstones(_subtreeUUIDs(theGroup))
+            kp.delete_group(theGroup)
+            GBLSettings['index'] = None # Rebuilt on next use
+            try:
+                _dbChanged()
+                _saveDb() # Not doing the _saveGroup as that method will touch the deleted group
+            except Exception as oopsError:
+                logger.critical(f"Unexpected error: {oopsError}",stack_info=True)
+                print(f"CRITICAL: Unexpected error {oopsError}")
+                traceback.print_exc()
+                quit(1)
+            _auditEvent('delete','group',theGroup.uuid,result='deleted',entries=subTree['entries'])
+            return (True,f'Group permanently deleted. {grpSummary}')
+
+    return (False,'Delete group canceled')
+
+def detachFile(theEntry,attachName:str) -> tuple:
+    """Remove an attachment from an entry, and save the db
+
+    The binary is removed from the database when nothing else uses it.
+
+    Args:
+        theEntry (PyKeePass.Entry): Entry the attachment is being removed from
+        attachName (str): Name of the attachment
+
+    Returns:
+        tuple: (status,msg)
+            status (bool):
+                True - Attachment removed and db saved
+                False - Attachment not removed
+            msg (str): message detail for the status
+    """
+    logger.info(f"Detaching {attachName!r} from entry uuid: {theEntry.uuid}")
+    attachment = _findAttachment(theEntry,attachName)
+    if attachment is None:
+        return (False,f"Entry has no attachment named {attachName}")
+    if not _confirm(f"Remove attachment {attachName} "):
+        logger.info("Detach cancelled by user")
+        return (False,"Detach cancelled")
+
+    binID = attachment.id
+    attachment.delete()
+    # Other entries (or history) could still use the binary
+    if len(kp.find_attachments(id=binID,history=True)) == 0:
+        logger.info(f"Binary id {binID} no longer used, removing it")
+        kp.delete_binary(binID)
+        GBLSettings['binaryHashes'] = None # Binary ids have changed
+    _saveEntry(theEntry)
+    return (True,f"Removed attachment {attachName}")
+
 def editAction(editOptions:str) -> None:
     """Edit command validation
     This will edit an entry or a group
@@ -947,7 +1898,7 @@ def editEntry(theEntry) -> tuple:
     ]
     while True:
         try:
-            entry_password = entrySession.prompt(message=promptText,style=mainStyles,default=editText)
+            entry_password = entrySession.prompt(message=promptText,style=mainStyles,default=editText,bottom_toolbar=genPassHint)
         except KeyboardInterrupt:
             logger.debug("Keyboard Interrupt. Prompt user if they want to continue")
             if _confirm("Cancel Editing Entry "):
@@ -957,7 +1908,9 @@ def editEntry(theEntry) -> tuple:
             else: # Back to editing the Entry password
                 pass
         else:
-            break
+            if not entry_password.startswith('!gen'):
+                break
+            editText = _genPassPrompt(entry_password) # Back to prompt with the generated password
 
     # Edit url
     logger.info(f'Editing Entry uuid: {theEntry.uuid}, Prompt user for entry url')
@@ -983,6 +1936,29 @@ def editEntry(theEntry) -> tuple:
 
     logger.info(f"Editing Entry uuid: {theEntry.uuid}, entry_url={entry_url!r}")
 
+    # Edit tags
+    logger.info(f'Editing Entry uuid: {theEntry.uuid}, Prompt user for entry tags')
+    editText = ';'.join(theEntry.tags)
+    promptText = [
+        ('class:promptfield','Tags (separated by ;) >'),
+        ('','  '),
+    ]
+    while True:
+        try:
+            entry_tags = entrySession.prompt(message=promptText,style=mainStyles,default=editText)
+        except KeyboardInterrupt:
+            logger.debug("Keyboard Interrupt. Prompt user if they want to continue")
+            if _confirm("Cancel Editing Entry "):
+                # Cancel editing entry
+                logger.info("Edit Entry cancelled")
+                return (False,"Edit Entry cancelled")
+            else: # Back to editing the Entry tags
+                pass
+        else:
+            break
+
+    logger.info(f"Editing Entry uuid: {theEntry.uuid}, entry_tags={entry_tags!r}")
+
     # Prompt user if they want to edit the entry notes
     edtNotes = False
     if _confirm("Edit entry notes "):
@@ -1015,20 +1991,53 @@ def editEntry(theEntry) -> tuple:
 
         logger.debug(f"Editing Entry uuid: {theEntry.uuid}, entry_notes={entry_notes!r}")
 
+    # Prompt user if they want to edit the entry custom fields
+    curFields = {x[0]: (x[1],x[2]) for x in _customFields(theEntry)}
+    entry_fields = None
+    if _confirm(f"Edit custom fields ({len(curFields)}) "):
+        logger.info(f'Editing Entry uuid: {theEntry.uuid}, Prompt user for custom fields')
+        entry_fields = _promptCustomFields(entrySession,curFields)
+        if entry_fields is None:
+            logger.info("Edit Entry cancelled")
+            return (False,"Edit Entry cancelled")
+
     # Confirm with user to save the Entry
     if _confirm("Save Entry "):
+        oldFields = _entryFields(theEntry)
+        fieldsChanged = (
+            _noNone(oldFields.get('Title')) != entry_title
+            or _noNone(oldFields.get('UserName')) != entry_username
+            or _noNone(oldFields.get('Password')) != entry_password
+            or _noNone(oldFields.get('URL')) != entry_url
+            or _splitTags(';'.join(theEntry.tags)) != _splitTags(entry_tags)
+            or (edtNotes and _noNone(oldFields.get('Notes')) != entry_notes)
+            or (entry_fields is not None and entry_fields != curFields))
+        if not fieldsChanged and entryGrp.uuid == selGroup.uuid:
+            logger.info(f"Entry uuid: {theEntry.uuid} not changed, nothing to save")
+            return (False,"No changes to the entry")
+        if fieldsChanged: # Keep the current version in the entry history
+            theEntry.save_history()
         # Saving to the entry
         theEntry.title = entry_title
         theEntry.username = entry_username
         theEntry.password = entry_password
-        theEntry.entry_url = entry_url
+        theEntry.url = entry_url
+        theEntry.tags = _splitTags(entry_tags)
         if edtNotes:
             theEntry.notes = entry_notes
+        if entry_fields is not None:
+            for fldName in curFields.keys() - entry_fields.keys():
+                theEntry.delete_custom_property(fldName)
+            for fldName,fldValue in entry_fields.items():
+                if curFields.get(fldName) != fldValue:
+                    theEntry.set_custom_property(fldName,fldValue[0],protect=fldValue[1])
         if entryGrp.uuid != selGroup.uuid: # Group changed
             # Moving Entry to another group
             logger.info(f"Editing Entry uuid: {theEntry.uuid} moving from group UUID: {entryGrp.uuid} to group UUID: {selGroup.uuid}")
             kp.move_entry(theEntry,selGroup)
+            _locationChanged(theEntry)
         _saveEntry(theEntry)
+        _auditEvent('edit','entry',theEntry.uuid)
         return(True,theEntry)
     else: # Cancel adding entry
         logger.info("Cancel edit entry")
@@ -1112,6 +2121,7 @@ def editGroup(theGroup) -> tuple:
         if edtNotes:
             theGroup.notes = grp_notes
         _saveGroup(theGroup)
+        _auditEvent('edit','group',theGroup.uuid)
         return(True,theGroup)
     else: # Cancel Saving Group
         logger.info("Cancel save edited group")
@@ -1126,16 +2136,62 @@ def entryChoices(grp) -> tuple:
     Returns:
         tuple: Each row containing the entry.uuid, and entry.title
     """
-    logger.debug(f"Creating entry list for group UUID: {grp.uuid}. Entries: {len(grp.entries)}")
+    grpEntries = grp.entries
+    logger.debug("Creating entry list for group UUID: %s. Entries: %d",grp.uuid,len(grpEntries))
     tmpList = []
-    for entry in grp.entries:
+    for entry in grpEntries:
         entryRow = [entry.uuid,entry.title]
-        logger.debug(f"Appending entry.uuid={entry.uuid}, entry.title={entry.title}")
+        logger.debug("Appending entry.uuid=%s, entry.title=%s",entryRow[0],entryRow[1])
         tmpList.append(entryRow)
 
-    logger.debug(f"entry list records: {len(tmpList)}")
+    logger.debug("entry list records: %d",len(tmpList))
     return tuple(tmpList)
 
+def extractFile(theEntry,attachName:str,destPath=None) -> tuple:
+    """Write an attachment of an entry to a file
+
+    The binary is written in chunks straight from the database, without
+    making a copy of it.
+
+    Args:
+        theEntry (PyKeePass.Entry): Entry with the attachment
+        attachName (str): Name of the attachment
+        destPath (Path): Default None. File to write. None is the attachment name in the current directory,
+            without any directories in the name
+
+    Returns:
+        tuple: (status,msg)
+            status (bool):
+                True - Attachment written to file
+                False - Attachment not written
+            msg (str): message detail for the status
+    """
+    logger.info(f"Extracting {attachName!r} from entry uuid: {theEntry.uuid}")
+    attachment = _findAttachment(theEntry,attachName)
+    if attachment is None:
+        return (False,f"Entry has no attachment named {attachName}")
+    if destPath is None:
+        # The name comes from the database, don't let it pick the directory
+        destPath = Path(Path(_noNone(attachment.filename)).name)
+        if destPath.name in ('','.','..'):
+            logger.warning(f"Attachment name {attachment.filename!r} is not a file name")
+            return (False,f"Attachment name {attachment.filename!r} is not a file name, give a destination file")
+    if destPath.exists() and not _confirm(f"Overwrite {destPath.resolve()} "):
+        logger.info("Extract cancelled by user")
+        return (False,"Extract cancelled")
+
+    binData = _binaryData(attachment.id)
+    try:
+        with open(destPath,"wb",buffering=GBLSettings['chunkSize']) as theFile:
+            for offset in range(0,len(binData),GBLSettings['chunkSize']):
+                theFile.write(binData[offset:offset + GBLSettings['chunkSize']])
+    except OSError as oopsError:
+        logger.error(f"Unable to write {destPath}: {oopsError}")
+        return (False,f"Unable to write {destPath}: {oopsError}")
+    logger.info(f"Wrote {len(binData)} bytes to {destPath}")
+    _auditEvent('extract','entry',theEntry.uuid,attachment=attachment.filename)
+    return (True,f"Saved {attachment.filename} to {destPath.resolve()} ({len(binData)} bytes)")
+
 def findAction(findOptions:str) -> None:
     """Find entry/s which meet the critera in args and display on screen
 
@@ -1147,38 +2203,45 @@ def findAction(findOptions:str) -> None:
     Returns:
         None. Just display resutls or issues on console
     """
-    if findOptions is None: # can't process
-        print("Incomplete find command")
+    if _noNone(findOptions).strip().lower().startswith('--all-dbs'):
+        findAllDbs(findOptions.strip()[len('--all-dbs'):])
         return
-    if findOptions == "": # can't process
+    results = _findEntries(findOptions)
+    if results is None: # can't process
         print("Incomplete find command")
         return
-    xtmp = findOptions.strip()
-    if xtmp.find(' ') != -1:
-        srchStr = xtmp.split(' ',1)[1].strip()
-    else: # Incomplete find command
-        print("Incomplete find command")
-        return
-
-    # What field are we searching
-    srchBy = xtmp.split(' ',1)[0]
-    logger.debug(f"searching by {srchBy}")
-    match srchBy.lower():
-        case 'title':
-            logger.info(f"searching 'title' for : {srchStr}")
-            results = kp.find_entries(title=srchStr,regex=True,flags="i")
-        case 'username':
-            logger.info(f"searching 'username' for : {srchStr}")
-            results = kp.find_entries(username=srchStr,regex=True,flags="i")
-        case _: # Catch all
-            print("Incomplete find command")
-            return
 
     print(f"Found {len(results)} records")
     logger.info(f"Found {len(results)} records")
     displayEntriesTable(results)
     return
 
+def findAllDbs(findOptions:str) -> None:
+    """Find entry/s in all the open databases, and display the merged results
+
+    Args:
+        findOptions (str): Same as the find command without --all-dbs
+    """
+    curDb = GBLSettings['dbName']
+    dbResults = []
+    try:
+        for dbName in GBLSettings['dbSessions']:
+            _useDb(dbName)
+            results = _findEntries(findOptions)
+            if results is None: # can't process
+                print("Incomplete find command")
+                return
+            logger.info(f"Found {len(results)} records in database {dbName}")
+            dbResults.extend((dbName,x) for x in results)
+    finally:
+        _useDb(curDb)
+
+    dbResults.sort(key=lambda x: _noNone(x[1].title).lower())
+    print(f"Found {len(dbResults)} records in {len(GBLSettings['dbSessions'])} databases")
+    logger.info(f"Found {len(dbResults)} records in {len(GBLSettings['dbSessions'])} databases")
+    displayDbEntriesTable(dbResults)
+    return
+
 def groupChoices(grpUUID=None):
     """Prompt for user to choose a group
 
@@ -1191,14 +2254,14 @@ def groupChoices(grpUUID=None):
         PyKeePass.Group object
     """
     tmpList = []
-    logger.info(f"Creating list of groups for user to choose from. Default UUID is: {grpUUID}")
+    logger.info("Creating list of groups for user to choose from. Default UUID is: %s",grpUUID)
     for grp in kp.groups:
         uiEntry = _prettyPath(grp.path)
         grpRow = [grp.uuid,uiEntry]
-        logger.debug(f"group_name={grp.name}, group_uuid={grp.uuid}, uiEntry={uiEntry}")
+        logger.debug("group_name=%s, group_uuid=%s, uiEntry=%s",grp.name,grpRow[0],uiEntry)
         tmpList.append(grpRow)
 
-    logger.info(f"Displaying {len(tmpList)} groups for user to choose from")
+    logger.info("Displaying %d groups for user to choose from",len(tmpList))
     tmpGrp = choice(message="Select a Group path",
         options=tmpList,
         bottom_toolbar=HTML(" Press <b>[Up]</b>/<b>[Down]</b> to select, <b>[Enter]</b> to accept."),
@@ -1219,6 +2282,388 @@ def changeGrp() -> None:
     logger.info(f"Setting current group to uuid: {GBLSettings['currentGrp'].uuid}")
     return
 
+def historyAction(historyOptions:str) -> None:
+    """History command validation
+
+    Args:
+        historyOptions (str): entry and it's uuid. uuid is optional
+          Example: entry <uuid>
+          Would display the history for the entry with the specific uuid
+    """
+    logger.debug("Parsing history command")
+    historyParts = _noNone(historyOptions).strip().split(' ')
+    logger.debug(f"historyParts = {historyParts}")
+    if historyParts[0].lower() != 'entry':
+        print("Invalid/Incomplete history command")
+        helpAction('history')
+        return
+
+    if len(historyParts) > 1: # Last part could be the uuid
+        # Confirm valid uuid
+        logger.debug(f"Determine if {historyParts[1]} is a valid UUID")
+        try:
+            entryUUID = uuid.UUID(historyParts[1])
+        except ValueError:
+            print_formatted_text(FormattedText([
+                ('class:red','Invalid UUID'),
+            ]),style=mainStyles)
+            return
+    else: # Have user chose an entry to get a UUID
+        tmpChoices = entryChoices(GBLSettings['currentGrp'])
+        if len(tmpChoices) == 0: # No entries in group
+            print("No entries to show history for in group")
+            return
+        try:
+            entryUUID = choice(
+                message=f"Select an Entry for group {_prettyPath(GBLSettings['currentGrp'].path)}",
+                options=tmpChoices,
+                bottom_toolbar=HTML(" Press <b>[Up]</b>/<b>[Down]</b> to select, <b>[Enter]</b> to accept.")
+                )
+        except KeyboardInterrupt:
+            logger.debug("Keyboard Interrupt. Cancel history entry")
+            return
+        print(f" >> history entry {entryUUID}")
+
+    logger.info(f"Searching for entry uuid {entryUUID}")
+    theEntry = kp.find_entries(uuid=entryUUID,first=True)
+    if theEntry is None: # Entry not found.. Nothing to do
+        logger.info(f"entry uuid {entryUUID} was not found")
+        print_formatted_text(FormattedText([
+            ('class:red','Unable to find entry for uuid'),
+        ]),style=mainStyles)
+        return
+    displayEntryHistory(theEntry)
+    return
+
+def pruneHistoryAction(pruneOptions:str) -> None:
+    """Prune history command validation
+
+    Args:
+        pruneOptions (str): --keep and/or --max-bytes with their values
+          Example: --keep 5 --max-bytes 64K
+    """
+    logger.debug("Parsing prune-history command")
+    pruneParts = _noNone(pruneOptions).strip().split()
+    logger.debug(f"pruneParts = {pruneParts}")
+    # Default to the database history settings. -1 is unlimited
+    keepItems = _historySetting('HistoryMaxItems')
+    maxBytes = _historySetting('HistoryMaxSize')
+    if len(pruneParts) % 2 != 0:
+        print("Invalid/Incomplete prune-history command")
+        helpAction('prune-history')
+        return
+    for optName,optValue in zip(pruneParts[0::2],pruneParts[1::2]):
+        match optName.lower():
+            case '--keep':
+                keepItems = int(optValue) if optValue.isdigit() else None
+                if keepItems is None:
+                    print_formatted_text(FormattedText([('class:red',f'Invalid keep value {optValue}')]),style=mainStyles)
+                    return
+            case '--max-bytes':
+                maxBytes = _parseSize(optValue)
+                if maxBytes is None:
+                    print_formatted_text(FormattedText([('class:red',f'Invalid max bytes value {optValue}')]),style=mainStyles)
+                    return
+            case _: # Catch all
+                print("Invalid/Incomplete prune-history command")
+                helpAction('prune-history')
+                return
+
+    success,msg = pruneHistory(keepItems,maxBytes)
+    if success:
+        print_formatted_text(FormattedText([('class:green',f'{msg}')]),style=mainStyles)
+    else:
+        print_formatted_text(FormattedText([('class:red',f'{msg}')]),style=mainStyles)
+    return
+
+def pruneHistory(keepItems=None,maxBytes=None) -> tuple:
+    """Trim the history of every entry with one pass and one save
+
+    The newest history versions are kept.
+
+    Args:
+        keepItems (int): Default None. Most history versions to keep for each entry. None is no limit
+        maxBytes (int): Default None. Most bytes of history to keep for each entry. None is no limit
+
+    Returns:
+        tuple: (status,msg)
+            status (bool):
+                True - History pruned and database saved
+                False - Nothing was pruned
+            msg (str): message detail for the status
+    """
+    logger.info(f"Pruning history. keepItems={keepItems}, maxBytes={maxBytes}")
+    if keepItems is None and maxBytes is None:
+        return (False,"No history limits given, and the database has none")
+
+    pruneList = []
+    prunedBytes = 0
+    for entry in kp.entries:
+        entryHistory = entry.history
+        keptBytes = 0
+        # Newest versions are last. Walk newest to oldest keeping what fits
+        for index,histEntry in enumerate(reversed(entryHistory)):
+            histBytes = len(histEntry.dump_xml())
+            if (keepItems is not None and index >= keepItems) or \
+               (maxBytes is not None and keptBytes + histBytes > maxBytes):
+                pruneList.append((entry,histEntry))
+                prunedBytes += histBytes
+            else:
+                keptBytes += histBytes
+    logger.info(f"History versions to prune: {len(pruneList)}, {prunedBytes} bytes of XML")
+    if len(pruneList) == 0:
+        return (False,"No history to prune")
+
+    print(f"{len(pruneList)} history versions ({prunedBytes} bytes of XML) to prune")
+    if not _confirm("Prune the history "):
+        logger.info("Prune history cancelled by user")
+        return (False,"Prune history cancelled")
+
+    prunedEntries = {}
+    for entry,histEntry in pruneList:
+        entry.delete_history(history_entry=histEntry)
+        prunedEntries[entry.uuid] = prunedEntries.get(entry.uuid,0) + 1
+    sizeBefore = os.path.getsize(kp.filename)
+    try:
+        _dbChanged()
+        _saveDb()
+    except Exception as oopsError:
+        logger.critical(f"Unexpected error: {oopsError}",stack_info=True)
+        print(f"CRITICAL: Unexpected error {oopsError}")
+        traceback.print_exc()
+        quit(1)
+    sizeAfter = os.path.getsize(kp.filename)
+    logger.info(f"History pruned. File size before: {sizeBefore}, after: {sizeAfter}")
+    for entryUUID,versions in prunedEntries.items():
+        _auditEvent('edit','entry',entryUUID,result='history pruned',versions=versions)
+    return (True,f"Pruned {len(pruneList)} history versions. File size {sizeBefore} -> {sizeAfter} bytes ({sizeBefore - sizeAfter} smaller)")
+
+def listAction(listOptions:str) -> None:
+    """List command validation. Display entries in the current group with a tag or expired filter
+
+    Args:
+        listOptions (str): --tag and the tags, or --expired
+          Example: --tag prod,db
+    """
+    logger.debug("Parsing list command")
+    listParts = _noNone(listOptions).strip().split(' ',1)
+    logger.debug(f"listParts = {listParts}")
+    if len(listParts) == 1 and listParts[0].lower() == '--expired':
+        expiredUUIDs = {x[1] for x in _expiryRange(None,datetime.now(timezone.utc))}
+        grpEntries = [x for x in GBLSettings['currentGrp'].entries if x.uuid in expiredUUIDs]
+        logger.info(f"Expired entries in current group: {len(grpEntries)}")
+        displayGroupHeader(GBLSettings['currentGrp'])
+        displayExpiryTable(grpEntries)
+        return
+    if len(listParts) != 2 or listParts[0].lower() != '--tag':
+        print("Invalid/Incomplete list command")
+        helpAction('list')
+        return
+
+    tagUUIDs = _tagQuery(listParts[1])
+    grpEntries = [x for x in GBLSettings['currentGrp'].entries if x.uuid in tagUUIDs]
+    logger.info(f"Entries in current group with tags {listParts[1]!r}: {len(grpEntries)}")
+    displayGroupHeader(GBLSettings['currentGrp'])
+    displayEntriesTable(grpEntries)
+    return
+
+def expiringAction(expiringOptions:str) -> None:
+    """Expiring command validation. Display entries expiring soon
+
+    Args:
+        expiringOptions (str): --within and a duration, or blank for 30 days
+          Example: --within 2w
+    """
+    logger.debug("Parsing expiring command")
+    expiringParts = _noNone(expiringOptions).strip().split()
+    logger.debug(f"expiringParts = {expiringParts}")
+    within = timedelta(days=30)
+    if len(expiringParts) > 0:
+        within = _parseDuration(expiringParts[1]) if len(expiringParts) == 2 and expiringParts[0].lower() == '--within' else None
+        if within is None:
+            print("Invalid/Incomplete expiring command")
+            helpAction('expiring')
+            return
+
+    nowTime = datetime.now(timezone.utc)
+    recycledElems = _recycledElements()
+    index = _getIndex()
+    results = [index['entries'][x[1]] for x in _expiryRange(nowTime,nowTime + within)]
+    results = [x for x in results if x._element not in recycledElems]
+    print(f"Found {len(results)} entries expiring by {(nowTime + within).astimezone().strftime('%Y-%m-%d %I:%M:%S %p')}")
+    logger.info(f"Found {len(results)} entries expiring within {within}")
+    displayExpiryTable(results)
+    return
+
+def moveAction(moveOptions:str) -> None:
+    """Move all the entries matching a find to a group with a single save
+
+    Args:
+        moveOptions (str): find options, followed by --to and the group path
+          Example: title web --to Servers/Prod
+    """
+    logger.debug("Parsing move command")
+    xtmp = _noNone(moveOptions).strip()
+    if xtmp.find(' --to ') == -1:
+        print("Invalid/Incomplete move command")
+        helpAction('move')
+        return
+    findOptions,grpPath = xtmp.rsplit(' --to ',1)
+
+    destGrp = _groupByPath(grpPath)
+    if destGrp is None:
+        logger.info(f"Group path {grpPath!r} was not found")
+        print_formatted_text(FormattedText([
+            ('class:red',f'Unable to find group path {grpPath.strip()}'),
+        ]),style=mainStyles)
+        return
+
+    results = _findEntries(findOptions)
+    if results is None:
+        print("Invalid/Incomplete move command")
+        helpAction('move')
+        return
+    logger.info(f"Found {len(results)} entries to move to group uuid: {destGrp.uuid}")
+    if len(results) == 0:
+        print(' -- No entries found --')
+        return
+
+    displayEntriesTable(results)
+    if not _confirm(f"Move {len(results)} entries to {_prettyPath(destGrp.path)} "):
+        logger.info("Move entries cancelled by user")
+        print_formatted_text(FormattedText([('class:red','Move entries cancelled')]),style=mainStyles)
+        return
+
+    for entry in results:
+        kp.move_entry(entry,destGrp)
+        _locationChanged(entry)
+    _saveEntries(results)
+    logger.info(f"Moved {len(results)} entries to group uuid: {destGrp.uuid}")
+    print_formatted_text(FormattedText([
+        ('class:green',f'Moved {len(results)} entries to {_prettyPath(destGrp.path)}'),
+    ]),style=mainStyles)
+    return
+
+def setAction(setOptions:str) -> None:
+    """Set a field for all the entries matching a find with a single save
+
+    A password is never taken from the command, it is prompted for with
+    password= (blank value). The old values are kept in each entry's history.
+
+    Args:
+        setOptions (str): field=value, followed by where and the find options.
+          A value with ' where ' in it is put in quotes.
+          Example: url=https://login.example.com where username svc
+          Example: notes="see where it moved" where title~legacy
+    """
+    logger.debug("Parsing set command")
+    # Field names to the Entry attribute
+    setFields = {
+        'title': 'title',
+        'username': 'username',
+        'password': 'password',
+        'url': 'url',
+        'notes': 'notes',
+    }
+    xtmp = _noNone(setOptions).strip()
+    if xtmp.find('=') == -1:
+        print("Invalid/Incomplete set command")
+        helpAction('set')
+        return
+    setField,xtmp = xtmp.split('=',1)
+    setField = setField.strip().lower()
+    if xtmp[:1] in ('"',"'") and xtmp.find(xtmp[0],1) != -1: # Quoted value, can have ' where ' in it
+        quoteEnd = xtmp.find(xtmp[0],1)
+        setValue = xtmp[1:quoteEnd]
+        xtmp = xtmp[quoteEnd + 1:]
+        findOptions = xtmp[len(' where '):] if xtmp.startswith(' where ') else None
+    elif xtmp.find(' where ') != -1:
+        setValue,findOptions = xtmp.split(' where ',1)
+    else:
+        findOptions = None
+    if findOptions is None:
+        print("Invalid/Incomplete set command")
+        helpAction('set')
+        return
+    if setField not in setFields:
+        print_formatted_text(FormattedText([
+            ('class:red',f'Unable to set field {setField!r}'),
+        ]),style=mainStyles)
+        helpAction('set')
+        return
+    if setField == 'password' and setValue != '':
+        print_formatted_text(FormattedText([
+            ('class:red','Passwords are not taken from the command. Use set password= where ... to be prompted for it'),
+        ]),style=mainStyles)
+        return
+
+    results = _findEntries(findOptions)
+    if results is None:
+        print("Invalid/Incomplete set command")
+        helpAction('set')
+        return
+    logger.info(f"Found {len(results)} entries to set {setField}")
+    if len(results) == 0:
+        print(' -- No entries found --')
+        return
+
+    displayEntriesTable(results)
+    if not _confirm(f"Set {setField} for {len(results)} entries "):
+        logger.info("Set field cancelled by user")
+        print_formatted_text(FormattedText([('class:red','Set field cancelled')]),style=mainStyles)
+        return
+    if setField == 'password':
+        try:
+            setValue = PromptSession().prompt("New password for the entries: ",is_password=True,bottom_toolbar=genPassHint)
+        except KeyboardInterrupt:
+            logger.info("Set field cancelled by user at the password prompt")
+            print_formatted_text(FormattedText([('class:red','Set field cancelled')]),style=mainStyles)
+            return
+        if setValue.startswith('!gen'):
+            setValue = _genPassPrompt(setValue)
+        if setValue == '':
+            print_formatted_text(FormattedText([('class:red','Set field cancelled, no password')]),style=mainStyles)
+            return
+
+    changedEntries = []
+    for entry in results:
+        if _noNone(getattr(entry,setFields[setField])) == setValue: # Nothing to change
+            continue
+        entry.save_history()
+        setattr(entry,setFields[setField],setValue)
+        changedEntries.append(entry)
+    if len(changedEntries) > 0:
+        _saveEntries(changedEntries)
+    for entry in changedEntries:
+        _auditEvent('edit','entry',entry.uuid,result='set',field=setField)
+    logger.info(f"Set {setField} for {len(changedEntries)} entries, {len(results) - len(changedEntries)} already set")
+    print_formatted_text(FormattedText([
+        ('class:green',f'Set {setField} for {len(changedEntries)} entries'),
+    ]),style=mainStyles)
+    return
+
+def useAction(useOptions:str) -> None:
+    """Switch the current database, or list the open databases
+
+    Args:
+        useOptions (str): Name of the database to use. Blank lists the open databases
+    """
+    dbName = _noNone(useOptions).strip()
+    if dbName == "":
+        for openDb,dbSession in GBLSettings['dbSessions'].items():
+            marker = '*' if openDb == GBLSettings['dbName'] else ' '
+            print(f" {marker} {openDb.ljust(20)} {dbSession['kp'].filename}")
+        return
+    if dbName not in GBLSettings['dbSessions']:
+        print_formatted_text(FormattedText([
+            ('class:red',f'No open database named {dbName}'),
+        ]),style=mainStyles)
+        return
+    _useDb(dbName)
+    print_formatted_text(FormattedText([('class:green',f'Using database {dbName}')]),style=mainStyles)
+    displayGroup(GBLSettings['currentGrp'])
+    return
+
 def showAction(showOptions:str) -> None:
     """Show validation determines to show entry/group
 
@@ -1290,6 +2735,7 @@ def showAction(showOptions:str) -> None:
                 return
 
             displayEntry(result)
+            _auditEvent('show','entry',result.uuid)
             return
         case 'group':
             logger.debug("details for a group requested")
@@ -1320,81 +2766,935 @@ def showAction(showOptions:str) -> None:
                 theGroup = kp.find_groups(uuid=uniqueID,first=True)
 
             displayGroupHeader(grp=theGroup)
+            _auditEvent('show','group',theGroup.uuid)
         case _: # Catch all
             print("Invalid/Incomplete show command")
             helpAction('show')
             return
     return
 
-def getPass(uniqueID:uuid) -> None:
-    """Get password for entry's uuid and display to the console"""
-    if uniqueID is None:
-        print("Incomplete getpass command")
-        helpAction("getpass")
+def purgeAction(purgeOptions:str) -> None:
+    """Purge command validation
+    Permanently deletes entries and groups in the recycle bin
+
+    Args:
+        purgeOptions (str): What to purge and it's options.
+          Example: recycle --older-than 90d
+          Would purge everything put in the recycle bin more than 90 days ago
+    """
+    logger.debug("Parsing purge command")
+    purgeParts = _noNone(purgeOptions).strip().split()
+    logger.debug(f"purgeParts = {purgeParts}")
+    if len(purgeParts) == 0 or purgeParts[0].lower() != 'recycle':
+        print("Invalid/Incomplete purge command")
+        helpAction('purge')
         return
-    if uniqueID == "":
-        print("Incomplete getpass command")
-        helpAction("getpass")
+
+    olderThan = None
+    if len(purgeParts) > 1:
+        if len(purgeParts) != 3 or purgeParts[1].lower() != '--older-than':
+            print("Invalid/Incomplete purge command")
+            helpAction('purge')
+            return
+        olderThan = _parseDuration(purgeParts[2])
+        if olderThan is None:
+            print_formatted_text(FormattedText([
+                ('class:red',f'Invalid age: {purgeParts[2]}'),
+            ]),style=mainStyles)
+            return
+
+    success,msg = purgeRecycle(olderThan)
+    if success:
+        print_formatted_text(FormattedText([('class:green',f'{msg}')]),style=mainStyles)
+    else:
+        print_formatted_text(FormattedText([('class:red',f'{msg}')]),style=mainStyles)
+    return
+
+def purgeRecycle(olderThan=None) -> tuple:
+    """Permanently delete the entries and groups in the recycle bin with one save
+
+    Only the direct children of the recycle bin are checked for age. A group
+    that is purged takes it's whole subtree with it.
+
+    Args:
+        olderThan (timedelta): Default None. Only purge what was recycled longer ago than this.
+            None purges everything in the recycle bin.
+
+    Returns:
+        tuple: (status,msg)
+            status (bool):
+                True - Recycle bin purged and database saved
+                False - Nothing was purged
+            msg (str): message detail for the status
+    """
+    recycleGrp = kp.recyclebin_group
+    if recycleGrp is None:
+        logger.info("Database has no recycle bin")
+        return (False,"Database has no recycle bin")
+
+    cutOff = None
+    if olderThan is not None:
+        cutOff = datetime.now(timezone.utc) - olderThan
+    logger.info(f"Purging recycle bin uuid: {recycleGrp.uuid}, cut off: {cutOff}")
+
+    purgeEntries = [x for x in recycleGrp.entries if cutOff is None or _recycledTime(x) < cutOff]
+    purgeGroups = [x for x in recycleGrp.subgroups if cutOff is None or _recycledTime(x) < cutOff]
+    subEntries = 0
+    for subGrp in purgeGroups:
+        for grp,grpPath,inRecycle in _walkGroups(subGrp):
+            subEntries += len(grp.entries)
+    logger.info(f"Purge found entries: {len(purgeEntries)}, groups: {len(purgeGroups)}, entries in groups: {subEntries}")
+
+    if len(purgeEntries) == 0 and len(purgeGroups) == 0:
+        return (False,"Nothing in the recycle bin to purge")
+
+    print(f"Recycle bin {_prettyPath(recycleGrp.path)}: {len(purgeEntries)} entries, "
+          f"{len(purgeGroups)} groups ({subEntries} entries in those groups) to purge")
+    if not _confirm("Permanently delete them "):
+        logger.info("Purge recycle bin cancelled by user")
+        return (False,"Purge recycle bin cancelled")
+
+    _addTombstones([x.uuid for x in purgeEntries])
+    purgedEntries = [x.uuid for x in purgeEntries]
+    purgedGroups = []
+    for entry in purgeEntries:
+        kp.delete_entry(entry)
+    for grp in purgeGroups:
+        grpUUIDs = _subtreeUUIDs(grp)
+        _addTombstones(grpUUIDs)
+        purgedGroups.append((grp.uuid,sum(len(x[0].entries) for x in _walkGroups(grp))))
+        kp.delete_group(grp)
+    GBLSettings['index'] = None # Rebuilt on next use
+    try:
+        _dbChanged()
+        _saveDb()
+    except Exception as oopsError:
+        logger.critical(f"Unexpected error: {oopsError}",stack_info=True)
+        print(f"CRITICAL: Unexpected error {oopsError}")
+        traceback.print_exc()
+        quit(1)
+    logger.info("Recycle bin purged and database saved")
+    for entryUUID in purgedEntries:
+        _auditEvent('delete','entry',entryUUID,result='purged')
+    for grpUUID,grpEntries in purgedGroups:
+        _auditEvent('delete','group',grpUUID,result='purged',entries=grpEntries)
+    return (True,f"Purged {len(purgeEntries) + subEntries} entries and {len(purgeGroups)} groups from the recycle bin")
+
+def mergeAction(mergeOptions:str) -> None:
+    """Merge command validation. Opens the other database and merges it
+
+    Args:
+        mergeOptions (str): other database file, and optional keyfile.
+          Example: field-copy.kdbx --keyfile field.keyx
+    """
+    logger.debug("Parsing merge command")
+    mergeParts = _noNone(mergeOptions).strip().split()
+    logger.debug(f"mergeParts = {mergeParts}")
+    if len(mergeParts) not in (1,3) or (len(mergeParts) == 3 and mergeParts[1].lower() != '--keyfile'):
+        print("Invalid/Incomplete merge command")
+        helpAction('merge')
+        return
+    otherDB = Path(mergeParts[0]).expanduser()
+    if not otherDB.is_file():
+        print_formatted_text(FormattedText([('class:red',f'File not found: {otherDB.resolve()}')]),style=mainStyles)
         return
+    if otherDB.resolve() == Path(kp.filename).resolve():
+        print_formatted_text(FormattedText([('class:red','Can not merge a database into itself')]),style=mainStyles)
+        return
+    keyData = None
+    if len(mergeParts) == 3:
+        success,keyData = _readKeyfile(Path(mergeParts[2]).expanduser())
+        if not success: # keyData is why
+            print_formatted_text(FormattedText([('class:red',f'{keyData}')]),style=mainStyles)
+            return
 
-    logger.info(f"getting password for entry {uniqueID}")
-    theEntry = kp.find_entries(uuid=uniqueID,first=True)
+    try:
+        otherPass = PromptSession().prompt(f"Password for {otherDB.name} (blank for the same as this database): ",is_password=True)
+    except KeyboardInterrupt:
+        logger.info("Keyboard Interrupt. Cancel merge")
+        return
+    if otherPass == "":
+        otherPass = kp.password
+    logger.info(f"Opening {otherDB.resolve()} to merge")
+    try:
+        otherKp = PyKeePass(otherDB,password=otherPass,keyfile=_keyfileStream(keyData))
+    except pkExceptions.CredentialsError:
+        logger.warning(f"Invalid password provided for {otherDB.resolve()}")
+        print_formatted_text(FormattedText([('class:red',f'Bad creds: {otherDB.resolve()}')]),style=mainStyles)
+        return
+    except (pkExceptions.HeaderChecksumError,pkExceptions.PayloadChecksumError,ConstructError,OSError) as oopsError:
+        logger.warning(f"Unable to open {otherDB.resolve()}: {oopsError!r}")
+        print_formatted_text(FormattedText([('class:red',f'Unable to open {otherDB.resolve()}, is it a KeePass database? {oopsError}')]),style=mainStyles)
+        return
 
-    if theEntry.password is None:
-        print_formatted_text(FormattedText([
-            ('class:red','Entry has no password entry'),
-        ]),style=mainStyles)
+    success,msg = mergeDb(otherKp)
+    if success:
+        print_formatted_text(FormattedText([('class:green',f'{msg}')]),style=mainStyles)
+    else:
+        print_formatted_text(FormattedText([('class:red',f'{msg}')]),style=mainStyles)
+    return
 
-        logger.info("Entry has no password entry")
+def mergeDb(otherKp) -> tuple:
+    """Merge another database into the current database, with one save
+
+    Groups and entries are matched by UUID through dicts of the XML
+    elements on each side, so the merge is linear in the size of the
+    databases. When both sides have a version, the newer modification
+    time wins and the older version is put in the entry history. Groups
+    and entries with a deleted object (tombstone) newer than their last
+    change are not copied over, and local ones are removed. The deleted
+    objects of both databases are kept.
+
+    Args:
+        otherKp (PyKeePass): Database to merge from. It is not changed
+
+    Returns:
+        tuple: (status,msg)
+            status (bool):
+                True - Changes merged and database saved
+                False - Nothing merged
+            msg (str): message detail for the status
+    """
+    if kp.version[0] != otherKp.version[0]:
+        return (False,f"Can not merge a KDBX {otherKp.version[0]} database into a KDBX {kp.version[0]} database")
+    startTime = time.perf_counter()
+    mergeCounts = dict.fromkeys(('entriesAdded','entriesUpdated','historyAdded','groupsAdded','groupsUpdated','moved','deleted'),0)
+    localTombs = _tombstones(kp)
+    otherTombs = _tombstones(otherKp)
+    localRoot = kp.root_group._element
+    otherRootUUID = otherKp.root_group._element.findtext('UUID')
+    localGroups = {x.findtext('UUID'): x for x in localRoot.iter('Group')}
+    localGroups[otherRootUUID] = localRoot # Roots always match
+    localEntries = {x.findtext('UUID'): x for x in kp.tree.xpath('/KeePassFile/Root//Group/Entry')}
+    binMap = {} # other binary id, local binary id
+    mergeEvents = [] # (event, kind, uuid, result) for the audit log
+    logger.info(f"Merging {otherKp.filename}. Local groups: {len(localGroups)}, entries: {len(localEntries)}, tombstones: {len(localTombs)}")
+
+    # Groups first, in document order so a parent group is always there before it's children
+    for otherGrp in otherKp.root_group._element.iter('Group'):
+        grpUUID = otherGrp.findtext('UUID')
+        if grpUUID == otherRootUUID:
+            continue
+        otherTime = _elemTime(otherKp,otherGrp,'LastModificationTime')
+        localParent = localGroups.get(otherGrp.getparent().findtext('UUID'),localRoot)
+        localGrp = localGroups.get(grpUUID)
+        if localGrp is None:
+            if grpUUID in localTombs and localTombs[grpUUID] >= otherTime:
+                continue # Deleted here after it's last change there
+            localGrp = copy.deepcopy(otherGrp)
+            for childElem in localGrp.findall('Group') + localGrp.findall('Entry'):
+                localGrp.remove(childElem)
+            localParent.append(localGrp)
+            localGroups[grpUUID] = localGrp
+            mergeCounts['groupsAdded'] += 1
+            mergeEvents.append(('add','group',grpUUID,'merged'))
+            continue
+        if otherTime > _elemTime(kp,localGrp,'LastModificationTime'):
+            _replaceFields(localGrp,otherGrp)
+            mergeCounts['groupsUpdated'] += 1
+            mergeEvents.append(('edit','group',grpUUID,'merged'))
+        if localGrp.getparent() is not localParent and localParent is not localGrp \
+                and _elemTime(otherKp,otherGrp,'LocationChanged') > _elemTime(kp,localGrp,'LocationChanged') \
+                and localGrp not in localParent.iterancestors():
+            localParent.append(localGrp)
+            _setElemTime(localGrp,'LocationChanged',otherGrp.findtext('Times/LocationChanged'))
+            mergeCounts['moved'] += 1
+            mergeEvents.append(('edit','group',grpUUID,'merged move'))
+
+    for otherEntry in otherKp.tree.xpath('/KeePassFile/Root//Group/Entry'):
+        entryUUID = otherEntry.findtext('UUID')
+        otherTime = _elemTime(otherKp,otherEntry,'LastModificationTime')
+        otherParentUUID = otherEntry.getparent().findtext('UUID')
+        localParent = localGroups.get(otherParentUUID,localRoot)
+        localEntry = localEntries.get(entryUUID)
+        if localEntry is None:
+            if entryUUID in localTombs and localTombs[entryUUID] >= otherTime:
+                continue # Deleted here after it's last change there
+            newEntry = copy.deepcopy(otherEntry)
+            _remapBinaries(newEntry,otherKp,binMap)
+            localParent.append(newEntry)
+            localEntries[entryUUID] = newEntry
+            mergeCounts['entriesAdded'] += 1
+            mergeEvents.append(('add','entry',entryUUID,'merged'))
+            continue
+        localTime = _elemTime(kp,localEntry,'LastModificationTime')
+        # A move only changes LocationChanged, so it is checked apart from the fields
+        localMoved = localEntry.findtext('Times/LocationChanged')
+        otherMovedLater = _elemTime(otherKp,otherEntry,'LocationChanged') > _elemTime(kp,localEntry,'LocationChanged')
+        if otherTime > localTime: # Other wins, local version goes to history
+            newEntry = copy.deepcopy(otherEntry)
+            _remapBinaries(newEntry,otherKp,binMap)
+            _mergeHistory(newEntry,[localEntry] + localEntry.findall('History/Entry'))
+            localEntry.getparent().replace(localEntry,newEntry)
+            if not otherMovedLater and localMoved: # Stays where it is here
+                _setElemTime(newEntry,'LocationChanged',localMoved)
+            localEntries[entryUUID] = newEntry
+            mergeCounts['entriesUpdated'] += 1
+            mergeEvents.append(('edit','entry',entryUUID,'merged'))
+        elif otherTime < localTime: # Local wins, other version goes to history
+            historyEntries = [copy.deepcopy(x) for x in [otherEntry] + otherEntry.findall('History/Entry')]
+            for historyEntry in historyEntries:
+                _remapBinaries(historyEntry,otherKp,binMap)
+            historyAdded = _mergeHistory(localEntry,historyEntries)
+            if historyAdded > 0:
+                mergeCounts['historyAdded'] += historyAdded
+                mergeEvents.append(('edit','entry',entryUUID,'history merged'))
+        theEntry = localEntries[entryUUID]
+        if otherMovedLater and otherParentUUID in localGroups and theEntry.getparent() is not localParent:
+            localParent.append(theEntry)
+            _setElemTime(theEntry,'LocationChanged',otherEntry.findtext('Times/LocationChanged'))
+            mergeCounts['moved'] += 1
+            mergeEvents.append(('edit','entry',entryUUID,'merged move'))
+
+    # Deleted there after the last change here
+    for delUUID,delTime in otherTombs.items():
+        localEntry = localEntries.get(delUUID)
+        if localEntry is not None and delTime > _elemTime(kp,localEntry,'LastModificationTime'):
+            localEntry.getparent().remove(localEntry)
+            del localEntries[delUUID]
+            mergeCounts['deleted'] += 1
+            mergeEvents.append(('delete','entry',delUUID,'merged deletion'))
+    for delUUID,delTime in otherTombs.items(): # Only groups left empty
+        localGrp = localGroups.get(delUUID)
+        if localGrp is not None and localGrp is not localRoot and delTime > _elemTime(kp,localGrp,'LastModificationTime') \
+                and localGrp.find('Group') is None and localGrp.find('Entry') is None:
+            localGrp.getparent().remove(localGrp)
+            del localGroups[delUUID]
+            mergeCounts['deleted'] += 1
+            mergeEvents.append(('delete','group',delUUID,'merged deletion'))
+    newTombs = {x: y for x,y in otherTombs.items() if x not in localTombs or localTombs[x] < y}
+    logger.info(f"Merge results: {mergeCounts}, new tombstones: {len(newTombs)} in {time.perf_counter() - startTime:.3f} seconds")
+
+    if sum(mergeCounts.values()) == 0 and len(newTombs) == 0:
+        return (False,"Nothing to merge, the databases are the same")
+    _addTombstones(newTombs)
+    if GBLSettings['currentGrp']._element.getroottree().getroot() is not kp.tree.getroot(): # Current group was deleted
+        GBLSettings['currentGrp'] = kp.root_group
+    GBLSettings['index'] = None # Rebuilt on next use
+    try:
+        _dbChanged()
+        _saveDb()
+    except Exception as oopsError:
+        logger.critical(f"Unexpected error: {oopsError}",stack_info=True)
+        print(f"CRITICAL: Unexpected error {oopsError}")
+        traceback.print_exc()
+        quit(1)
+    for event,kind,objUUID,result in mergeEvents:
+        _auditEvent(event,kind,uuid.UUID(bytes=base64.b64decode(objUUID)),result=result,source=str(otherKp.filename))
+    print(f"Entries added: {mergeCounts['entriesAdded']}, updated: {mergeCounts['entriesUpdated']}, "
+          f"older versions put in history: {mergeCounts['historyAdded']}")
+    print(f"Groups added: {mergeCounts['groupsAdded']}, updated: {mergeCounts['groupsUpdated']}, "
+          f"entries and groups moved: {mergeCounts['moved']}, deleted: {mergeCounts['deleted']}")
+    return (True,f"Merged {otherKp.filename} and saved in {time.perf_counter() - startTime:.2f} seconds")
+
+def kdfAction(kdfOptions:str) -> None:
+    """KDF command validation
+
+    Args:
+        kdfOptions (str): show, or tune and it's options.
+          Example: tune --target-ms 500
+    """
+    logger.debug("Parsing kdf command")
+    kdfParts = _noNone(kdfOptions).strip().split()
+    logger.debug(f"kdfParts = {kdfParts}")
+    if len(kdfParts) == 1 and kdfParts[0].lower() == 'show':
+        kdfShow()
+        return
+    if len(kdfParts) == 0 or kdfParts[0].lower() != 'tune' or len(kdfParts) % 2 != 1:
+        print("Invalid/Incomplete kdf command")
+        helpAction('kdf')
         return
 
-    # Bug coping to clipboard. BAC has some sneaky things going on, or Windows 11 really sucks.
-    # sometimes nothing is copied. Sometimes everything in the cmd prompt is selected and copied.
-    print(theEntry.password)
-    logger.info("Password retrieved")
+    tuneOpts = {}
+    for optName,optVal in zip(kdfParts[1::2],kdfParts[2::2]):
+        optName = optName.lower()
+        if optName == '--target-ms' and optVal.isdigit() and int(optVal) > 0:
+            tuneOpts['targetMs'] = int(optVal)
+        elif optName == '--memory' and _parseSize(optVal):
+            tuneOpts['memory'] = _parseSize(optVal)
+        elif optName == '--parallelism' and optVal.isdigit() and int(optVal) > 0:
+            tuneOpts['parallelism'] = int(optVal)
+        else:
+            print_formatted_text(FormattedText([
+                ('class:red',f'Invalid kdf tune option: {optName} {optVal}'),
+            ]),style=mainStyles)
+            return
+    if 'targetMs' not in tuneOpts:
+        print("kdf tune needs --target-ms")
+        helpAction('kdf')
+        return
+
+    success,msg = kdfTune(**tuneOpts)
+    if success:
+        print_formatted_text(FormattedText([('class:green',f'{msg}')]),style=mainStyles)
+    else:
+        print_formatted_text(FormattedText([('class:red',f'{msg}')]),style=mainStyles)
     return
 
-def main(args):
-    #======== Main loop for the session
+def kdfShow() -> None:
+    """Display the KDF settings of the database, and how long the KDF takes"""
+    kdfParams = _kdfParams()
+    print("=" * 93)
+    print(f"KDF: {kdfParams['algorithm']}   Database format: KDBX {kp.version[0]}.{kp.version[1]}")
+    for paramLine in _kdfParamLines(kdfParams):
+        print(f" {paramLine}")
+    print(f" KDF time on this machine: {_kdfSeconds(kdfParams) * 1000:.0f} ms")
+    if GBLSettings['transformedKey'] is None: # Cleared by kdf tune until the next save
+        print(" KDF settings changed. They will be written on the next save")
+    print("=" * 93)
+    return
 
-    # Set global setting for current group to the root group/path
-    GBLSettings['currentGrp'] = kp.find_groups(path='', first=True)
+def kdfTune(targetMs:int,memory:int=None,parallelism:int=None) -> tuple:
+    """Propose KDF settings that take about targetMs on this machine
 
-    completer = NestedCompleter.from_nested_dict(cmdHelper)
-    session = PromptSession()
-    while True:
-        try:
-            userCmd = session.prompt(
-                ' Command > ',
-                completer=completer,
-                complete_style=CompleteStyle.MULTI_COLUMN,
-                reserve_space_for_menu=3,
-                bottom_toolbar=_btmBarCurPath)
-        except KeyboardInterrupt:
-            logger.debug("Keyboard Interrupt. Exiting Application")
-            break
-        except EOFError:
-            logger.info("EOFError. Exiting application")
-            break
-        else: # checking for valid command/action
-            logger.info(f"Command: {userCmd}")
-            try: # User entered a commmand
-                action = userCmd.split(' ',1)[0]
-            except IndexError: #Why is this here?
-                break
+    The KDF type of the database is kept. For Argon2 the iterations are
+    tuned, with the memory and parallelism given or the current ones. For
+    AES-KDF the rounds are tuned. If the user accepts, the header is
+    rewritten on the next save.
 
-            match action:
-                case 'cls' | 'clear':
-                    cls()
-                case 'add':
-                    logger.debug(f"Add Command found in: {userCmd}")
-                    if userCmd.find(' ') != -1:
-                        cmd_breakdown = userCmd.split(' ')
-                        match cmd_breakdown[1].lower():
-                            case 'entry':
-                                logger.info("Adding an entry")
-                                addStatus, addMsg = addEntry()
-                                if addStatus: # New entry was saved to database
+    Args:
+        targetMs (int): Milliseconds the KDF should take
+        memory (int): Default None. Argon2 memory in bytes, None keeps the current memory
+        parallelism (int): Default None. Argon2 parallelism, None keeps the current parallelism
+
+    Returns:
+        tuple: (status,msg)
+            status (bool):
+                True - New KDF settings waiting for the next save
+                False - KDF settings not changed
+            msg (str): message detail for the status
+    """
+    if kp.version < (4, 0): # KDBX 3.1 has a hash of the header in Meta/HeaderHash, that PyKeePass doesn't update
+        return (False,"Changing the KDF settings needs a KDBX 4 database")
+    curParams = _kdfParams()
+    newParams = dict(curParams)
+    targetSecs = targetMs / 1000
+    if curParams['algorithm'] == 'aeskdf':
+        if memory is not None or parallelism is not None:
+            return (False,"--memory and --parallelism are only for Argon2")
+        benchParams = dict(curParams,rounds=100000)
+        benchSecs = _kdfSeconds(benchParams)
+        newParams['rounds'] = max(1000,int(round(benchParams['rounds'] * targetSecs / benchSecs,-3)))
+    else:
+        if memory is not None:
+            newParams['memory'] = memory
+        if parallelism is not None:
+            newParams['parallelism'] = parallelism
+        if newParams['memory'] < 8 * 1024 * newParams['parallelism']:
+            return (False,f"Argon2 needs at least {8 * newParams['parallelism']}K of memory for parallelism {newParams['parallelism']}")
+        benchParams = dict(newParams,iterations=2)
+        benchSecs = _kdfSeconds(benchParams)
+        newParams['iterations'] = max(1,round(targetSecs * benchParams['iterations'] / benchSecs))
+    logger.info(f"KDF benchmark {benchParams} took {benchSecs:.3f}s, proposing {newParams}")
+
+    print("Benchmarking the current and proposed KDF settings")
+    curMs = _kdfSeconds(curParams) * 1000
+    newMs = _kdfSeconds(newParams) * 1000
+    print(f"{'Current'.ljust(45)} | {'Proposed'.ljust(45)}")
+    print("-" * 93)
+    for curLine,newLine in zip(_kdfParamLines(curParams),_kdfParamLines(newParams)):
+        print(f"{curLine.ljust(45)} | {newLine.ljust(45)}")
+    print(f"{f'KDF time: {curMs:.0f} ms'.ljust(45)} | {f'KDF time: {newMs:.0f} ms'.ljust(45)}")
+
+    if newParams == curParams:
+        return (False,"Current KDF settings already hit the target")
+    if not _confirm("Use the proposed KDF settings "):
+        return (False,"KDF settings not changed")
+    _setKdfParams(newParams)
+    logger.info(f"KDF settings changed to {newParams}")
+    return (True,"KDF settings will be written on the next save")
+
+def settingsAction(settingsOptions:str) -> None:
+    """Settings command validation
+
+    Args:
+        settingsOptions (str): Blank to show the settings, or the setting and it's new value.
+          Example: compression none
+    """
+    logger.debug("Parsing settings command")
+    settingsParts = _noNone(settingsOptions).strip().lower().split()
+    logger.debug(f"settingsParts = {settingsParts}")
+    if len(settingsParts) == 0:
+        print(f"Compression: {'gzip' if _saveSettings()['compression'] else 'none'}")
+        print(f"Cipher: {_saveSettings()['cipher']}")
+        return
+    if len(settingsParts) != 2 or settingsParts[1] not in saveSettingValues.get(settingsParts[0],()):
+        print("Invalid/Incomplete settings command")
+        helpAction('settings')
+        return
+
+    success,msg = chgSaveSetting(settingsParts[0],settingsParts[1])
+    if success:
+        print_formatted_text(FormattedText([('class:green',f'{msg}')]),style=mainStyles)
+    else:
+        print_formatted_text(FormattedText([('class:red',f'{msg}')]),style=mainStyles)
+    return
+
+def chgSaveSetting(setting:str,value:str) -> tuple:
+    """Change the compression or cipher of the database, and save it
+
+    Saves with the old and new settings are timed to a memory stream,
+    so they can be compared without the disk. The KDF doesn't change,
+    so the cached key is used for all the saves.
+
+    Args:
+        setting (str): compression or cipher
+        value (str): New value, see saveSettingValues
+
+    Returns:
+        tuple: (status,msg)
+            status (bool):
+                True - Setting changed and database saved
+                False - Setting not changed
+            msg (str): message detail for the status
+    """
+    curSettings = _saveSettings()
+    newVal = value == 'gzip' if setting == 'compression' else value
+    if curSettings[setting] == newVal:
+        return (False,f"Database {setting} is already {value}")
+    if kp.version < (4, 0): # KDBX 3.1 has a hash of the header in Meta/HeaderHash, that PyKeePass doesn't update
+        return (False,f"Changing the {setting} needs a KDBX 4 database")
+
+    beforeSecs,beforeSize = _timeSave()
+    dynHeader = kp.kdbx.header.value.dynamic_header
+    if setting == 'compression':
+        dynHeader.compression_flags.data.compression = newVal
+    else:
+        dynHeader.cipher_id.data = newVal
+        dynHeader.encryption_iv.data = os.urandom(cipherIVSizes[newVal])
+    kp.kdbx.header.pop('data',None) # Build the header again from the changed settings
+    afterSecs,afterSize = _timeSave()
+    logger.info(f"{setting} changed to {value}. Save {beforeSecs:.3f}s {beforeSize} bytes -> {afterSecs:.3f}s {afterSize} bytes")
+
+    _dbChanged()
+    _saveDb()
+    print(f"Save time: {beforeSecs * 1000:.0f} ms -> {afterSecs * 1000:.0f} ms")
+    print(f"File size: {beforeSize:,} bytes -> {afterSize:,} bytes")
+    return (True,f"Database {setting} changed to {value} and saved")
+
+def statsAction() -> None:
+    """Display statistics and a health report for the database
+
+    All numbers come from one pass over the groups and entries (see _vaultStats)
+    """
+    logger.info("Gathering database statistics")
+    startTime = time.perf_counter()
+    stats = _vaultStats()
+    elapsed = time.perf_counter() - startTime
+    logger.info(f"Database statistics gathered in {elapsed:.3f} seconds. Entries: {stats['entries']}, Groups: {stats['groups']}")
+
+    print("=" * 93)
+    print_formatted_text(FormattedText([
+        ('class:fldname','  Groups: '),('',f"{stats['groups']}"),
+        ('class:fldname','  Entries: '),('',f"{stats['entries']}"),
+        ('class:fldname','  Recycle Bin: '),('',f"{stats['recycleEntries']} entries, {stats['recycleGroups']} groups\n"),
+    ]),style=mainStyles)
+    if stats['oldest'] is not None:
+        print_formatted_text(FormattedText([
+            ('class:fldname','  Oldest modified: '),
+            ('',f"{stats['oldest'][0].astimezone().strftime('%Y-%m-%d %I:%M:%S %p')} {stats['oldest'][1]}\n"),
+            ('class:fldname','  Newest modified: '),
+            ('',f"{stats['newest'][0].astimezone().strftime('%Y-%m-%d %I:%M:%S %p')} {stats['newest'][1]}"),
+        ]),style=mainStyles)
+
+    # Entries per group
+    divLine = "-" * 93
+    print(divLine)
+    print_formatted_text(f"{'Group Path'[0:70].ljust(70)} | {'Entries'.rjust(18)} |")
+    print(divLine)
+    for grpPath,grpCount in stats['perGroup']:
+        print_formatted_text(f"{grpPath[0:70].ljust(70)} | {str(grpCount).rjust(18)} |")
+    print(divLine)
+
+    # Health report
+    print_formatted_text(FormattedText([
+        ('class:fldname','  No password set: '),('',f"{len(stats['emptyPasswords'])} entries\n"),
+        ('class:fldname','  Duplicate passwords: '),
+        ('',f"{len(stats['dupPasswords'])} passwords shared by {sum(len(x) for x in stats['dupPasswords'])} entries\n"),
+        ('class:fldname','  Reused user names: '),
+        ('',f"{len(stats['reusedUsernames'])} user names used by {sum(stats['reusedUsernames'].values())} entries"),
+    ]),style=mainStyles)
+    for dupSet in stats['dupPasswords']:
+        print(f"  Same password: {', '.join(str(x) for x in dupSet)}")
+    for userName,userCount in sorted(stats['reusedUsernames'].items(), key=lambda x: x[1], reverse=True):
+        print(f"  User name {userName!r} used by {userCount} entries")
+    print_formatted_text(FormattedText([
+        ('class:fldname','  Find cache: '),
+        ('',f"{len(GBLSettings['findCache'])} cached, {GBLSettings['findCacheHits']} hits, {GBLSettings['findCacheMisses']} misses"),
+    ]),style=mainStyles)
+    print("=" * 93)
+    print(f"Statistics gathered in {elapsed:.3f} seconds")
+    return
+
+def getPass(uniqueID:uuid,toClip:bool=False) -> None:
+    """Get password for entry's uuid and display to the console
+
+    Args:
+        uniqueID (uuid): uuid of the entry
+        toClip (bool): Default False. Copy the password to the clipboard instead of the console
+    """
+    if uniqueID is None:
+        print("Incomplete getpass command")
+        helpAction("getpass")
+        return
+    if uniqueID == "":
+        print("Incomplete getpass command")
+        helpAction("getpass")
+        return
+
+    logger.info(f"getting password for entry {uniqueID}")
+    theEntry = kp.find_entries(uuid=uniqueID,first=True)
+
+    if theEntry.password is None:
+        print_formatted_text(FormattedText([
+            ('class:red','Entry has no password entry'),
+        ]),style=mainStyles)
+
+        logger.info("Entry has no password entry")
+        _auditEvent('getpass','entry',theEntry.uuid,result='no password')
+        return
+
+    if toClip:
+        success,msg = _clipCopy(theEntry.password)
+        if success:
+            print_formatted_text(FormattedText([('class:green',f'{msg}')]),style=mainStyles)
+            _auditEvent('getpass','entry',theEntry.uuid,result='clipboard')
+        else:
+            print_formatted_text(FormattedText([('class:red',f'{msg}')]),style=mainStyles)
+        return
+
+    # Bug coping to clipboard. BAC has some sneaky things going on, or Windows 11 really sucks.
+    # sometimes nothing is copied. Sometimes everything in the cmd prompt is selected and copied.
+    print(theEntry.password)
+    logger.info("Password retrieved")
+    _auditEvent('getpass','entry',theEntry.uuid)
+    return
+
+def genPassAction(genOptions:str) -> None:
+    """genpass command validation, and display the generated password
+
+    Args:
+        genOptions (str): genpass options. Example: --length 32 --no-symbols
+    """
+    success,genSpec = _parseGenOptions(_noNone(genOptions).split(),allowClip=True)
+    if success:
+        success,genText = _genPassword(genSpec)
+    else:
+        genText = genSpec # genSpec is why
+    if not success:
+        print_formatted_text(FormattedText([('class:red',f'{genText}')]),style=mainStyles)
+        return
+
+    if genSpec['clip']:
+        success,msg = _clipCopy(genText)
+        print_formatted_text(FormattedText([('class:green' if success else 'class:red',f'{msg}')]),style=mainStyles)
+    else:
+        print(genText)
+    print(f"About {_genEntropy(genSpec):.0f} bits of entropy")
+    return
+
+def rotateAction(rotateOptions:str) -> None:
+    """Rotate command validation
+
+    Args:
+        rotateOptions (str): find options, then genpass options.
+          Example: tag prod --length 32
+    """
+    rotateParts = _noNone(rotateOptions).split(' ')
+    # genpass options start at the first --
+    optStart = next((x for x,y in enumerate(rotateParts) if y.startswith('--')),len(rotateParts))
+    findOptions = ' '.join(rotateParts[:optStart])
+    success,genSpec = _parseGenOptions(' '.join(rotateParts[optStart:]).split())
+    if not success: # genSpec is why
+        print_formatted_text(FormattedText([('class:red',f'{genSpec}')]),style=mainStyles)
+        return
+    results = _findEntries(findOptions)
+    if results is None: # can't process
+        print("Invalid/Incomplete rotate command")
+        helpAction('rotate')
+        return
+
+    success,msg = rotatePasswords(results,genSpec)
+    if success:
+        print_formatted_text(FormattedText([('class:green',f'{msg}')]),style=mainStyles)
+    else:
+        print_formatted_text(FormattedText([('class:red',f'{msg}')]),style=mainStyles)
+    return
+
+def rotatePasswords(entries:list,genSpec:dict) -> tuple:
+    """Generate new passwords for entries, and save them with one save
+
+    Entries in the recycle bin, and in groups under it, are skipped. The
+    old password of each entry is kept in it's history.
+
+    Args:
+        entries (list): Entry objects to rotate
+        genSpec (dict): Password generator settings, from _parseGenOptions
+
+    Returns:
+        tuple: (status,msg)
+            status (bool):
+                True - Passwords rotated and database saved
+                False - Nothing was rotated
+            msg (str): message detail for the status
+    """
+    recycledElems = _recycledElements()
+    rotateEntries = [x for x in entries if x._element not in recycledElems]
+    if len(rotateEntries) == 0:
+        return (False,"No entries to rotate")
+    displayEntriesTable(rotateEntries)
+    if not _confirm(f"Generate new passwords for these {len(rotateEntries)} entries "):
+        return (False,"Rotate canceled")
+
+    # Generate them all first, so a bad word list leaves nothing half done
+    newPasswords = []
+    for _ in rotateEntries:
+        success,genText = _genPassword(genSpec)
+        if not success: # genText is why
+            return (False,genText)
+        newPasswords.append(genText)
+    for theEntry,newPassword in zip(rotateEntries,newPasswords):
+        theEntry.save_history()
+        theEntry.password = newPassword
+    logger.info(f"Rotated passwords of {len(rotateEntries)} entries")
+    _saveEntries(rotateEntries)
+    for theEntry in rotateEntries:
+        _auditEvent('edit','entry',theEntry.uuid,result='rotated')
+    return (True,f"Rotated the passwords of {len(rotateEntries)} entries")
+
+def dupesAction(dupesOptions:str) -> None:
+    """Dupes command validation. Displays the duplicate sets, and merges or recycles them
+
+    Args:
+        dupesOptions (str): Options. Example: --titles --similarity 0.8 --recycle
+    """
+    logger.debug("Parsing dupes command")
+    dupesParts = _noNone(dupesOptions).split()
+    byTitle = False
+    similarity = 0.7
+    dedupeHow = None
+    while len(dupesParts) > 0:
+        dupesOpt = dupesParts.pop(0).lower()
+        match dupesOpt:
+            case '--titles':
+                byTitle = True
+            case '--similarity':
+                try:
+                    similarity = float(dupesParts.pop(0))
+                except (IndexError,ValueError):
+                    similarity = -1
+                if not 0 < similarity <= 1:
+                    print_formatted_text(FormattedText([('class:red','--similarity must be a number greater than 0, up to 1')]),style=mainStyles)
+                    return
+            case '--merge' | '--recycle' if dedupeHow is None:
+                dedupeHow = dupesOpt[2:]
+            case _:
+                print("Invalid dupes command")
+                helpAction('dupes')
+                return
+
+    dupeSets = findDupes(byTitle,similarity)
+    if len(dupeSets) == 0:
+        print(' -- No duplicate entries found --')
+        return
+    for setNum,(setKind,setEntries) in enumerate(dupeSets,1):
+        print(f"Set {setNum}: {setKind}")
+        displayEntriesTable(setEntries)
+    if dedupeHow is None:
+        print(f"{len(dupeSets)} sets of duplicates. Use dupes --merge or dupes --recycle to remove them")
+        return
+
+    success,msg = dedupeEntries([x[1] for x in dupeSets],dedupeHow)
+    if success:
+        print_formatted_text(FormattedText([('class:green',f'{msg}')]),style=mainStyles)
+    else:
+        print_formatted_text(FormattedText([('class:red',f'{msg}')]),style=mainStyles)
+    return
+
+def findDupes(byTitle:bool=False,similarity:float=0.7) -> list:
+    """Find sets of duplicate entries, without comparing every pair of entries
+
+    Entries with the same url host and username are found by hashing
+    that pair. Similar titles are found with the trigram Jaccard
+    similarity, with prefix filtering so only entries sharing one of
+    their rarest trigrams are compared. Entries in the recycle bin are
+    skipped.
+
+    Args:
+        byTitle (bool): Default False. Also find entries with similar titles
+        similarity (float): Default 0.7. Smallest trigram similarity of titles in a set
+
+    Returns:
+        list: (description (str), entries (list)) for each set. Entries newest first
+    """
+    startTime = time.perf_counter()
+    recycleGrp = kp.recyclebin_group
+    recycledElems = set(recycleGrp._element.iter('Entry')) if recycleGrp is not None else set()
+    rows = [x for x in _entryProjection() if x[0]._element not in recycledElems]
+    byMtime = lambda x: x.mtime
+    dupeSets = []
+
+    siteUsers = {}
+    for row in rows:
+        urlHost = _urlHost(row[3])
+        if urlHost != '': # No site, nothing to compare
+            siteUsers.setdefault((urlHost,row[2].strip().lower()),[]).append(row[0])
+    siteSets = {}
+    for (urlHost,userName),setEntries in siteUsers.items():
+        if len(setEntries) > 1:
+            dupeSets.append((f"site {urlHost} username {userName if userName != '' else '(none)'}",sorted(setEntries,key=byMtime,reverse=True)))
+            siteSets.update((x.uuid,len(dupeSets)) for x in setEntries)
+
+    if byTitle:
+        for setEntries in _similarTitles(rows,similarity):
+            # Already found with the same site and username
+            if len({siteSets.get(x.uuid) for x in setEntries}) == 1 and setEntries[0].uuid in siteSets:
+                continue
+            dupeSets.append((f"similar titles ({similarity:g})",sorted(setEntries,key=byMtime,reverse=True)))
+    logger.info(f"Found {len(dupeSets)} duplicate sets in {len(rows)} entries in {time.perf_counter() - startTime:.3f} seconds")
+    return dupeSets
+
+def dedupeEntries(dupeSets:list,dedupeHow:str) -> tuple:
+    """Merge or recycle sets of duplicate entries, and save with one save
+
+    The newest entry of each set is kept. With merge, it gets the fields
+    it doesn't have from the others (blank fields, custom fields, tags,
+    and attachments) and it's old version is kept in it's history. The
+    others are put in the recycle bin, so nothing is lost.
+
+    Args:
+        dupeSets (list): lists of Entry objects, newest first, from findDupes
+        dedupeHow (str): merge or recycle
+
+    Returns:
+        tuple: (status,msg)
+            status (bool):
+                True - Duplicates removed and database saved
+                False - Nothing was changed
+            msg (str): message detail for the status
+    """
+    # An entry can be in a site set and a title set. It's only recycled once, and never kept and recycled
+    keepEntries = {}
+    recycleEntries = {}
+    for setEntries in dupeSets:
+        keeper = next((x for x in setEntries if x.uuid not in recycleEntries),None)
+        if keeper is None:
+            continue
+        keepEntries.setdefault(keeper.uuid,(keeper,[]))
+        for theEntry in setEntries:
+            if theEntry.uuid not in keepEntries and theEntry.uuid not in recycleEntries:
+                recycleEntries[theEntry.uuid] = theEntry
+                keepEntries[keeper.uuid][1].append(theEntry)
+    if len(recycleEntries) == 0:
+        return (False,"No duplicate entries to remove")
+    if not _confirm(f"{dedupeHow.capitalize()} {len(recycleEntries)} duplicates into {len(keepEntries)} entries, putting the duplicates in the recycle bin "):
+        return (False,f"{dedupeHow.capitalize()} canceled")
+
+    changedEntries = []
+    if dedupeHow == 'merge':
+        for keeper,dupeEntries in keepEntries.values():
+            if len(dupeEntries) > 0 and _mergeEntryFields(keeper,dupeEntries):
+                changedEntries.append(keeper)
+    for theEntry in recycleEntries.values():
+        logger.info(f"Entry uuid: {theEntry.uuid} being put into database recycle bin as a duplicate")
+        kp.trash_entry(theEntry)
+        _locationChanged(theEntry)
+    logger.info(f"Dedupe {dedupeHow}: {len(changedEntries)} entries merged into, {len(recycleEntries)} recycled")
+    _saveEntries(changedEntries + list(recycleEntries.values()))
+    for theEntry in changedEntries:
+        _auditEvent('edit','entry',theEntry.uuid,result='merged')
+    for theEntry in recycleEntries.values():
+        _auditEvent('delete','entry',theEntry.uuid,result='recycled')
+    return (True,f"{len(recycleEntries)} duplicates put in the recycle bin, {len(changedEntries)} entries merged into")
+
+def getOtpAction(otpOptions:str) -> None:
+    """getotp command validation
+
+    Args:
+        otpOptions (str): uuid of the entry, optionally after --watch. Or --stop
+    """
+    otpParts = _noNone(otpOptions).strip().split()
+    logger.debug(f"otpParts = {otpParts}")
+    if otpParts == ['--stop']:
+        GBLSettings['otpWatch'] = None
+        print("TOTP watch stopped")
+        return
+    otpWatch = len(otpParts) == 2 and otpParts[0].lower() == '--watch'
+    if len(otpParts) != 1 and not otpWatch:
+        print("Invalid/Incomplete getotp command")
+        helpAction('getotp')
+        return
+    try:
+        uniqueID = uuid.UUID(otpParts[-1])
+    except ValueError:
+        print_formatted_text(FormattedText([
+            ('class:red','Invalid UUID'),
+        ]),style=mainStyles)
+        return
+
+    theEntry = _getIndex()['entries'].get(uniqueID)
+    if theEntry is None:
+        print_formatted_text(FormattedText([
+            ('class:red','Unable to find entry for uuid'),
+        ]),style=mainStyles)
+        return
+    success,otpSettings = _entryOtp(theEntry)
+    if not success: # otpSettings is why
+        print_formatted_text(FormattedText([('class:red',f'{otpSettings}')]),style=mainStyles)
+        return
+
+    otpCode,otpSecsLeft = _totpCode(otpSettings)
+    print(f"{otpCode}  (valid for {otpSecsLeft}s)")
+    _auditEvent('getotp','entry',theEntry.uuid)
+    if otpWatch:
+        GBLSettings['otpWatch'] = (_noNone(theEntry.title),otpSettings)
+        print("Code shown in the bottom toolbar. getotp --stop to remove it")
+    return
+
+def main(args):
+    #======== Main loop for the session
+
+    # Set global setting for current group to the root group/path
+    GBLSettings['currentGrp'] = kp.find_groups(path='', first=True)
+
+    cmdHelper['use'] = {x: None for x in GBLSettings['dbSessions']}
+    completer = NestedCompleter.from_nested_dict(cmdHelper)
+    session = PromptSession()
+    while True:
+        try:
+            userCmd = session.prompt(
+                ' Command > ',
+                completer=completer,
+                complete_style=CompleteStyle.MULTI_COLUMN,
+                reserve_space_for_menu=3,
+                bottom_toolbar=_btmBarCurPath,
+                refresh_interval=1 if GBLSettings['otpWatch'] is not None else 0)
+        except KeyboardInterrupt:
+            logger.debug("Keyboard Interrupt. Exiting Application")
+            break
+        except EOFError:
+            logger.info("EOFError. Exiting application")
+            break
+        else: # checking for valid command/action
+            logger.info(f"Command: {_maskCommand(userCmd)}")
+            GBLSettings['cmdStart'] = time.perf_counter()
+            try: # User entered a commmand
+                action = userCmd.split(' ',1)[0]
+            except IndexError: #Why is this here?
+                break
+
+            match action:
+                case 'cls' | 'clear':
+                    cls()
+                case 'add':
+                    logger.debug(f"Add Command found in: {userCmd}")
+                    if userCmd.find(' ') != -1:
+                        cmd_breakdown = userCmd.split(' ')
+                        match cmd_breakdown[1].lower():
+                            case 'entry':
+                                logger.info("Adding an entry")
+                                addStatus, addMsg = addEntry()
+                                if addStatus: # New entry was saved to database
                                     logger.debug(f"UUID of entry: {addMsg.uuid}. Entry={addMsg}")
                                     displayEntry(addMsg)
                                 else: # new entry was not saved to database
@@ -1464,10 +3764,13 @@ def main(args):
                 case 'getpass':
                     logger.debug(f"getpass Command found in: {userCmd}")
                     if userCmd.find(' ') != -1:
-                        objCmd = userCmd.split(' ',1)[1]
+                        objCmd = userCmd.split(' ',1)[1].strip()
+                        toClip = objCmd.lower().startswith('--clip')
+                        if toClip:
+                            objCmd = objCmd[len('--clip'):]
                         try:
                             uniqueID = uuid.UUID(objCmd.strip())
-                            getPass(uniqueID)
+                            getPass(uniqueID,toClip)
                         except ValueError:
                             print_formatted_text(FormattedText([
                                 ('class:red','Invalid UUID'),
@@ -1480,13 +3783,124 @@ def main(args):
                     else:
                         print("getpass command incomplete")
                         helpAction("getpass")
+                case 'move':
+                    logger.debug(f"Move command found in: {userCmd}")
+                    if userCmd.find(' ') != -1:
+                        objCmd = userCmd.split(' ',1)[1] # strip command and keep args
+                        moveAction(objCmd)
+                    else:
+                        print("move command incomplete")
+                        helpAction("move")
+                case 'set':
+                    logger.debug(f"Set command found in: {userCmd}")
+                    if userCmd.find(' ') != -1:
+                        objCmd = userCmd.split(' ',1)[1] # strip command and keep args
+                        setAction(objCmd)
+                    else:
+                        print("set command incomplete")
+                        helpAction("set")
+                case 'purge':
+                    logger.debug(f"Purge command found in: {userCmd}")
+                    if userCmd.find(' ') != -1:
+                        objCmd = userCmd.split(' ',1)[1] # strip command and keep args
+                        purgeAction(objCmd)
+                    else:
+                        print("purge command incomplete")
+                        helpAction("purge")
+                case 'merge':
+                    logger.debug(f"Merge command found in: {userCmd}")
+                    if userCmd.find(' ') != -1:
+                        objCmd = userCmd.split(' ',1)[1] # strip command and keep args
+                        mergeAction(objCmd)
+                    else:
+                        print("merge command incomplete")
+                        helpAction("merge")
+                case 'kdf':
+                    logger.debug(f"KDF command found in: {userCmd}")
+                    if userCmd.find(' ') != -1:
+                        objCmd = userCmd.split(' ',1)[1] # strip command and keep args
+                        kdfAction(objCmd)
+                    else:
+                        print("kdf command incomplete")
+                        helpAction("kdf")
+                case 'settings':
+                    logger.debug(f"Settings command found in: {userCmd}")
+                    settingsAction(userCmd.split(' ',1)[1] if userCmd.find(' ') != -1 else "")
+                case 'use':
+                    logger.debug(f"Use command found in: {userCmd}")
+                    useAction(userCmd.split(' ',1)[1] if userCmd.find(' ') != -1 else "")
+                case 'stats':
+                    logger.debug(f"Stats command found in: {userCmd}")
+                    statsAction()
+                case 'audit':
+                    logger.debug(f"Audit command found in: {userCmd}")
+                    if userCmd.find(' ') != -1:
+                        objCmd = userCmd.split(' ',1)[1] # strip command and keep args
+                        auditAction(objCmd)
+                    else:
+                        statsAction()
+                case 'getotp':
+                    logger.debug(f"getotp command found in: {userCmd}")
+                    if userCmd.find(' ') != -1:
+                        objCmd = userCmd.split(' ',1)[1] # strip command and keep args
+                        getOtpAction(objCmd)
+                    else:
+                        print("getotp command incomplete")
+                        helpAction("getotp")
+                case 'genpass':
+                    logger.debug(f"genpass command found in: {userCmd}")
+                    genPassAction(userCmd.split(' ',1)[1] if userCmd.find(' ') != -1 else "")
+                case 'rotate':
+                    logger.debug(f"Rotate command found in: {userCmd}")
+                    if userCmd.find(' ') != -1:
+                        objCmd = userCmd.split(' ',1)[1] # strip command and keep args
+                        rotateAction(objCmd)
+                    else:
+                        print("rotate command incomplete")
+                        helpAction("rotate")
+                case 'dupes':
+                    logger.debug(f"Dupes command found in: {userCmd}")
+                    dupesAction(userCmd.split(' ',1)[1] if userCmd.find(' ') != -1 else "")
+                case 'history':
+                    logger.debug(f"History command found in: {userCmd}")
+                    if userCmd.find(' ') != -1:
+                        objCmd = userCmd.split(' ',1)[1] # strip command and keep args
+                        historyAction(objCmd)
+                    else:
+                        print("history command incomplete")
+                        helpAction("history")
+                case 'prune-history':
+                    logger.debug(f"Prune history command found in: {userCmd}")
+                    objCmd = userCmd.split(' ',1)[1] if userCmd.find(' ') != -1 else ""
+                    pruneHistoryAction(objCmd)
+                case 'attach' | 'detach' | 'extract':
+                    logger.debug(f"Attachment command found in: {userCmd}")
+                    if userCmd.find(' ') != -1:
+                        objCmd = userCmd.split(' ',1)[1] # strip command and keep args
+                        attachmentAction(action,objCmd)
+                    else:
+                        print(f"{action} command incomplete")
+                        helpAction(action)
+                case 'expiring':
+                    logger.debug(f"Expiring command found in: {userCmd}")
+                    expiringAction(userCmd.split(' ',1)[1] if userCmd.find(' ') != -1 else "")
                 case 'list' | 'ls':
                     logger.debug("Listing entries in current group")
-                    displayGroup(GBLSettings['currentGrp'])
+                    if userCmd.find(' ') != -1:
+                        objCmd = userCmd.split(' ',1)[1] # strip command and keep args
+                        listAction(objCmd)
+                    else:
+                        displayGroup(GBLSettings['currentGrp'])
                 case 'reload':
                     logger.debug("Reloading database")
                     print("=" * 93)
-                    kp.reload()
+                    _reloadDb()
+                    GBLSettings['binaryHashes'] = None
+                    GBLSettings['index'] = None
+                    _dbChanged()
+                    # Current group object is from before the reload
+                    curGrp = kp.find_groups(uuid=GBLSettings['currentGrp'].uuid,first=True)
+                    GBLSettings['currentGrp'] = curGrp if curGrp is not None else kp.root_group
                     print("Database reloaded")
                 case 'help':
                     if userCmd.find(' ') != -1:
@@ -1531,46 +3945,1009 @@ def _confirm(msg:str) -> bool:
     else:
         return False
 
-def _grpEntries(grp) -> None:
-    """Recursively goes though group (grp) and displays to console
+def _findEntries(findOptions:str):
+    """Find entry/s which meet the critera in findOptions
+
+    Used by the find command, and commands which work on the entries
+    a find would return (move, set)
 
     Args:
-        grp (PyKeePass.Group): Group object to get listed
+        findOptions (str): What to find by and the values.
+            Format: key srcString
+              or one or more field~pattern predicates (title, username, url, path, notes)
+        Example: title My test entry
+        Example: title~web username~svc
+
+    Returns:
+        list | None: Entries found. None if findOptions is not a valid search
     """
-    displayGroup(grp)
-    for subGrp in grp.subgroups:
-        _grpEntries(subGrp)
+    if findOptions is None: # can't process
+        return None
+    xtmp = findOptions.strip()
+    srchBy = xtmp.split(' ',1)[0].lower()
+    if srchBy.find('~') != -1: # field~pattern predicates
+        predicates = _parsePredicates(xtmp)
+        if predicates is None:
+            return None
+        srchBy = 'match'
+        srchStr = predicates
+    elif xtmp.find(' ') != -1:
+        srchStr = xtmp.split(' ',1)[1].strip()
+        if srchBy in ('title','username'): # Same as a single predicate
+            srchBy = 'match'
+            srchStr = ((xtmp.split(' ',1)[0].lower(),srchStr),)
+    else: # Incomplete find command
+        return None
+
+    # Cached results are only good for the database generation they were found in
+    findCache = GBLSettings['findCache']
+    cacheKey = (GBLSettings['dbName'],srchBy,srchStr)
+    if cacheKey in findCache and findCache[cacheKey][0] == GBLSettings['generation']:
+        GBLSettings['findCacheHits'] += 1
+        findCache.move_to_end(cacheKey)
+        logger.info(f"Find cache hit for {cacheKey}")
+        index = _getIndex()
+        return [index['entries'][x] for x in findCache[cacheKey][1]]
+    GBLSettings['findCacheMisses'] += 1
 
-def _isEntryInRecycle(theEntry) -> bool:
-    """Checks if theEntry is in the database Recycle bin
+    # What field are we searching
+    logger.debug(f"searching by {srchBy}")
+    match srchBy:
+        case 'match':
+            logger.info(f"searching for : {srchStr}")
+            try:
+                entryMatcher = _compileMatcher(srchStr)
+            except re.error as oopsError:
+                logger.info(f"Invalid search pattern: {oopsError}")
+                print_formatted_text(FormattedText([
+                    ('class:red',f'Invalid search pattern: {oopsError}'),
+                ]),style=mainStyles)
+                return None
+            results = [x[0] for x in _entryProjection() if entryMatcher(x)]
+        case 'tag':
+            logger.info(f"searching 'tag' for : {srchStr}")
+            entryUUIDs = _tagQuery(srchStr)
+            index = _getIndex()
+            results = [index['entries'][x] for x in entryUUIDs]
+        case 'field':
+            if srchStr.find('=') == -1:
+                return None
+            fldName,fldValue = srchStr.split('=',1)
+            logger.info(f"searching field {fldName.strip()!r} for : {fldValue.strip()}")
+            results = _indexLookup(('field',fldName.strip().lower(),fldValue.strip().lower()))
+        case 'url':
+            logger.info(f"searching 'url' for : {srchStr}")
+            index = _getIndex()
+            results = [index['entries'][x] for x in _urlQuery(srchStr)]
+        case _: # Catch all
+            return None
+
+    findCache[cacheKey] = (GBLSettings['generation'],[x.uuid for x in results])
+    findCache.move_to_end(cacheKey)
+    if len(findCache) > GBLSettings['findCacheSize']: # Drop the least recently used
+        findCache.popitem(last=False)
+    return results
 
-    Database Recycle bin can have any name so this accounts
-    for that.
+def _compileMatcher(predicates:tuple):
+    """Compile find predicates once into a single matcher for _entryProjection rows
 
     Args:
-        theEntry (pyKeePass.Entry): The entry object that is being checked
+        predicates (tuple): (field, pattern) pairs. All must match, case insensitive
 
     Returns:
-        bool: if the entry is in the database's recycle bin
-            True: theEntry is in the recycle bin
-            False: theEntry is not in the recycle bin
+        function: Called with a projection row, True if the row matches all the predicates
+
+    Raises:
+        re.error: a pattern is not a valid regular expression
     """
-    # Get db's recycle group
-    logger.debug("Getting recycle bin group")
-    recycleGrp = kp.recyclebin_group
-    # Get entryies path (poping last as that's the entry itself)
-    tmpEpath = theEntry.path.copy()
-    tmpEpath.pop() # pop out the Entry from the path
-    logger.debug(f"tmpEpath={tmpEpath}, recycleGrp.path={recycleGrp.path}")
-    if tmpEpath == recycleGrp.path: # Entry is in the recycle bin
-        logger.debug(f"Entry uuid: {theEntry.uuid} is in database recycle bin: {recycleGrp.path}")
+    compiled = [(projectionFields[fldName],re.compile(pattern,re.IGNORECASE).search) for fldName,pattern in predicates]
+    def entryMatcher(row) -> bool:
+        for fldPos,patternSearch in compiled:
+            if patternSearch(row[fldPos]) is None:
+                return False
         return True
-    else:
-        logger.debug(f"Entry uuid: {theEntry.uuid} is NOT in database recycle bin: {recycleGrp.path}")
-        return False
+    return entryMatcher
 
-def _prettyPath(pathList:list) -> str:
-    """Take the elements in a list and make it pretty
+def _findAttachment(theEntry,attachName:str):
+    """Find an attachment of an entry by name
+
+    Args:
+        theEntry (PyKeePass.Entry): Entry with the attachment
+        attachName (str): Name of the attachment
+
+    Returns:
+        PyKeePass.Attachment | None: None if the entry has no attachment named attachName
+    """
+    for attachment in theEntry.attachments:
+        if attachment.filename == attachName:
+            return attachment
+    return None
+
+def _groupByPath(grpPath:str):
+    """Find a group by it's path
+
+    Args:
+        grpPath (str): Group names separated by /. Blank or / is the root group
+          Example: Servers/Prod
+
+    Returns:
+        PyKeePass.Group | None: None if the group was not found
+    """
+    pathParts = [x.strip() for x in _noNone(grpPath).strip().split('/') if x.strip() != '']
+    logger.debug(f"Finding group for path {pathParts}")
+    if len(pathParts) == 0:
+        return kp.root_group
+    return kp.find_groups(path=pathParts,first=True)
+
+def _grpEntries(grp) -> None:
+    """Recursively goes though group (grp) and displays to console
+
+    Args:
+        grp (PyKeePass.Group): Group object to get listed
+    """
+    displayGroup(grp)
+    for subGrp in grp.subgroups:
+        _grpEntries(subGrp)
+
+def _groupSubtree(grp) -> dict:
+    """Summary of a group and everything under it with one traversal
+
+    Args:
+        grp (PyKeePass.Group): Group at the top of the subtree
+
+    Returns:
+        dict:
+            groups (set): uuids of grp and all it's subgroups
+            entries (int): Number of entries in the subtree
+            inRecycle (bool): grp is in the recycle bin
+            tree (list): (depth, group name, entry count) for each group, depth first
+    """
+    subTree = {'groups': set(), 'entries': 0, 'inRecycle': False, 'tree': []}
+    topDepth = None
+    for subGrp,grpPath,inRecycle in _walkGroups(grp):
+        if topDepth is None: # First is the top group
+            topDepth = len(grpPath)
+            subTree['inRecycle'] = inRecycle
+        grpCount = len(subGrp.entries)
+        subTree['groups'].add(subGrp.uuid)
+        subTree['entries'] += grpCount
+        subTree['tree'].append((len(grpPath) - topDepth,_noNone(subGrp.name),grpCount))
+    return subTree
+
+def _historySetting(setting:str):
+    """Get a database history setting (HistoryMaxItems or HistoryMaxSize)
+
+    Args:
+        setting (str): Name of the setting in the database Meta
+
+    Returns:
+        int | None: None if the setting is not set or unlimited (-1)
+    """
+    theVal = kp.tree.findtext(f'Meta/{setting}')
+    if theVal is None or int(theVal) < 0:
+        return None
+    return int(theVal)
+
+def _buildIndex(theKp=None) -> dict:
+    """Build the entry index with one pass over all the entries
+
+    The index is an inverted index. Each key is a tuple starting with what
+    it indexes, for example ('field', name, value), and has the set of uuids
+    of the entries with that key.
+
+    Args:
+        theKp (PyKeePass): Default None. Database to index, None is the current database
+
+    Returns:
+        dict:
+            entries (dict): uuid, PyKeePass.Entry
+            postings (dict): key tuple, set of entry uuids
+            entryKeys (dict): uuid, set of the key tuples for the entry
+            expiry (list): (expiry time, uuid) of the entries that expire, sorted
+            expiryAt (dict): uuid, expiry time of the entries that expire
+    """
+    if theKp is None:
+        theKp = kp
+    startTime = time.perf_counter()
+    index = {'entries': {}, 'postings': {}, 'entryKeys': {}, 'expiry': [], 'expiryAt': {}}
+    for entry in theKp.entries:
+        _indexEntry(entry,index,sortExpiry=False)
+    index['expiry'].sort() # Once, instead of an insort for each entry
+    logger.info(f"Index built for {len(index['entries'])} entries, {len(index['postings'])} keys, {len(index['expiry'])} expiring in {time.perf_counter() - startTime:.3f} seconds")
+    return index
+
+def _getIndex() -> dict:
+    """The entry index, built the first time it is needed"""
+    if GBLSettings['index'] is None:
+        GBLSettings['index'] = _buildIndex()
+    return GBLSettings['index']
+
+def _indexKeys(entry) -> set:
+    """The index keys for an entry
+
+    Args:
+        entry (PyKeePass.Entry): Entry object to get the keys for
+
+    Returns:
+        set: key tuples, lower case
+            ('field', name, value) for each custom field
+            ('tag', tag) for each tag
+            ('host', host) of the url
+            ('site', site) for the host, and each parent of it down to the registrable domain
+    """
+    entryKeys = set()
+    for fldName,fldValue,fldProtected in _customFields(entry):
+        if not fldProtected: # Protected values are not kept in the index
+            entryKeys.add(('field',_noNone(fldName).lower(),_noNone(fldValue).lower()))
+    for tag in entry.tags:
+        if tag.strip() != '':
+            entryKeys.add(('tag',tag.strip().lower()))
+    urlHost = _urlHost(entry.url)
+    if urlHost != '':
+        entryKeys.add(('host',urlHost))
+        urlDomain = _urlDomain(urlHost)
+        siteName = urlHost
+        while True: # api.github.com is found by github.com too
+            entryKeys.add(('site',siteName))
+            if siteName == urlDomain or siteName.find('.') == -1:
+                break
+            siteName = siteName.split('.',1)[1]
+    return entryKeys
+
+def _indexEntry(entry,index=None,sortExpiry:bool=True) -> None:
+    """Add or update an entry in the index
+
+    Args:
+        entry (PyKeePass.Entry): Entry object added or changed
+        index (dict): Default None. Index to update, None is the current index.
+            Nothing is done if the current index has not been built.
+        sortExpiry (bool): Default True. Keep the expiry list sorted. False when
+            building the index, which sorts it once at the end
+    """
+    if index is None:
+        index = GBLSettings['index']
+        if index is None: # Not built yet, will have entry when built
+            return
+    entryUUID = entry.uuid
+    newKeys = _indexKeys(entry)
+    oldKeys = index['entryKeys'].get(entryUUID,set())
+    for key in oldKeys - newKeys:
+        index['postings'][key].discard(entryUUID)
+        if len(index['postings'][key]) == 0:
+            del index['postings'][key]
+    for key in newKeys - oldKeys:
+        index['postings'].setdefault(key,set()).add(entryUUID)
+    index['entryKeys'][entryUUID] = newKeys
+    index['entries'][entryUUID] = entry
+    expiryTime = entry.expiry_time if entry.expires else None
+    oldExpiry = index['expiryAt'].get(entryUUID)
+    if expiryTime != oldExpiry:
+        if oldExpiry is not None:
+            _removeExpiry(index,oldExpiry,entryUUID)
+        if expiryTime is None:
+            index['expiryAt'].pop(entryUUID)
+        else:
+            index['expiryAt'][entryUUID] = expiryTime
+            if sortExpiry:
+                bisect.insort(index['expiry'],(expiryTime,entryUUID))
+            else:
+                index['expiry'].append((expiryTime,entryUUID))
+
+def _indexLookup(key:tuple) -> list:
+    """Entries in the index with the key
+
+    Args:
+        key (tuple): index key. Example ('field', 'env', 'prod')
+
+    Returns:
+        list: PyKeePass.Entry objects with the key
+    """
+    index = _getIndex()
+    return [index['entries'][x] for x in index['postings'].get(key,())]
+
+def _tagQuery(tagQuery:str) -> set:
+    """uuids of the entries matching a tag query, by set operations on the index
+
+    Args:
+        tagQuery (str): Tags separated by , (entry has all) or | (entry has any)
+
+    Returns:
+        set: uuids of the entries matching
+    """
+    postings = _getIndex()['postings']
+    if tagQuery.find('|') != -1: # Any of the tags
+        tagSets = [postings.get(('tag',x.strip().lower()),set()) for x in tagQuery.split('|') if x.strip() != '']
+        return set().union(*tagSets)
+    tagSets = [postings.get(('tag',x.strip().lower()),set()) for x in tagQuery.split(',') if x.strip() != '']
+    if len(tagSets) == 0:
+        return set()
+    # Smallest set first keeps the intersection cheap
+    tagSets.sort(key=len)
+    return set(tagSets[0]).intersection(*tagSets[1:])
+
+def _urlQuery(urlQuery:str) -> set:
+    """uuids of the entries for a site, from the host and site keys of the index
+
+    A host finds the entries for it and it's subdomains with one lookup,
+    as every entry has a site key for it's host and each parent of it.
+    *.host finds just the subdomains. Any other pattern with * or ? is
+    matched against the distinct hosts in the index, not every entry.
+
+    Args:
+        urlQuery (str): host, url, *.host, or a host pattern.
+            Example: github.com, https://github.com/login, *.github.com, git*.com
+
+    Returns:
+        set: uuids of the entries matching
+    """
+    postings = _getIndex()['postings']
+    urlQuery = urlQuery.strip().lower()
+    subOnly = urlQuery.startswith('*.')
+    if re.search(r'[*?]',urlQuery[2:] if subOnly else urlQuery) is not None: # Pattern, check each host once
+        hostMatch = re.compile(fnmatch.translate(urlQuery.rstrip('.'))).match
+        hostSets = [y for x,y in postings.items() if x[0] == 'host' and hostMatch(x[1])]
+        return set().union(*hostSets)
+    if subOnly:
+        urlQuery = urlQuery[2:]
+
+    urlHost = _urlHost(urlQuery)
+    if urlHost == '':
+        return set()
+    if subOnly and urlQuery.startswith('www.'): # *.www.example.com, _urlHost dropped the www.
+        urlHost = f"www.{urlHost}"
+    siteUUIDs = postings.get(('site',urlHost),set())
+    if subOnly:
+        return siteUUIDs - postings.get(('host',urlHost),set())
+    return set(siteUUIDs)
+
+def _unindexEntry(entryUUID) -> None:
+    """Remove a deleted entry from the index
+
+    Args:
+        entryUUID (uuid): uuid of the entry deleted
+    """
+    index = GBLSettings['index']
+    if index is None: # Not built yet
+        return
+    for key in index['entryKeys'].pop(entryUUID,set()):
+        index['postings'][key].discard(entryUUID)
+        if len(index['postings'][key]) == 0:
+            del index['postings'][key]
+    index['entries'].pop(entryUUID,None)
+    oldExpiry = index['expiryAt'].pop(entryUUID,None)
+    if oldExpiry is not None:
+        _removeExpiry(index,oldExpiry,entryUUID)
+
+def _removeExpiry(index:dict,expiryTime:datetime,entryUUID) -> None:
+    """Remove an entry from the sorted expiry list of the index
+
+    Args:
+        index (dict): Index from _buildIndex
+        expiryTime (datetime): Expiry time the entry was indexed with
+        entryUUID (uuid): uuid of the entry
+    """
+    expiryAt = bisect.bisect_left(index['expiry'],(expiryTime,entryUUID))
+    if expiryAt < len(index['expiry']) and index['expiry'][expiryAt] == (expiryTime,entryUUID):
+        del index['expiry'][expiryAt]
+
+def _expiryRange(fromTime,toTime) -> list:
+    """Entries that expire between two times, from the sorted expiry list of the index
+
+    Args:
+        fromTime (datetime | None): Start of the range, inclusive. None for no start
+        toTime (datetime): End of the range, inclusive
+
+    Returns:
+        list: (expiry time, uuid) for each entry, soonest first
+    """
+    expiry = _getIndex()['expiry']
+    # uuid.UUID(int=0) sorts before, and the max uuid after, any uuid with the same time
+    startAt = 0 if fromTime is None else bisect.bisect_left(expiry,(fromTime,uuid.UUID(int=0)))
+    endAt = bisect.bisect_right(expiry,(toTime,uuid.UUID(int=(1 << 128) - 1)))
+    return expiry[startAt:endAt]
+
+def _expiryWarning() -> str:
+    """Warning for the bottom toolbar of expired entries, and entries expiring soon
+
+    Worked out again when the database changes, or after a minute.
+
+    Returns:
+        str: The warning. Blank string when nothing has expired or is expiring soon
+    """
+    lastWarning = GBLSettings['expiryWarning']
+    if lastWarning is not None and lastWarning[0:2] == (GBLSettings['dbName'],GBLSettings['generation']) \
+            and time.perf_counter() - lastWarning[2] < 60:
+        return lastWarning[3]
+    nowTime = datetime.now(timezone.utc)
+    recycledElems = _recycledElements()
+    index = _getIndex()
+    expiredCount = expiringCount = 0
+    for expiryTime,entryUUID in _expiryRange(None,nowTime + GBLSettings['expiryWarnWithin']):
+        if index['entries'][entryUUID]._element not in recycledElems:
+            if expiryTime <= nowTime:
+                expiredCount += 1
+            else:
+                expiringCount += 1
+    warnText = []
+    if expiredCount > 0:
+        warnText.append(f"{expiredCount} expired")
+    if expiringCount > 0:
+        warnText.append(f"{expiringCount} expiring in {GBLSettings['expiryWarnWithin'].days}d")
+    warnText = f" | {', '.join(warnText)}" if len(warnText) > 0 else ""
+    GBLSettings['expiryWarning'] = (GBLSettings['dbName'],GBLSettings['generation'],time.perf_counter(),warnText)
+    return warnText
+
+def _recycledElements() -> set:
+    """XML elements of the entries in the recycle bin, and in the groups under it
+
+    Checking an entry is then a set lookup of it's element, instead of
+    walking up it's parent groups.
+
+    Returns:
+        set: lxml Entry elements. Empty if the database has no recycle bin
+    """
+    recycleGrp = kp.recyclebin_group
+    if recycleGrp is None:
+        return set()
+    return set(recycleGrp._element.iter('Entry'))
+
+def _isEntryInRecycle(theEntry,recycleUUID=None) -> bool:
+    """Checks if theEntry is in the database Recycle bin
+
+    Database Recycle bin can have any name so the entry's parent group
+    uuid is compared to the recycle bin uuid.
+
+    Args:
+        theEntry (pyKeePass.Entry): The entry object that is being checked
+        recycleUUID (uuid): Default None. uuid of the recycle bin group. If None
+            it is looked up. Pass it in when checking many entries.
+
+    Returns:
+        bool: if the entry is in the database's recycle bin
+            True: theEntry is in the recycle bin
+            False: theEntry is not in the recycle bin
+    """
+    if recycleUUID is None:
+        # Get db's recycle group
+        logger.debug("Getting recycle bin group")
+        recycleGrp = kp.recyclebin_group
+        if recycleGrp is None: # Database has no recycle bin
+            logger.debug("Database has no recycle bin")
+            return False
+        recycleUUID = recycleGrp.uuid
+
+    parentGrp = theEntry.group
+    if parentGrp is not None and parentGrp.uuid == recycleUUID: # Entry is in the recycle bin
+        logger.debug("Entry uuid: %s is in database recycle bin uuid: %s",theEntry.uuid,recycleUUID)
+        return True
+    else:
+        logger.debug("Entry uuid: %s is NOT in database recycle bin uuid: %s",theEntry.uuid,recycleUUID)
+        return False
+
+def _parseDuration(theVal:str):
+    """Convert a duration string like 90d to a timedelta
+
+    Args:
+        theVal (str): Number followed by h (hours), d (days), or w (weeks)
+
+    Returns:
+        timedelta | None: None if theVal is not a valid duration
+    """
+    units = {'h': 'hours', 'd': 'days', 'w': 'weeks'}
+    theVal = _noNone(theVal).strip().lower()
+    if len(theVal) < 2 or theVal[-1] not in units or not theVal[:-1].isdigit():
+        return None
+    return timedelta(**{units[theVal[-1]]: int(theVal[:-1])})
+
+def _tombstones(theKp) -> dict:
+    """Deleted objects of a database
+
+    Args:
+        theKp (PyKeePass): Database
+
+    Returns:
+        dict: uuid (base64 text as in the XML), deletion time (datetime)
+    """
+    return {x.findtext('UUID'): theKp._decode_time(x.findtext('DeletionTime'))
+            for x in theKp.tree.iterfind('Root/DeletedObjects/DeletedObject')}
+
+def _addTombstones(delUUIDs) -> None:
+    """Add deleted objects to the current database, so merges know they were deleted
+
+    Args:
+        delUUIDs (list | dict): uuid objects, deleted now. Or a dict of
+            uuid (base64 text), deletion time (datetime) from _tombstones
+    """
+    delObjects = kp.tree.find('Root/DeletedObjects')
+    if delObjects is None:
+        delObjects = etree.SubElement(kp.tree.find('Root'),'DeletedObjects')
+    if not isinstance(delUUIDs,dict):
+        delTime = datetime.now(timezone.utc)
+        delUUIDs = {base64.b64encode(x.bytes).decode(): delTime for x in delUUIDs}
+    oldObjects = {x.findtext('UUID'): x for x in delObjects.iterfind('DeletedObject')}
+    for delUUID,delTime in delUUIDs.items():
+        if delUUID in oldObjects: # Only the newest deletion is kept
+            delObjects.remove(oldObjects[delUUID])
+        delObject = etree.SubElement(delObjects,'DeletedObject')
+        etree.SubElement(delObject,'UUID').text = delUUID
+        etree.SubElement(delObject,'DeletionTime').text = kp._encode_time(delTime)
+    logger.debug("Added %d deleted objects",len(delUUIDs))
+
+def _subtreeUUIDs(grp) -> list:
+    """uuid of a group, and every group and entry under it
+
+    Args:
+        grp (PyKeePass.Group): Top of the subtree
+
+    Returns:
+        list: uuid objects
+    """
+    subUUIDs = []
+    for subGrp,grpPath,inRecycle in _walkGroups(grp):
+        subUUIDs.append(subGrp.uuid)
+        subUUIDs.extend(x.uuid for x in subGrp.entries)
+    return subUUIDs
+
+def _elemTime(theKp,theElem,timeName:str) -> datetime:
+    """A time from the Times of a group or entry XML element
+
+    Args:
+        theKp (PyKeePass): Database the element is from, for it's time format
+        theElem (lxml.etree.Element): Group or Entry element
+        timeName (str): Example: LastModificationTime
+
+    Returns:
+        datetime: The time. Oldest possible if the element doesn't have it
+    """
+    timeText = theElem.findtext(f'Times/{timeName}')
+    if not timeText:
+        return datetime.min.replace(tzinfo=timezone.utc)
+    return theKp._decode_time(timeText)
+
+def _locationChanged(theObj) -> None:
+    """Record an entry or group was moved now, so a merge can tell which move is newer
+
+    PyKeePass doesn't update LocationChanged when it moves or recycles.
+
+    Args:
+        theObj (PyKeePass.Entry | PyKeePass.Group): Entry or group that was moved
+    """
+    _setElemTime(theObj._element,'LocationChanged',kp._encode_time(datetime.now(timezone.utc)))
+
+def _setElemTime(theElem,timeName:str,timeText:str) -> None:
+    """Set a time in the Times of a group or entry XML element, adding it if needed
+
+    Args:
+        theElem (lxml.etree.Element): Group or Entry element
+        timeName (str): Example: LocationChanged
+        timeText (str): The time, as encoded in the database XML
+    """
+    timesElem = theElem.find('Times')
+    if timesElem is None:
+        timesElem = etree.SubElement(theElem,'Times')
+    timeElem = timesElem.find(timeName)
+    if timeElem is None:
+        timeElem = etree.SubElement(timesElem,timeName)
+    timeElem.text = timeText
+
+def _replaceFields(localElem,otherElem) -> None:
+    """Replace the fields of a group element with a copy of the other's fields
+
+    Child groups and entries are left as they are.
+
+    Args:
+        localElem (lxml.etree.Element): Group element to change
+        otherElem (lxml.etree.Element): Group element to copy from
+    """
+    for childElem in list(localElem):
+        if childElem.tag not in ('Group','Entry'):
+            localElem.remove(childElem)
+    for fieldAt,childElem in enumerate(x for x in otherElem if x.tag not in ('Group','Entry')):
+        localElem.insert(fieldAt,copy.deepcopy(childElem))
+
+def _mergeHistory(theEntry,versions:list) -> int:
+    """Add versions to an entry's history, skipping ones it already has
+
+    Versions are matched by modification time. The history is kept in
+    modification time order, oldest first.
+
+    Args:
+        theEntry (lxml.etree.Element): Entry element
+        versions (list): Entry elements. Copies are added, without their own history
+
+    Returns:
+        int: Number of versions added
+    """
+    entryHistory = theEntry.find('History')
+    if entryHistory is None:
+        entryHistory = etree.SubElement(theEntry,'History')
+    haveTimes = {x.findtext('Times/LastModificationTime') for x in entryHistory}
+    haveTimes.add(theEntry.findtext('Times/LastModificationTime'))
+    addCount = 0
+    for versionElem in versions:
+        versionTime = versionElem.findtext('Times/LastModificationTime')
+        if versionTime in haveTimes:
+            continue
+        haveTimes.add(versionTime)
+        versionElem = copy.deepcopy(versionElem)
+        for oldHistory in versionElem.findall('History'):
+            versionElem.remove(oldHistory)
+        entryHistory.append(versionElem)
+        addCount += 1
+    if addCount > 0:
+        entryHistory[:] = sorted(entryHistory,key=lambda x: kp._decode_time(x.findtext('Times/LastModificationTime')))
+    return addCount
+
+def _remapBinaries(theEntry,otherKp,binMap:dict) -> None:
+    """Point the attachments of an entry copied from otherKp at binaries in this database
+
+    Binaries are copied over once, and not if this database already has
+    the same content.
+
+    Args:
+        theEntry (lxml.etree.Element): Entry element copied from otherKp, history included
+        otherKp (PyKeePass): Database the entry was copied from
+        binMap (dict): other binary id, local binary id. Filled in as binaries are copied
+    """
+    for binValue in theEntry.iterfind('.//Binary/Value[@Ref]'):
+        otherID = int(binValue.get('Ref'))
+        if otherID not in binMap:
+            if 'otherBinaries' not in binMap: # PyKeePass.binaries copies them all, so only once
+                binMap['otherBinaries'] = otherKp.binaries
+            binData = binMap['otherBinaries'][otherID]
+            binHash = hashlib.sha256(binData).digest()
+            binaryHashes = _binaryHashes()
+            if binHash not in binaryHashes:
+                binaryHashes[binHash] = kp.add_binary(binData)
+            binMap[otherID] = binaryHashes[binHash]
+        binValue.set('Ref',str(binMap[otherID]))
+
+def _urlHost(theURL:str) -> str:
+    """Normalized host of a url
+
+    Lower case, without the port, user info, trailing dot, or a leading www.
+    A url without a scheme, like example.com/login, is taken as a host.
+
+    Args:
+        theURL (str): url of an entry
+
+    Returns:
+        str: The host. Blank string when there isn't one
+    """
+    theURL = _noNone(theURL).strip()
+    if theURL == '':
+        return ''
+    if theURL.find('://') == -1:
+        theURL = f"//{theURL}"
+    try:
+        urlHost = urlsplit(theURL).hostname
+    except ValueError: # Bad port or brackets
+        return ''
+    urlHost = _noNone(urlHost).rstrip('.')
+    if urlHost.startswith('www.'):
+        urlHost = urlHost[4:]
+    return urlHost
+
+def _urlDomain(urlHost:str) -> str:
+    """Registrable domain of a host, like github.com for api.github.com
+
+    The last two labels, or three when the host is under a common second
+    level of a country code, like example.co.uk. IP addresses and single
+    label hosts are their own domain.
+
+    Args:
+        urlHost (str): Normalized host, from _urlHost
+
+    Returns:
+        str: The registrable domain
+    """
+    hostLabels = urlHost.split('.')
+    if len(hostLabels) <= 2 or urlHost.find(':') != -1 or hostLabels[-1].isdigit(): # Short, IPv6, or IPv4
+        return urlHost
+    if len(hostLabels[-1]) == 2 and hostLabels[-2] in secondLevelLabels:
+        return '.'.join(hostLabels[-3:])
+    return '.'.join(hostLabels[-2:])
+
+def _similarTitles(rows:list,similarity:float) -> list:
+    """Sets of entries with similar titles
+
+    Titles are compared by the Jaccard similarity of their sets of
+    trigrams. Prefix filtering keeps this from comparing every pair. The
+    trigrams of each title are ordered rarest first, and two titles with
+    a similarity of at least the threshold have to share one of the first
+    len - ceil(similarity * len) + 1 of them. Only titles sharing one are
+    compared.
+
+    Sets are complete linkage, every pair of titles in a set is similar.
+    Similar pairs are joined most similar first, and two sets are only
+    joined when all their titles are similar to each other, so a chain
+    of similar titles doesn't pull very different ones into one set.
+
+    Args:
+        rows (list): Rows of the entry projection
+        similarity (float): Smallest similarity for two titles to be in a set
+
+    Returns:
+        list: lists of PyKeePass.Entry, one for each set of 2 or more entries
+    """
+    titleGrams = []
+    for row in rows:
+        normTitle = ' '.join(re.sub(r'[^0-9a-z]+',' ',row[1].lower()).split())
+        if normTitle != '':
+            normTitle = f" {normTitle} "
+            titleGrams.append((row[0],{normTitle[x:x+3] for x in range(len(normTitle) - 2)}))
+    gramCounts = {}
+    for entry,grams in titleGrams:
+        for gram in grams:
+            gramCounts[gram] = gramCounts.get(gram,0) + 1
+
+    # Smallest sets first, so each title is only compared to ones it's size or smaller
+    titleGrams.sort(key=lambda x: len(x[1]))
+    similarPairs = [] # (similarity, title position, other title position)
+    prefixIndex = {}
+    compareCount = 0
+    for titleAt,(entry,grams) in enumerate(titleGrams):
+        gramList = sorted(grams,key=lambda x: (gramCounts[x],x))
+        prefixLen = len(gramList) - math.ceil(similarity * len(gramList)) + 1
+        candidates = set()
+        for gram in gramList[:prefixLen]:
+            candidates.update(prefixIndex.get(gram,()))
+            prefixIndex.setdefault(gram,[]).append(titleAt)
+        for otherAt in candidates:
+            otherGrams = titleGrams[otherAt][1]
+            if len(otherGrams) < similarity * len(grams):
+                continue
+            compareCount += 1
+            sharedCount = len(grams & otherGrams)
+            pairSimilarity = sharedCount / (len(grams) + len(otherGrams) - sharedCount)
+            if pairSimilarity >= similarity:
+                similarPairs.append((pairSimilarity,titleAt,otherAt))
+
+    # Prefix filtering finds every similar pair, so a pair not found is not similar
+    pairSet = {(x[1],x[2]) for x in similarPairs} | {(x[2],x[1]) for x in similarPairs}
+    setOf = {} # title position, list of title positions in it's set
+    similarPairs.sort(reverse=True)
+    for pairSimilarity,titleAt,otherAt in similarPairs:
+        titleSet = setOf.get(titleAt,[titleAt])
+        otherSet = setOf.get(otherAt,[otherAt])
+        if titleSet is otherSet:
+            continue
+        if all((x,y) in pairSet for x in titleSet for y in otherSet):
+            titleSet = titleSet + otherSet
+            for x in titleSet:
+                setOf[x] = titleSet
+    titleSets = {id(x): x for x in setOf.values()}
+    logger.debug("Title similarity: %d titles, %d compared pairs, %d similar",len(titleGrams),compareCount,len(similarPairs))
+    return [[titleGrams[x][0] for x in y] for y in titleSets.values()]
+
+def _mergeEntryFields(keeper,dupeEntries:list) -> bool:
+    """Copy what the kept entry doesn't have from it's duplicates
+
+    Blank standard fields, missing custom fields, tags and attachments
+    are copied. The kept entry's version before the merge goes in it's
+    history.
+
+    Args:
+        keeper (PyKeePass.Entry): Entry being kept
+        dupeEntries (list): Duplicate Entry objects, newest first
+
+    Returns:
+        bool: True if the kept entry was changed
+    """
+    keepFields = _entryFields(keeper)
+    keepCustom = {x[0] for x in _customFields(keeper)}
+    keepTags = list(keeper.tags)
+    keepAttach = {x.filename for x in keeper.attachments}
+    newFields = {}
+    newCustom = {}
+    newTags = []
+    newAttach = []
+    for dupeEntry in dupeEntries:
+        for fldName,fldValue in _entryFields(dupeEntry).items():
+            if fldName in reserved_keys and _noNone(fldValue) != '' and _noNone(keepFields.get(fldName)) == '':
+                newFields.setdefault(fldName,fldValue)
+        for fldName,fldValue,fldProtected in _customFields(dupeEntry):
+            if fldName not in keepCustom:
+                newCustom.setdefault(fldName,(fldValue,fldProtected))
+        newTags.extend(x for x in dupeEntry.tags if x not in keepTags and x not in newTags)
+        for theAttach in dupeEntry.attachments:
+            if theAttach.filename not in keepAttach:
+                keepAttach.add(theAttach.filename)
+                newAttach.append(theAttach)
+    if len(newFields) + len(newCustom) + len(newTags) + len(newAttach) == 0:
+        return False
+
+    logger.info(f"Merging into entry uuid: {keeper.uuid}. fields: {list(newFields)}, custom fields: {list(newCustom)}, tags: {newTags}, attachments: {len(newAttach)}")
+    keeper.save_history()
+    for fldName,fldValue in newFields.items():
+        setattr(keeper,fldName.lower(),fldValue) # Title, UserName... are entry properties
+    for fldName,fldValue in newCustom.items():
+        keeper.set_custom_property(fldName,fldValue[0],protect=fldValue[1])
+    if len(newTags) > 0:
+        keeper.tags = keepTags + newTags
+    for theAttach in newAttach:
+        keeper.add_attachment(theAttach.id,theAttach.filename)
+    return True
+
+def _saveSettings() -> dict:
+    """Compression and cipher from the current database header
+
+    Returns:
+        dict:
+            compression (bool): True if the contents are gzip compressed
+            cipher (str): aes256, chacha20, or twofish
+    """
+    dynHeader = kp.kdbx.header.value.dynamic_header
+    return {'compression': dynHeader.compression_flags.data.compression,
+            'cipher': dynHeader.cipher_id.data}
+
+def _timeSave(saveRuns:int=3) -> tuple:
+    """Time saves of the current database to memory
+
+    Args:
+        saveRuns (int): Default 3. Number of saves, the fastest is used
+
+    Returns:
+        tuple: (seconds the fastest save took (float), size in bytes (int))
+    """
+    saveTimes = []
+    for _ in range(saveRuns):
+        saveStream = io.BytesIO()
+        startTime = time.perf_counter()
+        kp.save(saveStream,transformed_key=GBLSettings['transformedKey'])
+        saveTimes.append(time.perf_counter() - startTime)
+    return (min(saveTimes),saveStream.tell())
+
+def _kdfParams() -> dict:
+    """KDF settings from the current database header
+
+    Returns:
+        dict:
+            algorithm (str): aeskdf, argon2, or argon2id
+            salt (bytes): KDF seed/salt
+            rounds (int): AES-KDF rounds, None for Argon2
+            iterations, memory (bytes), parallelism, version (int): Argon2 settings, None for AES-KDF
+    """
+    dynHeader = kp.kdbx.header.value.dynamic_header
+    kdfParams = {'algorithm': kp.kdf_algorithm, 'salt': None, 'rounds': None,
+                 'iterations': None, 'memory': None, 'parallelism': None, 'version': None}
+    if kp.version == (3, 1):
+        kdfParams['salt'] = dynHeader.transform_seed.data
+        kdfParams['rounds'] = dynHeader.transform_rounds.data
+        return kdfParams
+    kdfDict = dynHeader.kdf_parameters.data.dict
+    kdfParams['salt'] = kdfDict['S'].value
+    if kdfParams['algorithm'] == 'aeskdf':
+        kdfParams['rounds'] = kdfDict['R'].value
+    else:
+        kdfParams['iterations'] = kdfDict['I'].value
+        kdfParams['memory'] = kdfDict['M'].value
+        kdfParams['parallelism'] = kdfDict['P'].value
+        kdfParams['version'] = kdfDict['V'].value
+    return kdfParams
+
+def _setKdfParams(kdfParams:dict) -> None:
+    """Change the KDF settings in the current database header
+
+    The raw header bytes are dropped, so the header is built again from
+    the changed settings on the next save. The cached key is for the old
+    settings, so the next save runs the KDF.
+
+    Only for KDBX 4. KDBX 3.1 keeps a hash of the header that would no
+    longer match.
+
+    Args:
+        kdfParams (dict): Settings, as from _kdfParams
+    """
+    kdfDict = kp.kdbx.header.value.dynamic_header.kdf_parameters.data.dict
+    if kdfParams['algorithm'] == 'aeskdf':
+        kdfDict['R'].value = kdfParams['rounds']
+    else:
+        kdfDict['I'].value = kdfParams['iterations']
+        kdfDict['M'].value = kdfParams['memory']
+        kdfDict['P'].value = kdfParams['parallelism']
+    kp.kdbx.header.pop('data',None)
+    GBLSettings['transformedKey'] = None
+
+def _kdfSeconds(kdfParams:dict) -> float:
+    """Time one run of the KDF with kdfParams, on a random key
+
+    Args:
+        kdfParams (dict): Settings, as from _kdfParams
+
+    Returns:
+        float: seconds the KDF took
+    """
+    randomKey = os.urandom(32)
+    startTime = time.perf_counter()
+    _kdfTransform(kdfParams,randomKey)
+    return time.perf_counter() - startTime
+
+def _kdfTransform(kdfParams:dict,keyComposite:bytes) -> bytes:
+    """Run the KDF with kdfParams on a composite key
+
+    Args:
+        kdfParams (dict): Settings, as from _kdfParams
+        keyComposite (bytes): Composite of the password and keyfile
+
+    Returns:
+        bytes: The transformed key
+    """
+    if kdfParams['algorithm'] == 'aeskdf':
+        return aes_kdf(kdfParams['salt'],kdfParams['rounds'],keyComposite)
+    return argon2.low_level.hash_secret_raw(
+        secret=keyComposite,
+        salt=kdfParams['salt'],
+        hash_len=32,
+        type=argon2.low_level.Type.ID if kdfParams['algorithm'] == 'argon2id' else argon2.low_level.Type.D,
+        time_cost=kdfParams['iterations'],
+        memory_cost=kdfParams['memory'] // 1024,
+        parallelism=kdfParams['parallelism'],
+        version=kdfParams['version'],
+    )
+
+def _kdfParamLines(kdfParams:dict) -> list:
+    """KDF settings as display lines
+
+    Args:
+        kdfParams (dict): Settings, as from _kdfParams
+
+    Returns:
+        list: str for each setting
+    """
+    if kdfParams['algorithm'] == 'aeskdf':
+        return [f"Rounds: {kdfParams['rounds']:,}"]
+    return [f"Iterations: {kdfParams['iterations']}",
+            f"Memory: {kdfParams['memory'] // 1024 ** 2} MB" if kdfParams['memory'] >= 1024 ** 2 else f"Memory: {kdfParams['memory'] // 1024} KB",
+            f"Parallelism: {kdfParams['parallelism']}"]
+
+def _parseSize(theVal:str):
+    """Convert a size string like 64K to bytes
+
+    Args:
+        theVal (str): Number optionally followed by K, M, or G
+
+    Returns:
+        int | None: None if theVal is not a valid size
+    """
+    units = {'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+    theVal = _noNone(theVal).strip().lower()
+    multiplier = 1
+    if theVal[-1:] in units:
+        multiplier = units[theVal[-1]]
+        theVal = theVal[:-1]
+    if not theVal.isdigit():
+        return None
+    return int(theVal) * multiplier
+
+def _parsePredicates(srchStr:str):
+    """Parse field~pattern predicates
+
+    A pattern runs until the next field~ so it can have spaces.
+    Example: title~Strongmail UI username~bob
+
+    Args:
+        srchStr (str): The predicates
+
+    Returns:
+        tuple | None: (field, pattern) pairs. None if srchStr has an unknown field or no pattern
+    """
+    predicates = []
+    for word in srchStr.split(' '):
+        fldName = word.split('~',1)[0].lower()
+        if word.find('~') != -1 and fldName in projectionFields:
+            predicates.append([fldName,word.split('~',1)[1]])
+        elif len(predicates) == 0:
+            return None
+        else: # Part of the previous pattern
+            predicates[-1][1] += ' ' + word
+    for fldName,pattern in predicates:
+        if pattern.strip() == '':
+            return None
+    return tuple((x[0],x[1].strip()) for x in predicates)
+
+def _prettyPath(pathList:list) -> str:
+    """Take the elements in a list and make it pretty
 
     Example: ["level 1", "level 2", "Level/this/thing", "and here"]
      Returns: "level 1 > level 2 > Level/this/thing, and here"
@@ -1587,6 +4964,23 @@ def _prettyPath(pathList:list) -> str:
                 xString = xString + f" > {value}"
     return xString
 
+def _recycledTime(element) -> datetime:
+    """When an entry or group was put in the recycle bin
+
+    Newest of the location changed time and the modified time. Entries
+    recycled by this application are touched when recycled.
+
+    Args:
+        element (PyKeePass.Entry | PyKeePass.Group): Entry or group in the recycle bin
+
+    Returns:
+        datetime: when the element was recycled
+    """
+    locChanged = element._get_times_property('LocationChanged')
+    if locChanged is None:
+        return element.mtime
+    return max(locChanged,element.mtime)
+
 def _saveGroup(grp) -> None:
     """Update modify date for a group and save to db
 
@@ -1596,7 +4990,8 @@ def _saveGroup(grp) -> None:
     try:
         grp.touch(modify=True)
         logger.debug(f"Saving Group uuid: {grp.uuid}")
-        kp.save()
+        _dbChanged()
+        _saveDb()
         logger.info(f"{grp} uuid: {grp.uuid} has been saved")
         print_formatted_text(FormattedText([('class:green','Group saved')]),style=mainStyles)
     except Exception as oopsError:
@@ -1606,12 +5001,36 @@ def _saveGroup(grp) -> None:
         quit(1)
     return
 
+def _saveEntries(entries:list) -> None:
+    """Update modify date for all the entries, and save to db once
+
+    Args:
+        entries (list): Entry objects changed in memory
+    """
+    try:
+        for entry in entries:
+            entry.touch(modify=True)
+            _indexEntry(entry)
+        logger.debug(f"saving {len(entries)} entries")
+        _dbChanged()
+        _saveDb()
+        logger.info(f"Saved {len(entries)} entries")
+        print_formatted_text(FormattedText([('class:green',f'{len(entries)} entries saved')]),style=mainStyles)
+    except Exception as oopsError:
+        logger.critical(f"Unexpected error: {oopsError}",stack_info=True)
+        print(f"CRITICAL: Unexpected error {oopsError}")
+        traceback.print_exc()
+        quit(1)
+    return
+
 def _saveEntry(entry) -> None:
     """Update modify date for the entry, and will save to db"""
     try:
         entry.touch(modify=True)
+        _indexEntry(entry)
         logger.debug(f"saving entry {entry.uuid}")
-        kp.save()
+        _dbChanged()
+        _saveDb()
         logger.info(f"Saved entry {entry.uuid}")
         print_formatted_text(FormattedText([('class:green','Entry saved')]),style=mainStyles)
     except Exception as oopsError:
@@ -1621,6 +5040,792 @@ def _saveEntry(entry) -> None:
         quit(1)
     return
 
+def _binaryData(binID:int):
+    """Get the data for one binary in the database
+
+    PyKeePass.binaries builds a copy of every binary. This only gets the
+    one binary, and for KDBX4 it is a view on the data (no copy).
+
+    Args:
+        binID (int): id of the binary
+
+    Returns:
+        memoryview | bytes: The binary data
+    """
+    if kp.version >= (4, 0):
+        # first byte is the protected flag
+        return memoryview(kp.payload.inner_header.binary[binID].data)[1:]
+    # KDBX3 binaries are base64 (maybe gzip) text in the XML
+    binElem = kp.tree.find(f"Meta/Binaries/Binary[@ID='{binID}']")
+    if binElem is None:
+        raise IndexError(f"No binary with id {binID}")
+    binData = base64.b64decode(_noNone(binElem.text))
+    if binElem.get('Compressed') == 'True':
+        binData = zlib.decompress(binData,zlib.MAX_WBITS | 32)
+    return binData
+
+def _binaryHashes() -> dict:
+    """Content hash of every binary in the database, built once and cached
+
+    Returns:
+        dict: sha256 digest of the binary data, binary id
+    """
+    if GBLSettings['binaryHashes'] is None:
+        logger.debug("Hashing database binaries")
+        GBLSettings['binaryHashes'] = {}
+        for binID in range(_binaryCount()):
+            GBLSettings['binaryHashes'].setdefault(hashlib.sha256(_binaryData(binID)).digest(),binID)
+    return GBLSettings['binaryHashes']
+
+def _binaryCount() -> int:
+    """Number of binaries in the database"""
+    if kp.version >= (4, 0):
+        return len(kp.payload.inner_header.binary)
+    return len(kp.tree.findall('Meta/Binaries/Binary'))
+
+def _binarySize(binID:int) -> int:
+    """Size in bytes of a binary in the database
+
+    Args:
+        binID (int): id of the binary
+
+    Returns:
+        int: size in bytes, 0 if there is no binary with binID
+    """
+    try:
+        if kp.version >= (4, 0):
+            return len(kp.payload.inner_header.binary[binID].data) - 1
+        return len(_binaryData(binID))
+    except IndexError:
+        logger.warning(f"No binary with id {binID}")
+        return 0
+
+def _customFields(entry) -> list:
+    """Custom fields of an entry, read from the entry's XML once
+
+    Args:
+        entry (PyKeePass.Entry): Entry object to get the custom fields for
+
+    Returns:
+        list: (name, value, protected (bool)) for each custom field
+    """
+    fields = []
+    for strElem in entry._element.findall('String'):
+        fldName = strElem.findtext('Key')
+        if fldName in reserved_keys:
+            continue
+        valElem = strElem.find('Value')
+        if valElem is None:
+            fields.append((fldName,None,False))
+        else:
+            fields.append((fldName,valElem.text,valElem.get('Protected') == 'True'))
+    return fields
+
+def _dbChanged() -> None:
+    """Record the database has changed
+
+    Bumps the generation counter, which invalidates the find cache.
+    Called for every add, edit, delete, move, and reload.
+    """
+    GBLSettings['generation'] += 1
+    logger.debug(f"Database {GBLSettings['dbName']} generation now {GBLSettings['generation']}")
+
+def _entryProjection() -> list:
+    """The fields searched by find for every entry, built once per database generation
+
+    Returns:
+        list: (PyKeePass.Entry, title, username, url, path, notes) for each entry.
+            Fields are strings, None is a blank string
+    """
+    projection = GBLSettings['projection']
+    if projection is not None and projection[0] == GBLSettings['generation']:
+        return projection[1]
+
+    startTime = time.perf_counter()
+    rows = []
+    for grp,grpPath,inRecycle in _walkGroups():
+        prettyPath = _prettyPath(grpPath)
+        for entry in grp.entries:
+            fields = _entryFields(entry)
+            rows.append((entry,
+                _noNone(fields.get('Title')),
+                _noNone(fields.get('UserName')),
+                _noNone(fields.get('URL')),
+                prettyPath,
+                _noNone(fields.get('Notes'))))
+    GBLSettings['projection'] = (GBLSettings['generation'],rows)
+    logger.info(f"Entry projection built for {len(rows)} entries in {time.perf_counter() - startTime:.3f} seconds")
+    return rows
+
+def _entryFields(entry) -> dict:
+    """Returns all the string fields of an entry as a dictionary
+
+    Reads the entry's XML String nodes once, instead of an xpath
+    lookup for each field (entry.title, entry.password...).
+
+    Args:
+        entry (PyKeePass.Entry): Entry object to get the fields for
+
+    Returns:
+        dict: Key is the field name (Title, UserName, Password...), value is the field value
+    """
+    fields = {}
+    for strElem in entry._element.findall('String'):
+        fields[strElem.findtext('Key')] = strElem.findtext('Value')
+    return fields
+
+def _splitTags(theTags:str) -> list:
+    """Split a string of tags separated by ; or , into a list"""
+    return [x.strip() for x in _noNone(theTags).replace(',',';').split(';') if x.strip() != '']
+
+def _vaultStats() -> dict:
+    """Gather database statistics with one pass over all the groups and entries
+
+    Duplicate passwords are found by a map of password hash to entries, so
+    there are no entry to entry comparisons.
+    Entries in the recycle bin are counted, but not checked for duplicates.
+
+    Returns:
+        dict:
+            groups (int): Number of groups
+            entries (int): Number of entries
+            recycleGroups (int): Number of groups in the recycle bin
+            recycleEntries (int): Number of entries in the recycle bin
+            perGroup (list): (path, entry count) for each group
+            oldest (tuple | None): (mtime, Entry) of the oldest modified entry
+            newest (tuple | None): (mtime, Entry) of the newest modified entry
+            emptyPasswords (list): uuids of entries with no password
+            dupPasswords (list): lists of uuids for entries sharing the same password
+            reusedUsernames (dict): user name and count of the entries using it
+    """
+    stats = {
+        'groups': 0,
+        'entries': 0,
+        'recycleGroups': 0,
+        'recycleEntries': 0,
+        'perGroup': [],
+        'oldest': None,
+        'newest': None,
+        'emptyPasswords': [],
+        'dupPasswords': [],
+        'reusedUsernames': {},
+    }
+    pwdMap = {}
+    userMap = {}
+
+    for grp,grpPath,inRecycle in _walkGroups():
+        grpEntries = grp.entries
+        stats['groups'] += 1
+        stats['entries'] += len(grpEntries)
+        stats['perGroup'].append((_prettyPath(grpPath),len(grpEntries)))
+        if inRecycle:
+            stats['recycleGroups'] += 1
+            stats['recycleEntries'] += len(grpEntries)
+
+        for entry in grpEntries:
+            entryMtime = entry.mtime
+            if stats['oldest'] is None or entryMtime < stats['oldest'][0]:
+                stats['oldest'] = (entryMtime,entry)
+            if stats['newest'] is None or entryMtime > stats['newest'][0]:
+                stats['newest'] = (entryMtime,entry)
+            if inRecycle: # Recycled entries are not part of the health report
+                continue
+
+            fields = _entryFields(entry)
+            entryPass = _noNone(fields.get('Password'))
+            if entryPass == "":
+                stats['emptyPasswords'].append(entry.uuid)
+            else:
+                pwdHash = hashlib.sha256(entryPass.encode('utf-8')).digest()
+                pwdMap.setdefault(pwdHash,[]).append(entry.uuid)
+            entryUser = _noNone(fields.get('UserName'))
+            if entryUser != "":
+                userMap[entryUser] = userMap.get(entryUser,0) + 1
+
+    stats['dupPasswords'] = [x for x in pwdMap.values() if len(x) > 1]
+    stats['reusedUsernames'] = {k: v for k,v in userMap.items() if v > 1}
+    return stats
+
+def _useDb(dbName:str) -> None:
+    """Make dbName the current database
+
+    The current database's state in GBLSettings is kept in it's session,
+    and dbName's state is put in GBLSettings.
+
+    Args:
+        dbName (str): Name of an open database
+    """
+    global kp
+    dbSessions = GBLSettings['dbSessions']
+    if GBLSettings['dbName'] == dbName:
+        return
+    if GBLSettings['dbName'] in dbSessions:
+        curSession = dbSessions[GBLSettings['dbName']]
+        curSession['kp'] = kp
+        for stateKey in dbStateKeys:
+            curSession[stateKey] = GBLSettings[stateKey]
+    newSession = dbSessions[dbName]
+    kp = newSession['kp']
+    for stateKey in dbStateKeys:
+        GBLSettings[stateKey] = newSession[stateKey]
+    logger.info(f"Using database {dbName}: {kp.filename}")
+
+def _deriveKey(pKeePassDB:Path,passphrase:str,keyData:bytes=None) -> tuple:
+    """Run the KDF for a database, without decrypting it
+
+    Run in a worker process for each database at startup, as the KDF is
+    CPU bound. Only the transformed key comes back, PyKeePass objects
+    can't be pickled.
+
+    Args:
+        pKeePassDB (Path): Database file
+        passphrase (str): Database password
+        keyData (bytes): Default None. Contents of the keyfile, None for no keyfile
+
+    Returns:
+        tuple: (transformed key (bytes), seconds the KDF took (float))
+    """
+    startTime = time.perf_counter()
+    lockedKp = PyKeePass(pKeePassDB,password=passphrase,keyfile=_keyfileStream(keyData),decrypt=False)
+    return (lockedKp.transformed_key,time.perf_counter() - startTime)
+
+def _openDb(pKeePassDB:Path,passphrase:str,keyData:bytes=None,transformedKey:bytes=None) -> tuple:
+    """Open a database and build it's index
+
+    Args:
+        pKeePassDB (Path): Database file
+        passphrase (str): Database password
+        keyData (bytes): Default None. Contents of the keyfile, None for no keyfile
+        transformedKey (bytes): Default None. Key from _deriveKey, so the KDF is not run again
+
+    Returns:
+        tuple: (status, PyKeePass | str, index | None)
+            status (bool): True if the database was opened
+            PyKeePass | str: the database, or why it was not opened
+            index (dict | None): the database index from _buildIndex
+    """
+    logger.info(f"Opening database {pKeePassDB.resolve()}")
+    try:
+        openKp = PyKeePass(pKeePassDB,password=passphrase,keyfile=_keyfileStream(keyData),transformed_key=transformedKey)
+    except pkExceptions.CredentialsError:
+        logger.warning(f"Invalid password provided for {pKeePassDB.resolve()}")
+        return (False,"Bad creds",None)
+    except Exception as oopsError:
+        logger.critical(f"Unexpected error: {oopsError}",stack_info=True)
+        traceback.print_exc()
+        return (False,f"CRITICAL: Unexpected error {oopsError}",None)
+    return (True,openKp,_buildIndex(openKp))
+
+def _keyfileStream(keyData:bytes):
+    """Keyfile contents as a stream for PyKeePass
+
+    The keyfile is read once when the database is opened. PyKeePass takes
+    the stream for the keyfile argument, and supports the same formats
+    as with a path (KeePass XML v1/v2, 32 byte, 64 hex, or any other file).
+
+    Args:
+        keyData (bytes): Contents of the keyfile, None for no keyfile
+
+    Returns:
+        io.BytesIO | None: None when there is no keyfile
+    """
+    if keyData is None:
+        return None
+    return io.BytesIO(keyData)
+
+def _readKeyfile(keyfilePath:Path) -> tuple:
+    """Read a keyfile, and check PyKeePass can make a key from it
+
+    Args:
+        keyfilePath (Path): Keyfile
+
+    Returns:
+        tuple: (status,bytes | str)
+            status (bool): True if the keyfile can be used
+            bytes | str: contents of the keyfile, or why it can't be used
+    """
+    try:
+        keyData = keyfilePath.read_bytes()
+        compute_key_composite(password=None,keyfile=_keyfileStream(keyData))
+    except OSError as oopsError: # PyKeePass also raises these without a strerror
+        logger.warning(f"Can not read keyfile {keyfilePath.resolve()}: {oopsError}")
+        return (False,f"Can not read keyfile {keyfilePath.resolve()}: {oopsError.strerror or oopsError}")
+    except (AssertionError,ValueError) as oopsError: # Bad hash in an XML v2 keyfile, or bad hex
+        logger.warning(f"Invalid keyfile {keyfilePath.resolve()}: {oopsError!r}")
+        return (False,f"Invalid keyfile {keyfilePath.resolve()}: {oopsError or 'key does not match the keyfile hash'}")
+    return (True,keyData)
+
+def _saveDb() -> None:
+    """Save the current database with the cached transformed key
+
+    The KDF seeds in the header don't change on save, so the key derived
+    when the database was opened is still good, and the KDF is not run.
+    When there is no cached key (new credentials or KDF settings), the
+    KDF is run once with the settings in the header, and that key is
+    used for the save and cached.
+    """
+    if GBLSettings['transformedKey'] is None:
+        startTime = time.perf_counter()
+        keyComposite = compute_key_composite(password=kp.password,keyfile=kp.keyfile)
+        GBLSettings['transformedKey'] = _kdfTransform(_kdfParams(),keyComposite)
+        logger.info(f"Key derived for the new credentials or KDF settings in {time.perf_counter() - startTime:.2f} seconds")
+    kp.save(transformed_key=GBLSettings['transformedKey'])
+
+def _reloadDb() -> None:
+    """Reload the current database, with the cached transformed key when it's still good
+
+    If the file was saved by something else with a new KDF seed, the
+    cached key will not work and the KDF is run again.
+    """
+    try:
+        kp.read(kp.filename,kp.password,kp.keyfile,transformed_key=GBLSettings['transformedKey'])
+    except pkExceptions.CredentialsError:
+        logger.info("Cached key no longer valid, running the KDF")
+        kp.read(kp.filename,kp.password,kp.keyfile)
+    GBLSettings['transformedKey'] = kp.transformed_key
+
+def _parseGenOptions(genParts:list,allowClip:bool=False) -> tuple:
+    """Password generator settings from genpass options
+
+    Args:
+        genParts (list): genpass options, split on whitespace
+        allowClip (bool): Default False. Allow the --clip option
+
+    Returns:
+        tuple: (status,dict | str)
+            status (bool): True if the options are valid
+            dict | str: settings like genPassDefaults, or why the options are invalid
+    """
+    genSpec = dict(genPassDefaults)
+    classFlags = {'--no-upper': 'u', '--no-lower': 'l', '--no-digits': 'd', '--no-symbols': 's'}
+    genParts = list(genParts)
+    while genParts:
+        genOpt = genParts.pop(0).lower()
+        if genOpt in classFlags:
+            genSpec['classes'] = genSpec['classes'].replace(classFlags[genOpt],'')
+        elif genOpt == '--pronounceable':
+            genSpec['mode'] = 'pronounce'
+        elif genOpt == '--clip' and allowClip:
+            genSpec['clip'] = True
+        elif genOpt in ('--length','--words') and genParts and genParts[0].isdigit() and 0 < int(genParts[0]) <= 1024:
+            if genOpt == '--words':
+                genSpec['mode'] = 'words'
+            genSpec[genOpt[2:]] = int(genParts.pop(0))
+        elif genOpt == '--wordlist' and genParts:
+            genSpec['wordlist'] = genParts.pop(0)
+        else:
+            return (False,f"Invalid genpass option: {genOpt}")
+    if genSpec['mode'] == 'chars' and genSpec['classes'] == "":
+        return (False,"No character classes left to generate from")
+    if genSpec['mode'] == 'chars' and genSpec['length'] < len(genSpec['classes']):
+        return (False,f"Length must be at least {len(genSpec['classes'])} to use every character class")
+    return (True,genSpec)
+
+def _genPassword(genSpec:dict) -> tuple:
+    """Generate a password with secrets
+
+    Args:
+        genSpec (dict): Settings from _parseGenOptions
+
+    Returns:
+        tuple: (status,str)
+            status (bool): True if generated
+            str: the password, or why it could not be generated
+    """
+    match genSpec['mode']:
+        case 'words':
+            success,wordList = _wordList(genSpec['wordlist'])
+            if not success: # wordList is why
+                return (False,wordList)
+            return (True,'-'.join(secrets.choice(wordList) for _ in range(genSpec['words'])))
+        case 'pronounce':
+            genChars = [secrets.choice('bcdfghjklmnprstvwz' if x % 2 == 0 else 'aeiou') for x in range(genSpec['length'])]
+            letterCount = len(genChars)
+            if 'd' in genSpec['classes'] and len(genChars) > 1:
+                genChars[-1] = secrets.choice(string.digits)
+                letterCount -= 1
+            if 'u' in genSpec['classes']:
+                upperAt = secrets.randbelow(letterCount)
+                genChars[upperAt] = genChars[upperAt].upper()
+            return (True,''.join(genChars))
+    # One of each class, then the rest from all the classes, then shuffled
+    genPool = ''.join(genPassClasses[x] for x in genSpec['classes'])
+    genChars = [secrets.choice(genPassClasses[x]) for x in genSpec['classes']]
+    genChars += [secrets.choice(genPool) for _ in range(genSpec['length'] - len(genChars))]
+    secrets.SystemRandom().shuffle(genChars)
+    return (True,''.join(genChars))
+
+def _genEntropy(genSpec:dict) -> float:
+    """Entropy bits of a password generated with genSpec
+
+    Args:
+        genSpec (dict): Settings from _parseGenOptions
+
+    Returns:
+        float: Entropy in bits
+    """
+    match genSpec['mode']:
+        case 'words':
+            return genSpec['words'] * math.log2(max(len(_wordList(genSpec['wordlist'])[1]),1))
+        case 'pronounce':
+            return (genSpec['length'] // 2) * math.log2(5) + (genSpec['length'] - genSpec['length'] // 2) * math.log2(18)
+    return genSpec['length'] * math.log2(len(''.join(genPassClasses[x] for x in genSpec['classes'])))
+
+def _wordList(wordFile:str) -> tuple:
+    """Words for diceware passwords, read once for each file
+
+    Only lowercase words of 3 to 9 letters are used.
+
+    Args:
+        wordFile (str): One word per line
+
+    Returns:
+        tuple: (status,tuple | str)
+            status (bool): True if there are words
+            tuple | str: the words, or why there are none
+    """
+    if wordFile not in GBLSettings['wordLists']:
+        try:
+            with open(wordFile,'r',encoding='utf-8',errors='ignore') as theFile:
+                theWords = {x.strip() for x in theFile}
+        except OSError as oopsError:
+            logger.info(f"Can not read word list {wordFile}: {oopsError}")
+            return (False,f"Can not read word list {wordFile}: {oopsError.strerror}")
+        GBLSettings['wordLists'][wordFile] = tuple(sorted(x for x in theWords if x.isascii() and x.isalpha() and x.islower() and 3 <= len(x) <= 9))
+        logger.info(f"Word list {wordFile}: {len(GBLSettings['wordLists'][wordFile])} words")
+    if len(GBLSettings['wordLists'][wordFile]) < 1000:
+        return (False,f"Word list {wordFile} has less than 1000 usable words")
+    return (True,GBLSettings['wordLists'][wordFile])
+
+def _genPassPrompt(promptVal:str) -> str:
+    """Generate a password from !gen typed at a password prompt
+
+    Args:
+        promptVal (str): What was typed. !gen then genpass options
+
+    Returns:
+        str: The password, blank if it could not be generated
+    """
+    success,genSpec = _parseGenOptions(promptVal[len('!gen'):].split())
+    if success:
+        success,genText = _genPassword(genSpec)
+    else:
+        genText = genSpec # genSpec is why
+    if not success:
+        print_formatted_text(FormattedText([('class:red',f'{genText}')]),style=mainStyles)
+        return ""
+    logger.info("Password generated at prompt")
+    return genText
+
+def _entryOtp(theEntry) -> tuple:
+    """TOTP settings for an entry, parsed once and cached
+
+    The cache is by entry uuid, and is used while the otp field is the
+    same as when it was parsed.
+
+    Args:
+        theEntry (PyKeePass.Entry): Entry with an otp field
+
+    Returns:
+        tuple: (status,dict | str)
+            status (bool): True if the entry has a usable otp field
+            dict | str: TOTP settings from _parseOtp, or why there are none
+    """
+    otpValue = theEntry.otp
+    if _noNone(otpValue) == "":
+        return (False,"Entry has no otp field")
+    cachedOtp = GBLSettings['otpCache'].get(theEntry.uuid)
+    if cachedOtp is not None and cachedOtp[0] == otpValue:
+        return (True,cachedOtp[1])
+    success,otpSettings = _parseOtp(otpValue)
+    if success:
+        GBLSettings['otpCache'][theEntry.uuid] = (otpValue,otpSettings)
+    return (success,otpSettings)
+
+def _parseOtp(otpValue:str) -> tuple:
+    """Parse an otpauth://totp/ URI
+
+    Args:
+        otpValue (str): The URI
+
+    Returns:
+        tuple: (status,dict | str)
+            status (bool): True if the URI is a usable TOTP
+            dict | str: why it's not usable, or
+                key (bytes): decoded secret
+                digits (int): code length
+                period (int): seconds each code is good for
+                algorithm (str): hashlib name of the HMAC hash
+    """
+    otpURI = urlsplit(otpValue.strip())
+    if otpURI.scheme.lower() != 'otpauth' or otpURI.netloc.lower() != 'totp':
+        return (False,"otp field is not an otpauth://totp/ URI")
+    otpParams = {x.lower(): y[0] for x,y in parse_qs(otpURI.query).items()}
+    otpSecret = unquote(otpParams.get('secret','')).replace(' ','').upper()
+    try:
+        otpKey = base64.b32decode(otpSecret + '=' * (-len(otpSecret) % 8))
+        otpDigits = int(otpParams.get('digits',6))
+        otpPeriod = int(otpParams.get('period',30))
+    except ValueError: # binascii.Error is a ValueError
+        return (False,"otp field has an invalid secret, digits, or period")
+    otpAlgorithm = otpParams.get('algorithm','SHA1').lower()
+    if otpKey == b'' or otpPeriod < 1 or not 1 <= otpDigits <= 10 or otpAlgorithm not in ('sha1','sha256','sha512'):
+        return (False,"otp field has an invalid secret, digits, period, or algorithm")
+    return (True,{'key': otpKey, 'digits': otpDigits, 'period': otpPeriod, 'algorithm': otpAlgorithm})
+
+def _totpCode(otpSettings:dict,atTime:float=None) -> tuple:
+    """RFC 6238 TOTP code
+
+    Args:
+        otpSettings (dict): From _parseOtp
+        atTime (float): Default None. Unix time to get the code for, None is now
+
+    Returns:
+        tuple: (code (str), seconds the code is still good for (int))
+    """
+    if atTime is None:
+        atTime = time.time()
+    otpCounter,otpElapsed = divmod(int(atTime),otpSettings['period'])
+    otpHash = hmac.digest(otpSettings['key'],struct.pack('>Q',otpCounter),otpSettings['algorithm'])
+    hashOffset = otpHash[-1] & 0x0F # RFC 4226 dynamic truncation
+    otpBinary = struct.unpack('>I',otpHash[hashOffset:hashOffset + 4])[0] & 0x7FFFFFFF
+    otpCode = str(otpBinary % 10 ** otpSettings['digits']).zfill(otpSettings['digits'])
+    return (otpCode,otpSettings['period'] - otpElapsed)
+
+def _clipCopy(theText:str) -> tuple:
+    """Copy theText to the clipboard, and start the timer to clear it
+
+    A copy before the timer is up replaces the pending clear.
+
+    Args:
+        theText (str): What to copy
+
+    Returns:
+        tuple: (status,msg)
+            status (bool): True if copied
+            msg (str): message detail for the status
+    """
+    clipBackend = _clipBackend()
+    if clipBackend is None:
+        logger.info("No clipboard backend found")
+        return (False,"No clipboard found. Install wl-copy or xclip, or use --clip-backend osc52")
+    try:
+        _clipWrite(clipBackend,theText)
+    except (OSError,subprocess.SubprocessError) as oopsError:
+        logger.warning(f"Copy to clipboard with {clipBackend} failed: {oopsError}")
+        return (False,f"Copy to clipboard with {clipBackend} failed: {oopsError}")
+
+    clearSecs = GBLSettings['clipClearSecs']
+    with clipLock:
+        if GBLSettings['clipTimer'] is not None:
+            GBLSettings['clipTimer'].cancel()
+        GBLSettings['clipText'] = theText
+        GBLSettings['clipTimer'] = threading.Timer(clearSecs,_clipClear)
+        GBLSettings['clipTimer'].daemon = True
+        GBLSettings['clipTimer'].start()
+    logger.info(f"Copied to clipboard with {clipBackend}, clearing in {clearSecs} seconds")
+    return (True,f"Copied to clipboard. Clearing in {clearSecs} seconds")
+
+def _clipClear() -> None:
+    """Clear the clipboard if a copy is waiting to be cleared
+
+    Run by the clipboard timer, and at exit so nothing is left behind.
+    Not cleared if something else was copied since.
+    """
+    with clipLock:
+        if GBLSettings['clipTimer'] is None:
+            return
+        GBLSettings['clipTimer'].cancel()
+        GBLSettings['clipTimer'] = None
+        clipText = GBLSettings['clipText']
+        GBLSettings['clipText'] = None
+        clipBackend = _clipBackend()
+        try:
+            if _clipRead(clipBackend) in (clipText,None): # None is can't tell
+                _clipWrite(clipBackend,"")
+                logger.info("Clipboard cleared")
+            else:
+                logger.info("Clipboard changed since the copy, not cleared")
+        except (OSError,subprocess.SubprocessError) as oopsError:
+            logger.warning(f"Clearing clipboard with {clipBackend} failed: {oopsError}")
+
+def _clipBackend():
+    """Clipboard backend to use. auto picks wl-copy on Wayland, then xclip
+
+    Returns:
+        str | None: wl-copy, xclip, osc52, or fake. None if auto found nothing
+    """
+    if GBLSettings['clipBackend'] != 'auto':
+        return GBLSettings['clipBackend']
+    if os.environ.get('WAYLAND_DISPLAY') and shutil.which('wl-copy'):
+        return 'wl-copy'
+    if os.environ.get('DISPLAY') and shutil.which('xclip'):
+        return 'xclip'
+    return None
+
+def _clipWrite(clipBackend:str,theText:str) -> None:
+    """Put theText on the clipboard. Blank clears the clipboard
+
+    Args:
+        clipBackend (str): wl-copy, xclip, osc52, or fake
+        theText (str): What to put on the clipboard
+    """
+    match clipBackend:
+        case 'wl-copy':
+            if theText == "":
+                subprocess.run(['wl-copy','--clear'],check=True,timeout=5)
+            else:
+                subprocess.run(['wl-copy'],input=theText.encode(),check=True,timeout=5)
+        case 'xclip':
+            subprocess.run(['xclip','-selection','clipboard'],input=theText.encode(),check=True,timeout=5)
+        case 'osc52': # Terminal sets the clipboard. Works over ssh. ! clears it
+            oscData = base64.b64encode(theText.encode()).decode() if theText != "" else "!"
+            sys.__stdout__.write(f"\033]52;c;{oscData}\a")
+            sys.__stdout__.flush()
+        case 'fake':
+            GBLSettings['fakeClipboard'] = theText
+
+def _clipRead(clipBackend:str):
+    """What is on the clipboard
+
+    Args:
+        clipBackend (str): wl-copy, xclip, osc52, or fake
+
+    Returns:
+        str | None: None if the clipboard can't be read (osc52)
+    """
+    match clipBackend:
+        case 'wl-copy':
+            return subprocess.run(['wl-paste','--no-newline'],capture_output=True,timeout=5).stdout.decode()
+        case 'xclip':
+            return subprocess.run(['xclip','-selection','clipboard','-o'],capture_output=True,timeout=5).stdout.decode()
+        case 'fake':
+            return GBLSettings['fakeClipboard']
+    return None
+
+def _auditEvent(event:str,kind:str,objUUID,**details) -> None:
+    """Write a secret access event to the audit log
+
+    Latency is from when the current command was entered.
+
+    Args:
+        event (str): getpass, getotp, show, extract, add, edit, or delete
+        kind (str): entry or group
+        objUUID (uuid): uuid of the entry or group
+        details: Added to the event as is. Example: result='recycled'
+    """
+    if not auditLog.isEnabledFor(logging.INFO):
+        return
+    auditLog.info(event,extra={'audit': {
+        'event': event,
+        'kind': kind,
+        'uuid': str(objUUID),
+        'db': GBLSettings['dbName'],
+        'user': getpass.getuser(),
+        'latency_ms': round((time.perf_counter() - GBLSettings['cmdStart']) * 1000,3),
+        **details,
+    }})
+
+def _startLogQueues() -> None:
+    """Start the listener of each queue handler in the log configuration
+
+    dictConfig creates a QueueListener for a QueueHandler that has
+    handlers, but does not start it. The listener thread does the writes,
+    so file I/O doesn't hold up the prompt. Listeners are stopped at exit,
+    before logging shuts down, so queued records are written.
+    """
+    for handlerName in logging.getHandlerNames():
+        theHandler = logging.getHandlerByName(handlerName)
+        if getattr(theHandler,'listener',None) is not None:
+            theHandler.listener.start()
+            atexit.register(theHandler.listener.stop)
+
+def _walkGroups(grp=None):
+    """Walk the group tree depth first, starting at grp
+
+    The path and if the group is in the recycle bin are carried down the
+    tree, so no ancestor lookups are needed for each group.
+
+    Args:
+        grp (PyKeePass.Group): Default None. Group to start at, None is the root group
+    Yields:
+        tuple: (PyKeePass.Group, path (list), inRecycle (bool))
+    """
+    recycleGrp = kp.recyclebin_group
+    recycleUUID = recycleGrp.uuid if recycleGrp is not None else None
+    inRecycle = False
+    if grp is None:
+        grp = kp.root_group
+    else: # Starting group could be under the recycle bin
+        parentGrp = grp.parentgroup
+        while parentGrp is not None and not inRecycle:
+            inRecycle = parentGrp.uuid == recycleUUID
+            parentGrp = parentGrp.parentgroup
+    grpStack = [(grp,grp.path,inRecycle)]
+    while grpStack:
+        grp,grpPath,inRecycle = grpStack.pop()
+        inRecycle = inRecycle or grp.uuid == recycleUUID
+        yield (grp,grpPath,inRecycle)
+        for subGrp in reversed(grp.subgroups):
+            grpStack.append((subGrp,grpPath + [subGrp.name],inRecycle))
+
+def _promptCustomFields(theSession,fields:dict):
+    """Prompts user to add, change, or remove custom fields
+
+    Args:
+        theSession (PromptSession): Session to prompt with
+        fields (dict): Current custom fields. name, (value, protected)
+
+    Returns:
+        dict | None: The custom fields after the user changes. None if user cancelled
+    """
+    fields = dict(fields)
+    while True:
+        fldOptions = [(x,f'{x} = {"-----" if fields[x][1] else _noNone(fields[x][0])}') for x in sorted(fields)]
+        fldOptions.append((1,' -- Add a custom field --'))
+        fldOptions.append((0,' -- Done with custom fields --'))
+        try:
+            fldName = choice(
+                message="Select a custom field to change",
+                options=fldOptions,
+                default=0,
+                bottom_toolbar=HTML(" Press <b>[Up]</b>/<b>[Down]</b> to select, <b>[Enter]</b> to accept."))
+            if fldName == 0: # Done
+                return fields
+            if fldName == 1: # New field
+                fldName = theSession.prompt(message='Field name > ').strip()
+                if fldName == '' or fldName in reserved_keys or fldName in fields:
+                    print_formatted_text(FormattedText([('class:red',f'Invalid or existing field name {fldName!r}')]),style=mainStyles)
+                    continue
+                fldProtected = _confirm("Protect field value ")
+            else:
+                fldProtected = fields[fldName][1]
+            fldValue = theSession.prompt(message=f'{fldName} (blank to remove) > ',
+                default=_noNone(fields.get(fldName,('',False))[0]),
+                is_password=fldProtected)
+        except KeyboardInterrupt:
+            logger.debug("Keyboard Interrupt. Prompt user if they want to continue")
+            if _confirm("Cancel Editing Custom Fields "):
+                return None
+            continue
+        if fldValue == '':
+            if fldName in fields and _confirm(f"Remove field {fldName} "):
+                del fields[fldName]
+        else:
+            fields[fldName] = (fldValue,fldProtected)
+        logger.debug(f"Custom field {fldName!r} changed")
+
+def _maskCommand(userCmd:str) -> str:
+    """A command with any password= value masked, for logging
+
+    Args:
+        userCmd (str): Command as typed
+
+    Returns:
+        str: The command, with password=***** in place of a password value
+    """
+    return re.sub(r'(password=)("[^"]*"|\'[^\']*\'|\S*)',r'\1*****',userCmd,flags=re.IGNORECASE)
+
 def _noNone(theVal) -> str:
     """Returns blank string if theVal is None else theVal"""
     if theVal is None:
@@ -1628,14 +5833,97 @@ def _noNone(theVal) -> str:
     else:
         return theVal
 
+def _auditPassword(entryUUID,entryPass:str,hashMap=None) -> tuple:
+    """Score a password, and check if it is in the hash file
+
+    Args:
+        entryUUID (uuid): uuid of the entry the password is for
+        entryPass (str): The password
+        hashMap (mmap.mmap): Default None. Memory mapped sorted SHA-1 hash file
+
+    Returns:
+        tuple: (entryUUID, entropy bits (float), breached (bool))
+    """
+    breached = False
+    if hashMap is not None:
+        sha1Hash = hashlib.sha1(entryPass.encode('utf-8')).hexdigest().upper().encode('ascii')
+        breached = _hashInFile(hashMap,sha1Hash)
+    return (entryUUID,_passwordEntropy(entryPass),breached)
+
+def _hashInFile(hashMap,sha1Hash:bytes) -> bool:
+    """Binary search a memory mapped sorted hash file for a hash
+
+    Lines are variable length (HASH or HASH:count), so each probe backs up
+    to the start of the line it lands in.
+
+    Args:
+        hashMap (mmap.mmap): Memory mapped file, sorted by hash, one hash per line
+        sha1Hash (bytes): Upper case hex SHA-1 hash to look for
+
+    Returns:
+        bool: True if the hash is in the file
+    """
+    hashLen = len(sha1Hash)
+    low = 0
+    high = len(hashMap)
+    while low < high:
+        mid = (low + high) // 2
+        lineStart = hashMap.rfind(b'\n',0,mid) + 1
+        lineEnd = hashMap.find(b'\n',lineStart)
+        if lineEnd == -1:
+            lineEnd = len(hashMap)
+        lineHash = hashMap[lineStart:min(lineStart + hashLen,lineEnd)].upper()
+        if lineHash == sha1Hash:
+            return True
+        if lineHash < sha1Hash:
+            low = lineEnd + 1
+        else:
+            high = lineStart
+    return False
+
+def _passwordEntropy(thePass:str) -> float:
+    """Estimate the entropy bits of a password
+
+    Length times log2 of the size of the character classes used.
+
+    Args:
+        thePass (str): Password to score
+
+    Returns:
+        float: Estimated entropy in bits
+    """
+    poolSize = 0
+    if any(c.islower() for c in thePass):
+        poolSize += 26
+    if any(c.isupper() for c in thePass):
+        poolSize += 26
+    if any(c.isdigit() for c in thePass):
+        poolSize += 10
+    if any(not c.isalnum() and c.isascii() for c in thePass):
+        poolSize += 33
+    if any(not c.isascii() for c in thePass):
+        poolSize += 100
+    if poolSize == 0:
+        return 0.0
+    return len(thePass) * math.log2(poolSize)
+
 def _btmBarCurPath() -> str:
     """Returns a friendly string of the current path for the bottom bar"""
-    return f"Group Name: {GBLSettings['currentGrp'].name} | path: {_prettyPath(GBLSettings['currentGrp'].path)}"
+    dbText = f"DB: {GBLSettings['dbName']} | " if len(GBLSettings['dbSessions']) > 1 else ""
+    otpText = ""
+    if GBLSettings['otpWatch'] is not None: # Refreshed every second while watching
+        otpTitle,otpSettings = GBLSettings['otpWatch']
+        otpCode,otpSecsLeft = _totpCode(otpSettings)
+        otpText = f" | OTP {otpTitle}: {otpCode} ({otpSecsLeft}s)"
+    return f"{dbText}Group Name: {GBLSettings['currentGrp'].name} | path: {_prettyPath(GBLSettings['currentGrp'].path)}{otpText}{_expiryWarning()}"
 
 # ==============================
 # Getting the basics ready
 parser = argparse.ArgumentParser(description="POC write/read to a keepass database")
-parser.add_argument(help="KeePass database to open",metavar='<KEEPASS_DB>',type=str,dest='keepassdb')
+parser.add_argument(help="KeePass database to open. More than one can be given",metavar='<KEEPASS_DB>',type=str,nargs='+',dest='keepassdb')
+parser.add_argument("--keyfile",help="(Optional) keyfile for the database. Give once for each database, in the same order, or once for all",required=False,metavar='<KEYFILE>',type=str,action='append',dest='keyfile')
+parser.add_argument("--clip-backend",help="(Optional) clipboard for getpass --clip. Default auto",required=False,choices=['auto','wl-copy','xclip','osc52','fake'],default='auto',dest='clipbackend')
+parser.add_argument("--clip-clear",help="(Optional) seconds until the clipboard is cleared. Default 20",required=False,metavar='<seconds>',type=int,default=20,dest='clipclear')
 parser.add_argument("--logcfg",help="(Optional) log configuration file for logging", required=False,metavar='<LogCfg_file>',type=str,dest='logcfgfile')
 args = parser.parse_args()
 
@@ -1646,35 +5934,99 @@ if args.logcfgfile:
         with open(plogcfgfile,"rb") as theFile:
             xtmpDict = tomllib.load(theFile)
         logging.config.dictConfig(xtmpDict['logconfig'])
+        _startLogQueues()
     else:
         print(f"Logging configuration file not found: {plogcfgfile.resolve()}.")
         quit(1)
 
-# Does db file exist
-pKeePassDB = Path(args.keepassdb)
-logger.debug(f"check if {pKeePassDB.resolve()} exists")
-if not pKeePassDB.exists():
-    print(f"ERROR: {pKeePassDB.resolve()} Does not exist")
-    quit(1)
-
-print(f"Accessing : {pKeePassDB.resolve()}")
-logger.info(f"prompt user for password to db {pKeePassDB.resolve()}")
-passphrase = getpass.getpass(prompt=" >> Enter password to access file: ",stream=None)
-
-#  Attempt to open database
-try:
-    kp = PyKeePass(pKeePassDB,password=passphrase)
-except pkExceptions.CredentialsError:
-    logger.warning("Invalid password provided")
-    print("Bad creds")
-    quit(1)
-except Exception as oopsError:
-    logger.critical(f"Unexpected error: {oopsError}",stack_info=True)
-    print(f"CRITICAL: Unexpected error {oopsError}")
-    traceback.print_exc()
-    quit(1)
-
-entryCount = len(kp.entries)
-logger.info(f"Total Entries in database: {entryCount}")
+GBLSettings['clipBackend'] = args.clipbackend
+GBLSettings['clipClearSecs'] = args.clipclear
+atexit.register(_clipClear) # Don't leave a password on the clipboard
+
+# Do db files exist
+pKeePassDBs = [Path(x) for x in args.keepassdb]
+for pKeePassDB in pKeePassDBs:
+    logger.debug(f"check if {pKeePassDB.resolve()} exists")
+    if not pKeePassDB.exists():
+        print(f"ERROR: {pKeePassDB.resolve()} Does not exist")
+        quit(1)
+
+# Read keyfiles, one for each database or one for all of them
+keyfiles = [None] * len(pKeePassDBs)
+if args.keyfile:
+    if len(args.keyfile) == 1:
+        keyfiles = [Path(args.keyfile[0])] * len(pKeePassDBs)
+    elif len(args.keyfile) == len(pKeePassDBs):
+        keyfiles = [Path(x) for x in args.keyfile]
+    else:
+        print(f"ERROR: {len(args.keyfile)} keyfiles given for {len(pKeePassDBs)} databases")
+        quit(1)
+keyDatas = {}
+for keyfile in keyfiles:
+    if keyfile is None or keyfile in keyDatas:
+        continue
+    success,keyData = _readKeyfile(keyfile)
+    if not success: # keyData is why
+        print(f"ERROR: {keyData}")
+        quit(1)
+    keyDatas[keyfile] = keyData
+keyDatas[None] = None
+
+# Get all the passwords first, so the databases can be opened at the same time
+passphrases = []
+for pKeePassDB in pKeePassDBs:
+    print(f"Accessing : {pKeePassDB.resolve()}")
+    logger.info(f"prompt user for password to db {pKeePassDB.resolve()}")
+    passPrompt = " >> Enter password to access file: "
+    if len(passphrases) > 0:
+        passPrompt = " >> Enter password to access file (blank for the same as previous): "
+    passphrase = getpass.getpass(prompt=passPrompt,stream=None)
+    if passphrase == "" and len(passphrases) > 0:
+        passphrase = passphrases[-1]
+    passphrases.append(passphrase)
+
+#  KDF for each database in it's own process, then decrypt them with the derived keys
+#  fork as this script has no __main__ guard for spawn to import it with
+print(f"Unlocking {len(pKeePassDBs)} database/s")
+logger.info(f"Deriving keys for {len(pKeePassDBs)} databases in a process pool")
+transformedKeys = {}
+unlockStart = time.perf_counter()
+with ProcessPoolExecutor(max_workers=min(len(pKeePassDBs),os.cpu_count() or 1),
+                         mp_context=multiprocessing.get_context('fork')) as pool:
+    keyFutures = {pool.submit(_deriveKey,x,y,keyDatas[z]): x for x,y,z in zip(pKeePassDBs,passphrases,keyfiles)}
+    for keyFuture in as_completed(keyFutures):
+        pKeePassDB = keyFutures[keyFuture]
+        try:
+            transformedKeys[pKeePassDB],kdfSeconds = keyFuture.result()
+        except Exception as oopsError:
+            logger.critical(f"Unexpected error deriving key for {pKeePassDB.resolve()}: {oopsError}")
+            print(f"CRITICAL: Unexpected error {oopsError}: {pKeePassDB.resolve()}")
+            quit(1)
+        logger.info(f"Key derived for {pKeePassDB.resolve()} in {kdfSeconds:.2f}s")
+        print(f" [{len(transformedKeys)}/{len(pKeePassDBs)}] {pKeePassDB.name} key derived in {kdfSeconds:.2f}s")
+logger.info(f"All keys derived in {time.perf_counter() - unlockStart:.2f}s")
+
+openResults = [_openDb(x,y,keyDatas[z],transformedKeys[x]) for x,y,z in zip(pKeePassDBs,passphrases,keyfiles)]
+for pKeePassDB,keyfile,(success,openKp,openIndex) in zip(pKeePassDBs,keyfiles,openResults):
+    if not success: # openKp is why
+        print(f"{openKp}: {pKeePassDB.resolve()}")
+        quit(1)
+    dbName = pKeePassDB.stem
+    if dbName in GBLSettings['dbSessions']: # Same file name in different directories
+        dbName = f"{dbName}-{len(GBLSettings['dbSessions'])}"
+    GBLSettings['dbSessions'][dbName] = {
+        'kp': openKp,
+        'dbName': dbName,
+        'currentGrp': openKp.root_group,
+        'binaryHashes': None,
+        'index': openIndex,
+        'generation': 0,
+        'projection': None,
+        'keyfile': keyfile,
+        'transformedKey': transformedKeys[pKeePassDB],
+    }
+    logger.info(f"Total Entries in database {dbName}: {len(openIndex['entries'])}")
+
+_useDb(next(iter(GBLSettings['dbSessions'])))
 
 main(args)
\ No newline at end of file